@@ -0,0 +1,59 @@
+"""add user databases listing indexes
+
+Revision ID: 3d7b9f1c6a28
+Revises: 8a3f6c2e9d41
+Create Date: 2026-10-18 18:42:10.531907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d7b9f1c6a28'
+down_revision: Union[str, None] = '8a3f6c2e9d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LIVE_INDEXES = [
+    ('ix_user_databases_live_date_created', ['date_created', 'id']),
+    ('ix_user_databases_live_owner_id', ['owner_id', 'date_created', 'id']),
+    ('ix_user_databases_live_project_id', ['project_id', 'date_created', 'id']),
+    ('ix_user_databases_live_flavour', ['database_flavour_name', 'date_created', 'id']),
+]
+
+
+def upgrade() -> None:
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT name FROM user_databases GROUP BY name HAVING count(*) > 1 LIMIT 10"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            f"user_databases has duplicate names, rename them before adding "
+            f"ux_user_databases_name: {', '.join(duplicates)}")
+
+    # CONCURRENTLY keeps the table writable while the indexes build, it can
+    # not run inside a transaction. A build that failed half way leaves an
+    # invalid index behind, so drop any leftover before creating it again.
+    with op.get_context().autocommit_block():
+        for name, columns in LIVE_INDEXES:
+            op.drop_index(name, table_name='user_databases', if_exists=True,
+                          postgresql_concurrently=True)
+            op.create_index(name, 'user_databases', columns, unique=False,
+                            postgresql_where=sa.text('deleted = false'),
+                            postgresql_concurrently=True)
+        op.drop_index('ux_user_databases_name', table_name='user_databases',
+                      if_exists=True, postgresql_concurrently=True)
+        op.create_index('ux_user_databases_name', 'user_databases', ['name'],
+                        unique=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ux_user_databases_name', table_name='user_databases',
+                      if_exists=True, postgresql_concurrently=True)
+        for name, columns in reversed(LIVE_INDEXES):
+            op.drop_index(name, table_name='user_databases', if_exists=True,
+                          postgresql_concurrently=True)
@@ -0,0 +1,39 @@
+"""add standby databases
+
+Revision ID: a3c51e7d9b20
+Revises: 703c44143fec
+Create Date: 2026-10-18 09:12:41.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c51e7d9b20'
+down_revision: Union[str, None] = '703c44143fec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('standby_databases',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('host', sa.String(), nullable=True),
+    sa.Column('port', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('user', sa.String(), nullable=False),
+    sa.Column('password', sa.String(), nullable=False),
+    sa.Column('database_flavour_name', sa.String(), nullable=False),
+    sa.Column('date_created', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index(op.f('ix_standby_databases_database_flavour_name'), 'standby_databases', ['database_flavour_name'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_standby_databases_database_flavour_name'), table_name='standby_databases')
+    op.drop_table('standby_databases')
@@ -19,6 +19,17 @@ engine = create_engine(DATABASE_URI, pool_pre_ping=True,
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# read only sessions, used by GET routes when replicas are configured
+replica_engines = [
+    create_engine(uri.strip(), pool_pre_ping=True, pool_size=10, max_overflow=20)
+    for uri in settings.DATABASE_REPLICA_URIS.split(',') if uri.strip()
+] if os.environ.get("FASTAPI_ENV") != "testing" else []
+
+ReplicaSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    for replica_engine in replica_engines
+]
+
 Base = declarative_base()
 
 # Base.metadata.create_all(bind=engine)
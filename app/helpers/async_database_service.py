@@ -0,0 +1,689 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager, nullcontext
+import aiomysql
+import asyncpg
+from config import settings
+from app.helpers.health import get_host_health
+from app.helpers.metrics import metrics
+
+# CR_CONN_HOST_ERROR, CR_SERVER_GONE_ERROR, CR_SERVER_LOST and
+# CR_SERVER_LOST_EXTENDED
+MYSQL_CONNECTION_ERRNOS = (2003, 2006, 2013, 2055)
+
+
+class AsyncDatabaseService:
+    """Async counterpart of DatabaseService for use in the API routes.
+
+    Admin connections come from a driver level pool created on the running
+    event loop. Health and circuit breaker state is shared with the sync
+    service for the same server.
+    """
+
+    flavour = None
+
+    def __init__(self):
+        self.Error = None
+        self.ConnectionErrors = ()
+        self._pool = None
+        self._pool_loop = None
+        self._pool_lock = None
+        # server connection id -> first time it was handed out
+        self._opened_at = {}
+
+    @property
+    def pool_name(self):
+        return f"{self.flavour}://{self.host}:{self.port}"
+
+    def get_health(self):
+        return get_host_health(self.pool_name)
+
+    def is_connection_error(self, error):
+        """ True when the error means the server could not be reached,
+        only those count towards the circuit breaker """
+        return isinstance(error, self.ConnectionErrors)
+
+    def check_db_connection(self):
+        """Validates if one is able to connect to Database server returns True or False"""
+        return self.get_health().is_available()
+
+    async def create_pool(self):
+        """ Create the driver connection pool for this server """
+        pass
+
+    async def get_pool(self):
+        loop = asyncio.get_running_loop()
+        if self._pool is not None and self._pool_loop is loop:
+            return self._pool
+        if self._pool_lock is None or self._pool_loop is not loop:
+            self._pool_lock = asyncio.Lock()
+            self._pool_loop = loop
+            self._pool = None
+        async with self._pool_lock:
+            if self._pool is None:
+                self._pool = await self.create_pool()
+        return self._pool
+
+    async def close_pool(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            self._opened_at = {}
+            pool.close()
+            await pool.wait_closed()
+
+    async def warm_up(self):
+        try:
+            await self.get_pool()
+            return True
+        except self.Error as e:
+            print(e)
+            return False
+
+    def connection_id(self, connection):
+        """ Id of the server side session behind a pooled connection """
+        pass
+
+    async def retire_connection(self, pool, connection):
+        """ Close a borrowed connection instead of giving it back """
+        pass
+
+    def _expired(self, connection):
+        now = time.monotonic()
+        if len(self._opened_at) > 4 * settings.ADMIN_POOL_SIZE:
+            # forget connections the pool closed on its own
+            self._opened_at = {
+                key: opened_at for key, opened_at in self._opened_at.items()
+                if now - opened_at < settings.ADMIN_POOL_MAX_LIFETIME}
+        key = self.connection_id(connection)
+        opened_at = self._opened_at.setdefault(key, now)
+        if now - opened_at < settings.ADMIN_POOL_MAX_LIFETIME:
+            return False
+        del self._opened_at[key]
+        return True
+
+    async def _acquire(self, pool):
+        # the driver pools only close idle connections, retire old ones here
+        # the way AdminConnectionPool does
+        connection = await pool.acquire()
+        while self._expired(connection):
+            metrics.increment('admin_pool_recycled_total', pool=self.pool_name)
+            await self.retire_connection(pool, connection)
+            connection = await pool.acquire()
+        return connection
+
+    @asynccontextmanager
+    async def admin_connection(self):
+        """ Borrow a pooled admin connection, yields False on failure or
+        while the circuit breaker for the server is open """
+        health = self.get_health()
+        if not health.allow_request():
+            yield False
+            return
+
+        started = time.monotonic()
+        pool = connection = None
+        try:
+            pool = await self.get_pool()
+            connection = await asyncio.wait_for(
+                self._acquire(pool), timeout=settings.ADMIN_POOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            # a busy pool says nothing about the server
+            metrics.increment('admin_pool_timeouts_total', pool=self.pool_name)
+        except self.Error as e:
+            print(e)
+            health.record_failure(e)
+        finally:
+            if not connection:
+                # hand back a half open trial slot nothing was recorded for,
+                # whatever ended the attempt
+                health.cancel_trial()
+        if not connection:
+            yield False
+            return
+        metrics.observe('admin_pool_wait_seconds',
+                        time.monotonic() - started, pool=self.pool_name)
+
+        try:
+            yield connection
+        except BaseException as e:
+            if self.is_connection_error(e):
+                health.record_failure(e)
+            else:
+                # the server answered, the statement itself failed
+                health.record_success()
+            raise
+        else:
+            health.record_success()
+        finally:
+            await pool.release(connection)
+
+    async def create_db_connection(self, user=None, password=None, db_name=None):
+        """ Create a connection to a single database """
+        pass
+
+    async def check_user_db_rights(self, user=None, password=None, db_name=None):
+        """Verify user rights to db"""
+        connection = await self.create_db_connection(
+            user=user, password=password, db_name=db_name)
+        if not connection:
+            return False
+        await self.close_db_connection(connection)
+        return True
+
+    async def close_db_connection(self, connection):
+        pass
+
+    async def execute(self, *statements, db_name=None):
+        """ Run statements on an admin connection, returns True or False """
+        pass
+
+    async def fetch(self, query, *args):
+        """ Run a query on an admin connection and return all rows """
+        pass
+
+    async def create_database(self, db_name=None, user=None, password=None):
+        """Create a database with user details"""
+        pass
+
+    def statement_context(self, connection):
+        """ Return an async context manager yielding the object statements are run on """
+        pass
+
+    async def create_databases(self, databases):
+        """ Create several databases over a single admin connection.
+
+        `databases` is a list of credentials as returned by
+        generate_db_credentials, a list with True or False is returned
+        for each of them.
+        """
+        results = [False] * len(databases)
+        try:
+            async with self.admin_connection() as connection:
+                if not connection:
+                    return results
+                async with self.statement_context(connection) as cursor:
+                    for index, database in enumerate(databases):
+                        try:
+                            results[index] = await self._create_database(
+                                cursor, db_name=database.name,
+                                user=database.user, password=database.password)
+                        except self.Error as e:
+                            if self.is_connection_error(e):
+                                raise
+                            print(e)
+        except self.Error as e:
+            print(e)
+        return results
+
+    async def create_user(self, user=None, password=None):
+        """ Create a database user with password """
+        pass
+
+    async def delete_user(self, user=None):
+        """ Delete and existing database user """
+        pass
+
+    async def delete_database(self, db_name):
+        return await self.execute(f"DROP DATABASE {db_name}")
+
+    async def reset_database(self, db_name=None, user=None, password=None):
+        """Reset database to initial state"""
+        pass
+
+    async def reset_password(self, user=None, password=None):
+        pass
+
+    async def get_database_size(self, db_name=None, user=None, password=None):
+        """Return size of the database"""
+        pass
+
+    async def collect_all_sizes(self, db_names=None):
+        """Return {db_name: size_in_bytes} for the databases on the host"""
+        pass
+
+    async def get_all_databases(self):
+        """Return list of databases"""
+        pass
+
+    async def get_all_users(self):
+        """Return list of users"""
+        pass
+
+    async def disable_user_access(self, db_name, db_user_name):
+        pass
+
+    async def enable_user_write_access(self, db_name, db_user_name):
+        pass
+
+    async def disable_user_log_in(self, db_user_name, db_user_pw=None):
+        pass
+
+    async def enable_user_log_in(self, db_user_name, db_user_pw=None):
+        pass
+
+
+class AsyncMysqlDbService(AsyncDatabaseService):
+
+    flavour = 'mysql'
+
+    def __init__(self, host=None, port=None):
+        super().__init__()
+        self.Error = (aiomysql.Error, OSError)
+        self.ConnectionErrors = (aiomysql.InterfaceError,)
+        self.host = host or settings.ADMIN_MYSQL_HOST
+        self.port = port or settings.ADMIN_MYSQL_PORT
+
+    def is_connection_error(self, error):
+        # pymysql raises OperationalError for most server side errors too,
+        # only the client connection errors mean the server is unreachable
+        if isinstance(error, aiomysql.OperationalError):
+            return bool(error.args) and error.args[0] in MYSQL_CONNECTION_ERRNOS
+        return super().is_connection_error(error)
+
+    async def create_pool(self):
+        return await aiomysql.create_pool(
+            host=self.host,
+            port=int(self.port or 3306),
+            user=settings.ADMIN_MYSQL_USER,
+            password=settings.ADMIN_MYSQL_PASSWORD,
+            minsize=settings.ADMIN_POOL_MIN_SIZE,
+            maxsize=settings.ADMIN_POOL_SIZE,
+            connect_timeout=settings.ADMIN_CONNECT_TIMEOUT,
+            autocommit=True
+        )
+
+    def connection_id(self, connection):
+        return connection.server_thread_id[0]
+
+    async def retire_connection(self, pool, connection):
+        connection.close()
+        await pool.release(connection)
+
+    async def create_db_connection(self, user=None, password=None, db_name=None):
+        try:
+            return await aiomysql.connect(
+                host=self.host,
+                port=int(self.port or 3306),
+                user=user,
+                password=password,
+                db=db_name,
+                connect_timeout=settings.ADMIN_CONNECT_TIMEOUT
+            )
+        except self.Error as e:
+            print(e)
+            return False
+
+    async def close_db_connection(self, connection):
+        connection.close()
+
+    def statement_context(self, connection):
+        return connection.cursor()
+
+    async def execute(self, *statements, db_name=None):
+        try:
+            async with self.admin_connection() as connection:
+                if not connection:
+                    return False
+                async with connection.cursor() as cursor:
+                    for statement in statements:
+                        await cursor.execute(statement)
+                return True
+        except self.Error as e:
+            print(e)
+            return False
+
+    async def fetch(self, query, *args):
+        try:
+            async with self.admin_connection() as connection:
+                if not connection:
+                    return False
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, args or None)
+                    return await cursor.fetchall()
+        except self.Error as e:
+            print(e)
+            return False
+
+    async def create_database(self, db_name=None, user=None, password=None):
+        try:
+            async with self.admin_connection() as connection:
+                if not connection:
+                    return False
+                async with connection.cursor() as cursor:
+                    return await self._create_database(
+                        cursor, db_name=db_name, user=user, password=password)
+        except self.Error as e:
+            print(e)
+            return False
+
+    async def _create_database(self, cursor, db_name=None, user=None, password=None):
+        await cursor.execute(f"CREATE DATABASE {db_name}")
+        if not await self._create_user(cursor, user=user, password=password):
+            # nobody could use it, do not leave it behind
+            await cursor.execute(f"DROP DATABASE {db_name}")
+            return False
+        await cursor.execute(
+            f"GRANT ALL PRIVILEGES ON {db_name}.* To '{user}'@'%'")
+        return True
+
+    async def create_user(self, user=None, password=None):
+        try:
+            async with self.admin_connection() as connection:
+                if not connection:
+                    return False
+                async with connection.cursor() as cursor:
+                    return await self._create_user(cursor, user=user, password=password)
+        except self.Error:
+            return False
+
+    async def _create_user(self, cursor, user=None, password=None):
+        try:
+            await cursor.execute(
+                f"CREATE USER '{user}'@'%' IDENTIFIED BY '{password}' ")
+            return True
+        except aiomysql.Error as e:
+            # ER_CANNOT_USER, the user already exists
+            return e.args and e.args[0] == 1396
+
+    async def delete_user(self, user=None):
+        return await self.execute(f"DROP USER '{user}' ")
+
+    async def reset_database(self, db_name=None, user=None, password=None):
+        if not await self.check_user_db_rights(
+                db_name=db_name, user=user, password=password):
+            return False
+        try:
+            async with self.admin_connection() as connection:
+                if not connection:
+                    return False
+                async with connection.cursor() as cursor:
+                    await cursor.execute(f"DROP DATABASE {db_name}")
+                    return await self._create_database(
+                        cursor, db_name=db_name, user=user, password=password)
+        except self.Error as e:
+            print(e)
+            return False
+
+    async def reset_password(self, user=None, password=None):
+        return await self.execute(
+            f"ALTER USER '{user}'@'%' IDENTIFIED BY '{password}'")
+
+    async def get_database_size(self, db_name=None, user=None, password=None):
+        connection = await self.create_db_connection(
+            db_name=db_name, user=user, password=password)
+        if not connection:
+            return 'N/A'
+        try:
+            async with connection.cursor() as cursor:
+                await cursor.execute(
+                    """SELECT SUM(data_length + index_length) / 1024
+                    FROM information_schema.TABLES
+                    WHERE table_schema = %s""", (db_name,))
+                row = await cursor.fetchone()
+            return f'{float(row[0] or 0)} KB'
+        except self.Error:
+            return 'N/A'
+        finally:
+            connection.close()
+
+    async def collect_all_sizes(self, db_names=None):
+        query = """SELECT s.schema_name,
+            COALESCE(SUM(t.data_length + t.index_length), 0)
+            FROM information_schema.SCHEMATA s
+            LEFT JOIN information_schema.TABLES t
+            ON t.table_schema = s.schema_name"""
+        if db_names is not None:
+            if not db_names:
+                return {}
+            query += " WHERE s.schema_name IN ({})".format(
+                ', '.join(['%s'] * len(db_names)))
+        query += " GROUP BY s.schema_name"
+        rows = await self.fetch(query, *(db_names or ()))
+        if rows is False:
+            return False
+        return {row[0]: int(row[1]) for row in rows}
+
+    async def get_all_databases(self):
+        rows = await self.fetch("SHOW DATABASES")
+        if rows is False:
+            return False
+        return [row[0] for row in rows]
+
+    async def get_all_users(self):
+        rows = await self.fetch("SELECT user FROM mysql.user GROUP BY user")
+        if rows is False:
+            return False
+        return [row[0] for row in rows]
+
+    async def disable_user_access(self, db_name, db_user_name):
+        return await self.execute(
+            f"REVOKE ALL PRIVILEGES ON {db_name}.* FROM {db_user_name}",
+            f"GRANT SELECT, DELETE ON {db_name}.* TO {db_user_name}")
+
+    async def enable_user_write_access(self, db_name, db_user_name):
+        return await self.execute(
+            f"GRANT ALL PRIVILEGES ON {db_name}.* TO {db_user_name}")
+
+    async def disable_user_log_in(self, db_user_name, db_user_pw=None):
+        return await self.execute(
+            f"ALTER USER {db_user_name} IDENTIFIED BY '{db_user_pw}'ACCOUNT LOCK")
+
+    async def enable_user_log_in(self, db_user_name, db_user_pw=None):
+        return await self.execute(
+            f"ALTER USER {db_user_name} IDENTIFIED BY '{db_user_pw}'ACCOUNT UNLOCK")
+
+
+class AsyncPostgresqlDbService(AsyncDatabaseService):
+
+    flavour = 'postgres'
+
+    def __init__(self, host=None, port=None):
+        super().__init__()
+        self.Error = (asyncpg.PostgresError, asyncpg.InterfaceError, OSError)
+        self.ConnectionErrors = (
+            asyncpg.ConnectionDoesNotExistError, asyncpg.CannotConnectNowError,
+            ConnectionError)
+        self.host = host or settings.ADMIN_PSQL_HOST
+        self.port = port or settings.ADMIN_PSQL_PORT
+
+    def _connect_kwargs(self, db_name=None):
+        return dict(
+            host=self.host,
+            port=int(self.port or 5432),
+            user=settings.ADMIN_PSQL_USER,
+            password=settings.ADMIN_PSQL_PASSWORD,
+            database=db_name,
+            timeout=settings.ADMIN_CONNECT_TIMEOUT
+        )
+
+    async def create_pool(self):
+        return await asyncpg.create_pool(
+            min_size=settings.ADMIN_POOL_MIN_SIZE,
+            max_size=settings.ADMIN_POOL_SIZE,
+            **self._connect_kwargs()
+        )
+
+    def connection_id(self, connection):
+        return connection.get_server_pid()
+
+    async def retire_connection(self, pool, connection):
+        # closing a pooled connection hands its slot back to the pool
+        await connection.close()
+
+    async def create_db_connection(self, user=None, password=None, db_name=None):
+        try:
+            return await asyncpg.connect(
+                host=self.host,
+                port=int(self.port or 5432),
+                user=user,
+                password=password,
+                database=db_name,
+                timeout=settings.ADMIN_CONNECT_TIMEOUT
+            )
+        except self.Error as e:
+            print(e)
+            return False
+
+    async def close_db_connection(self, connection):
+        await connection.close()
+
+    def statement_context(self, connection):
+        return nullcontext(connection)
+
+    async def execute(self, *statements, db_name=None):
+        try:
+            if db_name:
+                # Schema grants only apply to the database we are connected to
+                connection = await asyncpg.connect(**self._connect_kwargs(db_name))
+                try:
+                    for statement in statements:
+                        await connection.execute(statement)
+                finally:
+                    await connection.close()
+                return True
+            async with self.admin_connection() as connection:
+                if not connection:
+                    return False
+                for statement in statements:
+                    await connection.execute(statement)
+                return True
+        except self.Error as e:
+            print(e)
+            return False
+
+    async def fetch(self, query, *args):
+        try:
+            async with self.admin_connection() as connection:
+                if not connection:
+                    return False
+                return await connection.fetch(query, *args)
+        except self.Error as e:
+            print(e)
+            return False
+
+    async def create_database(self, db_name=None, user=None, password=None):
+        try:
+            async with self.admin_connection() as connection:
+                if not connection:
+                    return False
+                return await self._create_database(
+                    connection, db_name=db_name, user=user, password=password)
+        except self.Error as e:
+            print(e)
+            return False
+
+    async def _create_database(self, connection, db_name=None, user=None, password=None):
+        if not await self._create_user(connection, user=user, password=password):
+            return False
+        await connection.execute(
+            f'CREATE DATABASE {db_name} WITH OWNER = {user}')
+        return True
+
+    async def create_user(self, user=None, password=None):
+        try:
+            async with self.admin_connection() as connection:
+                if not connection:
+                    return False
+                return await self._create_user(connection, user=user, password=password)
+        except self.Error:
+            return False
+
+    async def _create_user(self, connection, user=None, password=None):
+        try:
+            await connection.execute(
+                f"CREATE USER {user} WITH ENCRYPTED PASSWORD '{password}'")
+            return True
+        except asyncpg.DuplicateObjectError:
+            return True
+        except asyncpg.PostgresError as e:
+            print(e)
+            return False
+
+    async def delete_user(self, user=None):
+        try:
+            async with self.admin_connection() as connection:
+                if not connection:
+                    return False
+                await connection.execute(f"DROP USER {user} ")
+                return True
+        except asyncpg.UndefinedObjectError:
+            return True
+        except self.Error:
+            return False
+
+    async def reset_database(self, db_name=None, user=None, password=None):
+        if not await self.check_user_db_rights(
+                db_name=db_name, user=user, password=password):
+            return False
+        try:
+            async with self.admin_connection() as connection:
+                if not connection:
+                    return False
+                await connection.execute(f"DROP DATABASE {db_name}")
+                return await self._create_database(
+                    connection, db_name=db_name, user=user, password=password)
+        except self.Error as e:
+            print(e)
+            return False
+
+    async def reset_password(self, user=None, password=None):
+        return await self.execute(
+            f"ALTER USER {user} WITH ENCRYPTED PASSWORD '{password}'")
+
+    async def get_database_size(self, db_name=None, user=None, password=None):
+        connection = await self.create_db_connection(
+            db_name=db_name, user=user, password=password)
+        if not connection:
+            return 'N/A'
+        try:
+            return await connection.fetchval(
+                "SELECT pg_size_pretty(pg_database_size($1))", db_name)
+        except self.Error:
+            return 'N/A'
+        finally:
+            await connection.close()
+
+    async def collect_all_sizes(self, db_names=None):
+        query = """SELECT datname, pg_database_size(datname)
+            FROM pg_database WHERE NOT datistemplate"""
+        args = ()
+        if db_names is not None:
+            if not db_names:
+                return {}
+            query += " AND datname = ANY($1::text[])"
+            args = (list(db_names),)
+        rows = await self.fetch(query, *args)
+        if rows is False:
+            return False
+        return {row[0]: int(row[1]) for row in rows}
+
+    async def get_all_databases(self):
+        rows = await self.fetch("SELECT datname FROM pg_database")
+        if rows is False:
+            return False
+        return [row[0] for row in rows]
+
+    async def get_all_users(self):
+        rows = await self.fetch("SELECT usename FROM pg_catalog.pg_user")
+        if rows is False:
+            return False
+        return [row[0] for row in rows]
+
+    async def disable_user_access(self, db_name, db_user_name):
+        return await self.execute(
+            f"REVOKE INSERT, UPDATE ON DATABASE {db_name} FROM {db_user_name}",
+            f"REVOKE INSERT, UPDATE ON ALL TABLES IN SCHEMA public FROM {db_user_name}",
+            f"REVOKE USAGE ON SCHEMA public FROM {db_user_name}")
+
+    async def enable_user_write_access(self, db_name, db_user_name):
+        return await self.execute(
+            f"GRANT INSERT, UPDATE ON DATABASE {db_name} TO {db_user_name}",
+            f"GRANT INSERT, UPDATE ON ALL TABLES IN SCHEMA public TO {db_user_name}",
+            f"GRANT USAGE ON SCHEMA public TO {db_user_name}",
+            db_name=db_name)
+
+    async def disable_user_log_in(self, db_user_name, db_user_pw=None):
+        return await self.execute(f"ALTER USER {db_user_name} NOLOGIN")
+
+    async def enable_user_log_in(self, db_user_name, db_user_pw=None):
+        return await self.execute(f"ALTER USER {db_user_name} WITH LOGIN")
@@ -0,0 +1,187 @@
+import atexit
+import datetime
+import queue
+import threading
+import time
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+from config import settings
+from app.database import SessionLocal
+from app.models import AuditEvent
+from app.helpers.metrics import metrics
+
+
+def month_start(moment, months=0):
+    """ First day of the month `months` away from `moment` """
+    month = moment.year * 12 + moment.month - 1 + months
+    return datetime.datetime(month // 12, month % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"audit_events_y{month.year}m{month.month:02d}"
+
+
+def ensure_audit_partitions(db: Session, now=None):
+    """ Create the monthly partitions up to AUDIT_PARTITIONS_AHEAD and drop
+    the ones past AUDIT_RETENTION_MONTHS. Returns (created, dropped) names.
+    """
+    now = now or datetime.datetime.now()
+    existing = {name for name, in db.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON pg_inherits.inhparent = parent.oid "
+        "JOIN pg_class child ON pg_inherits.inhrelid = child.oid "
+        "WHERE parent.relname = 'audit_events'"))}
+
+    created = []
+    for months in range(settings.AUDIT_PARTITIONS_AHEAD + 1):
+        month = month_start(now, months)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF audit_events "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') "
+            f"TO ('{month_start(month, 1):%Y-%m-%d}')"))
+        created.append(name)
+
+    dropped = []
+    if settings.AUDIT_RETENTION_MONTHS:
+        oldest_kept = partition_name(
+            month_start(now, -settings.AUDIT_RETENTION_MONTHS))
+        for name in sorted(existing):
+            # the names sort in date order
+            if name.startswith('audit_events_y') and name < oldest_kept:
+                db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                dropped.append(name)
+    db.commit()
+    return created, dropped
+
+
+def audit_event_from_log(data, created_at=None):
+    """ Map an activity log message to an audit_events row """
+    return dict(
+        created_at=created_at or datetime.datetime.now(),
+        database_id=data.get('a_db_id'),
+        user_id=str(data['user_id']) if data.get('user_id') is not None else None,
+        user_email=data.get('user_email'),
+        operation=data.get('operation'),
+        status=data.get('status'),
+        description=data.get('description')
+    )
+
+
+class AuditWriter:
+    """Background thread that inserts queued audit events in batches"""
+
+    def __init__(self, queue_size=None, batch_size=None, flush_interval=None):
+        self.batch_size = batch_size or settings.AUDIT_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.AUDIT_FLUSH_INTERVAL
+        self._queue = queue.Queue(maxsize=queue_size or settings.AUDIT_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """ Stop the thread and write whatever is still queued """
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout or self.flush_interval * 2)
+        self.flush()
+
+    def submit(self, row):
+        """ Queue an audit row, returns False when it had to be dropped """
+        if not self._stop.is_set():
+            self.start()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            metrics.increment('audit_events_dropped_total')
+            return False
+        return True
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        while True:
+            batch = self._take(self.batch_size)
+            if not batch:
+                return
+            self.write(batch)
+
+    def write(self, rows):
+        """ Insert rows with one multi-row INSERT, creating a missing
+        partition and retrying once """
+        started = time.monotonic()
+        db = SessionLocal()
+        try:
+            for attempt in range(2):
+                try:
+                    db.execute(insert(AuditEvent), rows)
+                    db.commit()
+                    metrics.increment('audit_events_written_total', len(rows))
+                    break
+                except Exception as e:
+                    db.rollback()
+                    if attempt:
+                        metrics.increment('audit_events_dropped_total', len(rows))
+                        print(f"Error occurred while writing audit events: {str(e)}")
+                        break
+                    ensure_audit_partitions(db)
+        except Exception as e:
+            metrics.increment('audit_events_dropped_total', len(rows))
+            print(f"Error occurred while writing audit events: {str(e)}")
+        finally:
+            db.close()
+        metrics.observe('audit_flush_seconds', time.monotonic() - started)
+
+    def _take(self, count):
+        batch = []
+        while len(batch) < count:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            # collect for up to the flush interval so inserts stay batched
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.write(batch)
+
+
+audit_writer = AuditWriter()
+atexit.register(audit_writer.stop)
+
+
+def record_audit_event(data):
+    """ Keep an activity log message as an audit event """
+    if settings.AUDIT_ENABLED:
+        audit_writer.submit(audit_event_from_log(data))
+
+
+@metrics.register_collector
+def collect_audit_depth(registry):
+    registry.set_gauge('audit_queue_depth', audit_writer.depth())
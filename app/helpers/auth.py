@@ -1,8 +1,13 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from jose import jwt
 from jwt import DecodeError, ExpiredSignatureError, InvalidTokenError
 from config import settings
 from types import SimpleNamespace
 from fastapi import HTTPException
+from app.helpers.metrics import metrics
 
 
 def has_role(role_list, role_name) -> bool:
@@ -12,7 +17,68 @@ def has_role(role_list, role_name) -> bool:
     return False
 
 
+class TokenCache:
+    """LRU cache of verified tokens, each kept until its exp claim or
+    AUTH_TOKEN_CACHE_TTL seconds, whichever comes first"""
+
+    def __init__(self, max_size=None, max_ttl=None):
+        self.max_size = max_size or settings.AUTH_TOKEN_CACHE_SIZE
+        self.max_ttl = max_ttl or settings.AUTH_TOKEN_CACHE_TTL
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+
+    @staticmethod
+    def key(access_token):
+        # only a digest of the token is kept in memory
+        return hashlib.sha256(access_token.encode()).hexdigest()
+
+    def get(self, access_token):
+        key = self.key(access_token)
+        with self._lock:
+            cached = self._users.get(key)
+            if cached is None:
+                return None
+            user, expires_at = cached
+            if expires_at <= time.time():
+                del self._users[key]
+                return None
+            self._users.move_to_end(key)
+            return user
+
+    def set(self, access_token, user, exp=None):
+        expires_at = time.time() + self.max_ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        key = self.key(access_token)
+        with self._lock:
+            self._users[key] = (user, expires_at)
+            self._users.move_to_end(key)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def __len__(self):
+        return len(self._users)
+
+
+token_cache = TokenCache()
+
+
+@metrics.register_collector
+def collect_token_cache_size(registry):
+    registry.set_gauge('auth_token_cache_size', len(token_cache))
+
+
 def get_current_user(access_token: str):
+    if settings.AUTH_TOKEN_CACHE_SIZE:
+        user = token_cache.get(access_token)
+        if user is not None:
+            metrics.increment('auth_token_cache_hits_total')
+            return SimpleNamespace(**vars(user))
+        metrics.increment('auth_token_cache_misses_total')
     try:
         payload = jwt.decode(
             access_token, settings.JWT_SALT, algorithms=['HS256'])
@@ -25,7 +91,11 @@ def get_current_user(access_token: str):
         user_id = payload.get('identity')
         email = user_claims.get('email')
 
-        return SimpleNamespace(role=role, id=user_id, email=email)
+        user = SimpleNamespace(role=role, id=user_id, email=email)
+        if settings.AUTH_TOKEN_CACHE_SIZE:
+            token_cache.set(access_token, SimpleNamespace(**vars(user)),
+                            payload.get('exp'))
+        return user
 
     except (InvalidTokenError, DecodeError, ExpiredSignatureError) as e:
         print(f"Token error: {e}")
@@ -0,0 +1,39 @@
+import datetime
+from sqlalchemy.orm import Session
+from app.models import TaskCheckpoint
+
+
+def get_checkpoint(db: Session, name):
+    """ Return the checkpoint of a task, locked for update """
+    return db.query(TaskCheckpoint).filter(
+        TaskCheckpoint.name == name).with_for_update().first()
+
+
+def start_run(db: Session, name, summary):
+    """ Reset the checkpoint of a task for a new run """
+    now = datetime.datetime.now()
+    checkpoint = get_checkpoint(db, name)
+    if not checkpoint:
+        checkpoint = TaskCheckpoint(name=name)
+        db.add(checkpoint)
+    checkpoint.last_id = None
+    checkpoint.summary = summary
+    checkpoint.run_started_at = now
+    checkpoint.updated_at = now
+    checkpoint.finished_at = None
+    db.commit()
+    return checkpoint
+
+
+def is_resumable(checkpoint, stale_seconds):
+    """ True when a run was interrupted, it is unfinished and stalled """
+    if not checkpoint or checkpoint.finished_at or not checkpoint.run_started_at:
+        return False
+    idle = datetime.datetime.now() - checkpoint.updated_at
+    return idle.total_seconds() >= stale_seconds
+
+
+def is_running(checkpoint, stale_seconds):
+    if not checkpoint or checkpoint.finished_at or not checkpoint.run_started_at:
+        return False
+    return not is_resumable(checkpoint, stale_seconds)
@@ -0,0 +1,192 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from queue import LifoQueue, Empty
+from config import settings
+from app.helpers.metrics import metrics
+
+
+class AdminConnectionPool:
+    """Bounded pool of admin connections to a single database server.
+
+    Connections are created lazily through `connect`, validated with
+    `is_healthy` before being handed out and closed once they are older
+    than `max_lifetime` seconds. Failed connects are reported to `health`.
+    """
+
+    def __init__(self, name, connect, is_healthy, max_size=None, timeout=None,
+                 max_lifetime=None, ping_interval=None, health=None):
+        self.name = name
+        self._connect = connect
+        self._is_healthy = is_healthy
+        self.health = health
+        self.max_size = max_size or settings.ADMIN_POOL_SIZE
+        self.timeout = timeout if timeout is not None else settings.ADMIN_POOL_TIMEOUT
+        self.max_lifetime = max_lifetime or settings.ADMIN_POOL_MAX_LIFETIME
+        self.ping_interval = ping_interval if ping_interval is not None \
+            else settings.ADMIN_POOL_PING_INTERVAL
+
+        self._idle = LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._lock = threading.Lock()
+        # id(connection) -> time the connection was opened
+        self._opened_at = {}
+        self._in_use = 0
+
+    @property
+    def size(self):
+        return len(self._opened_at)
+
+    def acquire(self):
+        """Borrow a connection, returns False if none could be obtained"""
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            metrics.increment('admin_pool_timeouts_total', pool=self.name)
+            print(f"Timed out waiting for an admin connection to {self.name}")
+            return False
+        metrics.observe('admin_pool_wait_seconds',
+                        time.monotonic() - started, pool=self.name)
+
+        connection = self._take_idle()
+        if not connection:
+            connection = self._open()
+        if not connection:
+            self._slots.release()
+            return False
+
+        with self._lock:
+            self._in_use += 1
+        self._update_gauges()
+        return connection
+
+    def release(self, connection, discard=False):
+        """Return a borrowed connection to the pool"""
+        if discard or self._expired(connection):
+            self._close(connection)
+        else:
+            self._idle.put((connection, time.monotonic()))
+        with self._lock:
+            self._in_use -= 1
+        self._slots.release()
+        self._update_gauges()
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        if not connection:
+            yield False
+            return
+        try:
+            yield connection
+        except BaseException:
+            self.release(connection, discard=not self._check(connection, True))
+            raise
+        self.release(connection)
+
+    def warm_up(self, count=None):
+        """Open up to `count` idle connections ahead of the first request"""
+        count = min(count or settings.ADMIN_POOL_MIN_SIZE, self.max_size)
+        while self.size < count:
+            connection = self._open()
+            if not connection:
+                return False
+            self._idle.put((connection, time.monotonic()))
+        self._update_gauges()
+        return True
+
+    def close_all(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except Empty:
+                break
+            self._close(connection)
+        self._update_gauges()
+
+    def _take_idle(self):
+        while True:
+            try:
+                connection, idle_since = self._idle.get_nowait()
+            except Empty:
+                return None
+            if self._expired(connection):
+                self._close(connection)
+                continue
+            ping = time.monotonic() - idle_since >= self.ping_interval
+            if self._check(connection, ping):
+                return connection
+            metrics.increment('admin_pool_unhealthy_total', pool=self.name)
+            self._close(connection)
+
+    def _open(self):
+        error = None
+        try:
+            connection = self._connect()
+        except Exception as e:
+            print(e)
+            error = e
+            connection = False
+        if not connection:
+            metrics.increment('admin_pool_connect_errors_total', pool=self.name)
+            if self.health:
+                self.health.record_failure(error or 'Unable to connect')
+            return False
+        with self._lock:
+            self._opened_at[id(connection)] = time.monotonic()
+        metrics.increment('admin_pool_connections_opened_total', pool=self.name)
+        return connection
+
+    def _close(self, connection):
+        with self._lock:
+            self._opened_at.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _check(self, connection, ping):
+        try:
+            return self._is_healthy(connection, ping)
+        except Exception:
+            return False
+
+    def _expired(self, connection):
+        opened_at = self._opened_at.get(id(connection))
+        if opened_at is None:
+            return True
+        return time.monotonic() - opened_at >= self.max_lifetime
+
+    def _update_gauges(self):
+        metrics.set_gauge('admin_pool_size', self.size, pool=self.name)
+        metrics.set_gauge('admin_pool_in_use', self._in_use, pool=self.name)
+        metrics.set_gauge('admin_pool_idle', self._idle.qsize(), pool=self.name)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_admin_pool(name, connect, is_healthy, health=None):
+    """Return the process wide pool for `name`, creating it on first use.
+
+    Pools are dropped after a fork so that celery workers never share
+    sockets opened by their parent process.
+    """
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(name)
+        if pool is None:
+            pool = AdminConnectionPool(name, connect, is_healthy, health=health)
+            _pools[name] = pool
+        return pool
+
+
+def close_admin_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
@@ -0,0 +1,129 @@
+from collections import Counter, defaultdict
+from sqlalchemy import case, delete, event, func, inspect, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models import Database, DatabaseCounter
+
+# every live database counts towards 'total', the rest are breakdowns
+STATUSES = ('total', 'disabled', 'admin_disabled', 'revoked')
+
+# advisory lock serialising a rebuild against the deltas written by the
+# listeners, the listeners share it so they never wait on each other
+COUNTERS_LOCK_ID = 0x64626374
+
+
+def database_statuses(flavour_name, deleted, disabled, admin_disabled, revoked):
+    """ Return the (flavour, status) counters a database row adds to """
+    if deleted or not flavour_name:
+        return []
+    statuses = [(flavour_name, 'total')]
+    for status, flag in (('disabled', disabled), ('admin_disabled', admin_disabled),
+                         ('revoked', revoked)):
+        if flag:
+            statuses.append((flavour_name, status))
+    return statuses
+
+
+def count_databases(db: Session):
+    """ Count live databases per flavour and status in one GROUP BY """
+    rows = db.query(
+        Database.database_flavour_name,
+        func.count(Database.id),
+        func.sum(case((Database.disabled == True, 1), else_=0)),
+        func.sum(case((Database.admin_disabled == True, 1), else_=0)),
+        func.sum(case((Database.revoked == True, 1), else_=0))
+    ).filter(
+        Database.deleted == False,
+        Database.database_flavour_name != None
+    ).group_by(Database.database_flavour_name).all()
+
+    counts = defaultdict(dict)
+    for flavour_name, *values in rows:
+        for status, value in zip(STATUSES, values):
+            counts[flavour_name][status] = int(value or 0)
+    return dict(counts)
+
+
+def get_database_counts(db: Session):
+    """ Return {flavour: {status: count}} from the counters table, falling
+    back to counting the rows when it has not been filled yet """
+    rows = db.query(DatabaseCounter).all()
+    if not rows:
+        return count_databases(db)
+    counts = defaultdict(dict)
+    for row in rows:
+        counts[row.database_flavour_name][row.status] = int(row.count)
+    return dict(counts)
+
+
+def rebuild_database_counters(db: Session):
+    """ Replace the counters with a fresh count, fixes any drift.
+
+    The exclusive lock waits for the transactions that already applied a
+    delta and holds off new ones, so none is lost or counted twice.
+    """
+    db.execute(select(func.pg_advisory_xact_lock(COUNTERS_LOCK_ID)))
+    counts = count_databases(db)
+    db.execute(delete(DatabaseCounter))
+    rows = [dict(database_flavour_name=flavour_name, status=status, count=count)
+            for flavour_name, statuses in counts.items()
+            for status, count in statuses.items()]
+    if rows:
+        db.execute(insert(DatabaseCounter), rows)
+    db.commit()
+    return counts
+
+
+def _apply(connection, changes):
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    connection.execute(select(func.pg_advisory_xact_lock_shared(COUNTERS_LOCK_ID)))
+    statement = pg_insert(DatabaseCounter).values([
+        dict(database_flavour_name=flavour_name, status=status, count=delta)
+        for (flavour_name, status), delta in changes.items()
+    ])
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['database_flavour_name', 'status'],
+        set_=dict(count=DatabaseCounter.count + statement.excluded.count)))
+
+
+def _current(target):
+    return database_statuses(target.database_flavour_name, target.deleted,
+                             target.disabled, target.admin_disabled, target.revoked)
+
+
+def previous_values(target, *names):
+    """ Values of `names` as they were before the pending flush """
+    state = inspect(target)
+    values = []
+    for name in names:
+        history = state.attrs[name].history
+        values.append(history.deleted[0] if history.deleted else getattr(target, name))
+    return values
+
+
+def _previous(target):
+    return database_statuses(*previous_values(
+        target, 'database_flavour_name', 'deleted', 'disabled', 'admin_disabled', 'revoked'))
+
+
+# the counters change in the same transaction as the row, so they commit
+# or roll back together
+@event.listens_for(Database, 'after_insert')
+def _count_insert(mapper, connection, target):
+    _apply(connection, Counter(_current(target)))
+
+
+@event.listens_for(Database, 'after_update')
+def _count_update(mapper, connection, target):
+    changes = Counter(_current(target))
+    changes.subtract(Counter(_previous(target)))
+    _apply(connection, changes)
+
+
+@event.listens_for(Database, 'after_delete')
+def _count_delete(mapper, connection, target):
+    changes = Counter()
+    changes.subtract(Counter(_previous(target)))
+    _apply(connection, changes)
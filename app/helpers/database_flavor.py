@@ -1,7 +1,10 @@
 import os
+from threading import Lock
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from types import SimpleNamespace
 from app.helpers.database_service import MysqlDbService, PostgresqlDbService
+from app.helpers.async_database_service import AsyncMysqlDbService, AsyncPostgresqlDbService
 from config import settings
 from datetime import datetime
 from app.models import Database
@@ -33,22 +36,59 @@ db_flavors = {
     }
 }
 
+
+def parse_admin_hosts(hosts, default_host=None, default_port=None):
+    """ Parse "host:port[:max_databases],..." into a list of hosts.
+
+    Falls back to the single default host when no list is configured.
+    """
+    admin_hosts = []
+    for entry in (hosts or '').split(','):
+        if not entry.strip():
+            continue
+        host, _, rest = entry.strip().partition(':')
+        port, _, max_databases = rest.partition(':')
+        admin_hosts.append(SimpleNamespace(
+            host=host,
+            port=int(port or default_port),
+            max_databases=int(
+                max_databases or settings.ADMIN_HOST_MAX_DATABASES)
+        ))
+    if not admin_hosts and default_host:
+        admin_hosts.append(SimpleNamespace(
+            host=default_host,
+            port=int(default_port) if default_port else None,
+            max_databases=settings.ADMIN_HOST_MAX_DATABASES
+        ))
+    return admin_hosts
+
+
 # Database flavours
 database_flavours = [
     {
         'name': 'mysql',
         'host': settings.ADMIN_MYSQL_HOST,
         'port': settings.ADMIN_MYSQL_PORT,
-        'class': MysqlDbService()
+        'hosts': parse_admin_hosts(settings.ADMIN_MYSQL_HOSTS,
+                                   settings.ADMIN_MYSQL_HOST, settings.ADMIN_MYSQL_PORT or 3306),
+        'class': MysqlDbService(),
+        'async_class': AsyncMysqlDbService()
     },
     {
         'name': 'postgres',
         'host': settings.ADMIN_PSQL_HOST,
         'port': settings.ADMIN_PSQL_PORT,
-        'class': PostgresqlDbService()
+        'hosts': parse_admin_hosts(settings.ADMIN_PSQL_HOSTS,
+                                   settings.ADMIN_PSQL_HOST, settings.ADMIN_PSQL_PORT or 5432),
+        'class': PostgresqlDbService(),
+        'async_class': AsyncPostgresqlDbService()
     }
 ]
 
+# services for hosts other than the default one, created on first use
+_host_services = {}
+_host_services_lock = Lock()
+
 
 def get_db_flavour(flavour_name=None):
     if flavour_name == 'mysql':
@@ -59,11 +99,39 @@ def get_db_flavour(flavour_name=None):
         return False
 
 
+def get_flavour_service(db_flavour, host=None, port=None, is_async=True):
+    """ Return the admin service of a flavour for the given host """
+    default_service = db_flavour['async_class' if is_async else 'class']
+    if not host or (host == default_service.host
+                    and str(port) == str(default_service.port)):
+        return default_service
+    key = (db_flavour['name'], host, str(port), is_async)
+    with _host_services_lock:
+        if key not in _host_services:
+            _host_services[key] = type(default_service)(host=host, port=port)
+        return _host_services[key]
+
+
+def get_database_service(database, is_async=True):
+    """ Return the admin service for the server holding the database """
+    db_flavour = get_db_flavour(database.database_flavour_name)
+    if not db_flavour:
+        return None
+    return get_flavour_service(
+        db_flavour, database.host, database.port, is_async=is_async)
+
+
+def get_all_flavour_services(is_async=True):
+    """ Return the admin services of every configured host """
+    return [get_flavour_service(flavour, admin_host.host, admin_host.port, is_async=is_async)
+            for flavour in database_flavours for admin_host in flavour['hosts']]
+
+
 def get_all_db_flavours():
     return database_flavours
 
 
-def disable_database_flavour(database: Database, db: Session, is_admin=False):
+async def disable_database_flavour(database: Database, db: Session, is_admin=False):
     if database.disabled:
         return SimpleNamespace(
             message="Database is already disabled",
@@ -71,24 +139,17 @@ def disable_database_flavour(database: Database, db: Session, is_admin=False):
         )
 
     # get connection
-    db_flavour = get_db_flavour(database.database_flavour_name)
-    database_service = db_flavour['class']
+    database_service = get_database_service(database)
     database_connection = database_service.check_db_connection()
 
     if not database_connection:
         return SimpleNamespace(
             message="Failed to connect to the database service",
-            status_code=500
+            status_code=503
         )
 
-    if (db_flavour['name'] == 'postgres'):
-
-        disable_database = database_service.disable_user_log_in(
-            database.user)
-
-    else:
-        disable_database = database_service.disable_user_log_in(
-            database.user, database.password)
+    disable_database = await database_service.disable_user_log_in(
+        database.user, database.password)
 
     if not disable_database:
         return SimpleNamespace(
@@ -99,7 +160,7 @@ def disable_database_flavour(database: Database, db: Session, is_admin=False):
         database.disabled = True
         if is_admin:
             database.admin_disabled = True
-        db.commit()
+        await run_in_threadpool(db.commit)
         return True
     except Exception as err:
         return SimpleNamespace(
@@ -108,7 +169,7 @@ def disable_database_flavour(database: Database, db: Session, is_admin=False):
         )
 
 
-def enable_database_flavour(database: Database, db: Session):
+async def enable_database_flavour(database: Database, db: Session):
     if not database.disabled:
         return SimpleNamespace(
             message="Database is not disabled",
@@ -116,24 +177,17 @@ def enable_database_flavour(database: Database, db: Session):
         )
 
     # get connection
-    db_flavour = get_db_flavour(database.database_flavour_name)
-    database_service = db_flavour['class']
+    database_service = get_database_service(database)
     database_connection = database_service.check_db_connection()
 
     if not database_connection:
         return SimpleNamespace(
             message="Failed to connect to the database service",
-            status_code=500
+            status_code=503
         )
 
-    # Enable the postgres databases
-
-    if (db_flavour['name'] == 'postgres'):
-        enable_database = database_service.enable_user_log_in(
-            database.user)
-    else:
-        enable_database = database_service.enable_user_log_in(
-            database.user, database.password)
+    enable_database = await database_service.enable_user_log_in(
+        database.user, database.password)
 
     if not enable_database:
         return SimpleNamespace(
@@ -143,7 +197,7 @@ def enable_database_flavour(database: Database, db: Session):
     try:
         database.disabled = False
         database.admin_disabled = False
-        db.commit()
+        await run_in_threadpool(db.commit)
         return True
     except Exception as err:
         return SimpleNamespace(
@@ -154,22 +208,41 @@ def enable_database_flavour(database: Database, db: Session):
 
 def revoke_database(database: Database):
     # get connection
-    db_flavour = get_db_flavour(database.database_flavour_name)
-    database_service = db_flavour['class']
+    database_service = get_database_service(database, is_async=False)
     database_connection = database_service.check_db_connection()
 
     if not database_connection:
         return SimpleNamespace(
             message="Failed to connect to the database service",
+            status_code=503
+        )
+
+    revoke_database = database_service.disable_user_access(
+        database.name, database.user)
+
+    if not revoke_database:
+        return SimpleNamespace(
+            message="Unable to revoke database",
             status_code=500
         )
 
-    if (db_flavour['name'] == 'postgres'):
-        revoke_database = database_service.disable_user_access(
-            database.name, database.user)
-    else:
-        revoke_database = database_service.disable_user_access(
-            database.name, database.user)
+    database.revoked = True
+    return True
+
+
+async def revoke_database_async(database: Database):
+    """ Same as revoke_database, for use from the API routes """
+    database_service = get_database_service(database)
+    database_connection = database_service.check_db_connection()
+
+    if not database_connection:
+        return SimpleNamespace(
+            message="Failed to connect to the database service",
+            status_code=503
+        )
+
+    revoke_database = await database_service.disable_user_access(
+        database.name, database.user)
 
     if not revoke_database:
         return SimpleNamespace(
@@ -177,27 +250,23 @@ def revoke_database(database: Database):
             status_code=500
         )
 
+    database.revoked = True
     return True
 
 
-def undo_database_revoke(database: Database):
+async def undo_database_revoke(database: Database):
     # get connection
-    db_flavour = get_db_flavour(database.database_flavour_name)
-    database_service = db_flavour['class']
+    database_service = get_database_service(database)
     database_connection = database_service.check_db_connection()
 
     if not database_connection:
         return SimpleNamespace(
             message="Failed to connect to the database service",
-            status_code=500
+            status_code=503
         )
 
-    if (db_flavour['name'] == 'postgres'):
-        revoke_database = database_service.enable_user_write_access(
-            database.name, database.user)
-    else:
-        revoke_database = database_service.enable_user_write_access(
-            database.name, database.user)
+    revoke_database = await database_service.enable_user_write_access(
+        database.name, database.user)
 
     if not revoke_database:
         return SimpleNamespace(
@@ -205,30 +274,37 @@ def undo_database_revoke(database: Database):
             status_code=500
         )
 
+    database.revoked = False
     return True
 
 
-def failed_database_connection(current_user, operation):
+def failed_database_connection(current_user, operation, database_service=None):
     log_data = {
         "operation": operation,
         "status": "Failed",
-        "user_id": current_user["id"],
-        "user_email": current_user["email"],
+        "user_id": current_user.id,
+        "user_email": current_user.email,
         "model": "Database",
         "description": "Failed to connect to this database"
     }
     send_async_log_message(log_data)
-    return SimpleNamespace(
-        status_code=500,
-        message="Failed to connect to the database service"
+    headers = None
+    if database_service:
+        headers = {"Retry-After": str(
+            database_service.get_health().retry_after() or 1)}
+    raise HTTPException(
+        status_code=503,
+        detail="Failed to connect to the database service",
+        headers=headers
     )
 
 
 def database_not_found(current_user, operation, database_id):
     log_data = {
         "operation": operation,
+        "a_db_id": database_id,
         "status": "Failed",
-        "user_id": current_user["id"],
+        "user_id": current_user.id,
         "model": "Database",
         "description": f"Failed to get Database with ID: {database_id}"
     }
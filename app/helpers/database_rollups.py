@@ -0,0 +1,119 @@
+import datetime
+from collections import Counter
+from sqlalchemy import Date, cast, delete, event, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models import Database, DatabaseDailyCount
+from app.helpers.database_counters import previous_values
+
+GRAPH_PERIODS = ('year', 'month', 'week', 'day')
+
+
+def period_start(day, set_by):
+    """ First day of the year, month or ISO week holding `day` """
+    if set_by == 'year':
+        return datetime.date(day.year, 1, 1)
+    if set_by == 'month':
+        return datetime.date(day.year, day.month, 1)
+    if set_by == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    return day
+
+
+def next_period(start, set_by):
+    if set_by == 'year':
+        return datetime.date(start.year + 1, 1, 1)
+    if set_by == 'month':
+        return datetime.date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    if set_by == 'week':
+        return start + datetime.timedelta(weeks=1)
+    return start + datetime.timedelta(days=1)
+
+
+def get_graph_data(db: Session, start, end, set_by, flavour_name=None):
+    """ Return [(period start, databases created)] for every period from
+    `start` to `end`, empty periods included """
+    first = period_start(start, set_by)
+    last = next_period(period_start(end, set_by), set_by)
+
+    query = db.query(DatabaseDailyCount.day, func.sum(DatabaseDailyCount.count)).filter(
+        DatabaseDailyCount.day >= first,
+        DatabaseDailyCount.day < last)
+    if flavour_name:
+        query = query.filter(
+            DatabaseDailyCount.database_flavour_name == flavour_name)
+
+    totals = Counter()
+    for day, count in query.group_by(DatabaseDailyCount.day).all():
+        totals[period_start(day, set_by)] += int(count or 0)
+
+    graph_data = []
+    period = first
+    while period < last:
+        graph_data.append((period, totals[period]))
+        period = next_period(period, set_by)
+    return graph_data
+
+
+def get_creation_totals(db: Session):
+    """ Return {flavour: databases} summed over the whole rollup """
+    rows = db.query(
+        DatabaseDailyCount.database_flavour_name,
+        func.sum(DatabaseDailyCount.count)
+    ).group_by(DatabaseDailyCount.database_flavour_name).all()
+    return {flavour_name: int(count or 0) for flavour_name, count in rows}
+
+
+def rebuild_daily_counts(db: Session):
+    """ Recount the rollup from user_databases """
+    day = cast(Database.date_created, Date)
+    flavour_name = func.coalesce(Database.database_flavour_name, '')
+    db.execute(delete(DatabaseDailyCount))
+    db.execute(insert(DatabaseDailyCount).from_select(
+        ['day', 'database_flavour_name', 'count'],
+        select(day, flavour_name, func.count(Database.id)).where(
+            Database.date_created != None).group_by(day, flavour_name)))
+    db.commit()
+
+
+def _apply(connection, changes):
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    statement = pg_insert(DatabaseDailyCount).values([
+        dict(day=day, database_flavour_name=flavour_name, count=delta)
+        for (day, flavour_name), delta in changes.items()
+    ])
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['day', 'database_flavour_name'],
+        set_=dict(count=DatabaseDailyCount.count + statement.excluded.count)))
+
+
+def _bucket(date_created, flavour_name):
+    if date_created is None:
+        return []
+    return [(date_created.date(), flavour_name or '')]
+
+
+def _previous_bucket(target):
+    return _bucket(*previous_values(target, 'date_created', 'database_flavour_name'))
+
+
+@event.listens_for(Database, 'after_insert')
+def _rollup_insert(mapper, connection, target):
+    _apply(connection, Counter(
+        _bucket(target.date_created, target.database_flavour_name)))
+
+
+@event.listens_for(Database, 'after_update')
+def _rollup_update(mapper, connection, target):
+    changes = Counter(_bucket(target.date_created, target.database_flavour_name))
+    changes.subtract(Counter(_previous_bucket(target)))
+    _apply(connection, changes)
+
+
+@event.listens_for(Database, 'after_delete')
+def _rollup_delete(mapper, connection, target):
+    changes = Counter()
+    changes.subtract(Counter(_previous_bucket(target)))
+    _apply(connection, changes)
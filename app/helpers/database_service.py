@@ -1,11 +1,13 @@
-
 import mysql.connector as mysql_conn
 import psycopg2
 from psycopg2 import sql
 import secrets
 import string
+from contextlib import contextmanager
 from types import SimpleNamespace
 from config import settings
+from app.helpers.connection_pool import get_admin_pool
+from app.helpers.health import get_host_health
 
 
 def generate_db_credentials():
@@ -26,10 +28,91 @@ def generate_db_credentials():
 
 class DatabaseService:
 
+    flavour = None
+
     def __init__(self):
         self.Error = None
+        self.ConnectionErrors = ()
+
+    @property
+    def pool_name(self):
+        return f"{self.flavour}://{self.host}:{self.port}"
+
+    def get_admin_pool(self):
+        """ Return the shared admin connection pool for this server """
+        return get_admin_pool(
+            self.pool_name, self.create_connection, self.is_connection_healthy,
+            health=self.get_health())
+
+    def get_health(self):
+        """ Return the health tracker and circuit breaker for this server """
+        return get_host_health(self.pool_name)
+
+    @contextmanager
+    def admin_connection(self):
+        """ Borrow a pooled admin connection, yields False on failure or
+        while the circuit breaker for the server is open """
+        health = self.get_health()
+        if not health.allow_request():
+            yield False
+            return
+        with self.get_admin_pool().connection() as connection:
+            if not connection:
+                health.cancel_trial()
+                yield False
+                return
+            try:
+                yield connection
+            except self.ConnectionErrors as e:
+                health.record_failure(e)
+                raise
+            except BaseException:
+                # the server answered, the statement itself failed
+                health.record_success()
+                raise
+            health.record_success()
+
+    @contextmanager
+    def admin_cursor(self, db_name=None):
+        """ Yield a cursor on an admin connection and give it back afterwards.
+
+        Connections to a specific database are not pooled, they are opened
+        for the duration of the block only.
+        """
+        if db_name:
+            connection = self.create_connection(db_name=db_name)
+            if not connection:
+                yield None
+                return
+            try:
+                cursor = connection.cursor()
+                try:
+                    yield cursor
+                finally:
+                    cursor.close()
+            finally:
+                connection.close()
+            return
+
+        with self.admin_connection() as connection:
+            if not connection:
+                yield None
+                return
+            cursor = connection.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def warm_up(self):
+        """ Open the minimum number of pooled admin connections """
+        return self.get_admin_pool().warm_up()
+
+    def is_connection_healthy(self, connection, ping=False):
+        """ Validate a pooled connection before it is reused """
+        pass
 
-    def create_connection(self):
+    def create_connection(self, db_name=None):
         """ Create a connection to db server """
         pass
 
@@ -46,8 +129,32 @@ class DatabaseService:
         pass
 
     def check_db_connection(self):
-        """Validates if one is able to connect to Database server returns True or False"""
-        pass
+        """Validates if one is able to connect to Database server returns True or False.
+
+        This reads the cached health state, it does not open a connection.
+        """
+        return self.get_health().is_available()
+
+    def probe(self):
+        """ Ping the admin server and record the outcome on its health state """
+        health = self.get_health()
+        pool = self.get_admin_pool()
+        connection = pool.acquire()
+        if not connection:
+            # failed connects are recorded by the pool itself
+            return False
+        error = None
+        try:
+            healthy = self.is_connection_healthy(connection, ping=True)
+        except Exception as e:
+            error = e
+            healthy = False
+        pool.release(connection, discard=not healthy)
+        if healthy:
+            health.record_success()
+        else:
+            health.record_failure(error or 'Health check failed')
+        return healthy
 
     # create database user
     def create_user(self, user=None, password=None):
@@ -72,6 +179,10 @@ class DatabaseService:
         """Return size of the database"""
         pass
 
+    def collect_all_sizes(self, db_names=None):
+        """Return {db_name: size_in_bytes} for the databases on the host"""
+        pass
+
     # Show all databases
     def get_all_databases(self):
         """Return list of databases"""
@@ -84,51 +195,54 @@ class DatabaseService:
 
 
 class MysqlDbService(DatabaseService):
-    def __init__(self):
+
+    flavour = 'mysql'
+
+    def __init__(self, host=None, port=None):
         super(DatabaseService, self).__init__()
         self.Error = mysql_conn.Error
+        self.ConnectionErrors = (
+            mysql_conn.errors.OperationalError, mysql_conn.errors.InterfaceError)
+        self.host = host or settings.ADMIN_MYSQL_HOST
+        self.port = port or settings.ADMIN_MYSQL_PORT
 
-    def create_connection(self):
+    def create_connection(self, db_name=None):
         try:
             super_connection = mysql_conn.connect(
-                host=settings.ADMIN_MYSQL_HOST,
+                host=self.host,
                 user=settings.ADMIN_MYSQL_USER,
                 password=settings.ADMIN_MYSQL_PASSWORD,
-                port=settings.ADMIN_MYSQL_PORT
+                port=self.port,
+                database=db_name,
+                connection_timeout=settings.ADMIN_CONNECT_TIMEOUT
             )
+            # Pooled connections outlive a single operation
+            super_connection.autocommit = True
             return super_connection
         except self.Error as e:
             print(e)
             return False
 
+    def is_connection_healthy(self, connection, ping=False):
+        if not ping:
+            return True
+        return connection.is_connected()
+
     def create_db_connection(self, user=None, password=None, db_name=None):
         try:
             user_connection = mysql_conn.connect(
-                host=settings.ADMIN_MYSQL_HOST,
+                host=self.host,
                 user=user,
                 password=password,
-                port=settings.ADMIN_MYSQL_PORT,
-                database=db_name
+                port=self.port,
+                database=db_name,
+                connection_timeout=settings.ADMIN_CONNECT_TIMEOUT
             )
             return user_connection
         except self.Error as e:
             print(e)
             return False
 
-    def check_db_connection(self):
-        try:
-            super_connection = self.create_connection()
-            if not super_connection:
-                return False
-            return True
-        except self.Error as e:
-            return False
-        finally:
-            if not super_connection:
-                return False
-            if (super_connection.is_connected()):
-                super_connection.close()
-
     def check_user_db_rights(self, user=None, password=None, db_name=None):
         try:
             user_connection = self.create_db_connection(
@@ -148,32 +262,37 @@ class MysqlDbService(DatabaseService):
     # Create or check user exists database
     def create_database(self, db_name=None, user=None, password=None):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"CREATE DATABASE {db_name}")
-            if self.create_user(user=user, password=password):
-                cursor.execute(
-                    f"GRANT ALL PRIVILEGES ON {db_name}.* To '{user}'@'%'")
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                return self._create_database(
+                    cursor, db_name=db_name, user=user, password=password)
         except self.Error as e:
             print(e)
             return False
-        finally:
-            if not connection:
-                return False
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
+
+    def _create_database(self, cursor, db_name=None, user=None, password=None):
+        cursor.execute(f"CREATE DATABASE {db_name}")
+        if not self._create_user(cursor, user=user, password=password):
+            # nobody could use it, do not leave it behind
+            cursor.execute(f"DROP DATABASE {db_name}")
+            return False
+        cursor.execute(
+            f"GRANT ALL PRIVILEGES ON {db_name}.* To '{user}'@'%'")
+        return True
 
     # create database user
     def create_user(self, user=None, password=None):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                return self._create_user(cursor, user=user, password=password)
+        except self.Error:
+            return False
+
+    def _create_user(self, cursor, user=None, password=None):
+        try:
             cursor.execute(
                 f"CREATE USER '{user}'@'%' IDENTIFIED BY '{password}' ")
             return True
@@ -181,12 +300,6 @@ class MysqlDbService(DatabaseService):
             if e.errno == '1396':
                 return True
             return False
-        finally:
-            if not connection:
-                return False
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
 
     def get_database_size(self, db_name=None, user=None, password=None):
         try:
@@ -216,242 +329,201 @@ class MysqlDbService(DatabaseService):
     # reset password for database user
     def reset_password(self, user=None, password=None):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(
-                f"ALTER USER '{user}'@'%' IDENTIFIED BY '{password}'")
-
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(
+                    f"ALTER USER '{user}'@'%' IDENTIFIED BY '{password}'")
+                return True
         except self.Error:
             return False
-        finally:
-            if not connection:
-                return False
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
 
     # delete database user
     def delete_user(self, user=None):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"DROP USER '{user}' ")
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(f"DROP USER '{user}' ")
+                return True
         except self.Error:
             return False
-        finally:
-            if not connection:
-                return False
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
 
     # delete database
     def delete_database(self, db_name):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"DROP DATABASE {db_name}")
-            # TODO: Need to delete users too
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(f"DROP DATABASE {db_name}")
+                # TODO: Need to delete users too
+                return True
         except self.Error:
             return False
-        finally:
-            if not connection:
-                return False
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
 
     def reset_database(self, db_name=None, user=None, password=None):
         try:
-            connection = self.create_connection()
             user_rights = self.check_user_db_rights(
                 db_name=db_name, user=user, password=password)
-
-            if not connection or not user_rights:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"DROP DATABASE {db_name}")
-            created_db = self.create_database(
-                db_name=db_name, user=user, password=password)
-            if not created_db:
-                return False
-            return True
+            if not user_rights:
+                return False
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(f"DROP DATABASE {db_name}")
+                return self._create_database(
+                    cursor, db_name=db_name, user=user, password=password)
         except self.Error:
             return False
-        finally:
-            if not connection or not user_rights:
-                return False
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
+
+    # Sizes of all databases on the host in bytes
+    def collect_all_sizes(self, db_names=None):
+        query = """SELECT s.schema_name,
+            COALESCE(SUM(t.data_length + t.index_length), 0)
+            FROM information_schema.SCHEMATA s
+            LEFT JOIN information_schema.TABLES t
+            ON t.table_schema = s.schema_name"""
+        params = ()
+        if db_names is not None:
+            if not db_names:
+                return {}
+            query += " WHERE s.schema_name IN ({})".format(
+                ', '.join(['%s'] * len(db_names)))
+            params = tuple(db_names)
+        query += " GROUP BY s.schema_name"
+        try:
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(query, params)
+                sizes = {}
+                for name, size in cursor.fetchall():
+                    if isinstance(name, (bytes, bytearray)):
+                        name = name.decode()
+                    sizes[name] = int(size)
+                return sizes
+        except self.Error as e:
+            print(e)
+            return False
 
     # Show all databases
     def get_all_databases(self):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute("SHOW DATABASES")
-            database_list = []
-            for db in cursor:
-                database_list.append(db[0].decode())
-            return database_list
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute("SHOW DATABASES")
+                database_list = []
+                for db in cursor:
+                    database_list.append(db[0].decode())
+                return database_list
         except self.Error:
             return False
-        finally:
-            if not connection:
-                return False
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
 
     # Show users
     def get_all_users(self):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute("SELECT user FROM mysql.user GROUP BY user")
-            users_list = []
-            for db in cursor:
-                users_list.append(db[0].decode())
-            return users_list
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute("SELECT user FROM mysql.user GROUP BY user")
+                users_list = []
+                for db in cursor:
+                    users_list.append(db[0].decode())
+                return users_list
         except self.Error:
             return False
-        finally:
-            if not connection:
-                return False
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
 
     def get_server_status(self):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute("SHOW GLOBAL STATUS")
-            # cursor.fetchall()
-            return {
-                'status': 'success',
-                'data': 'online'
-            }
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return {
+                        'status': 'error',
+                        'message': 'Unable to connect to database'}
+                cursor.execute("SHOW GLOBAL STATUS")
+                cursor.fetchall()
+                return {
+                    'status': 'success',
+                    'data': 'online'
+                }
         except self.Error:
             return {
                 'status': 'error',
                 'message': 'Error has occured'}
 
-        finally:
-            if not connection:
-                return {
-                    'status': 'error',
-                    'message': 'Unable to connect to database'}
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
-
     def disable_user_access(self, db_name, db_user_name):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-
-            cursor.execute(f"REVOKE ALL PRIVILEGES ON {db_name}.* FROM {db_user_name}")
-
-            cursor.execute(f"GRANT SELECT, DELETE ON {db_name}.* TO {db_user_name}")
-
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(
+                    f"REVOKE ALL PRIVILEGES ON {db_name}.* FROM {db_user_name}")
+                cursor.execute(
+                    f"GRANT SELECT, DELETE ON {db_name}.* TO {db_user_name}")
+                return True
         except self.Error as e:
             print(e)
             return False
-        finally:
-            if not connection:
-                return False
-            cursor.close()
-            connection.close()
 
     def enable_user_write_access(self, db_name, db_user_name):
         try:
-            connection = self.create_connection(db_name=db_name)
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"GRANT ALL PRIVILEGES ON {db_name}.* TO {db_user_name}")
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(
+                    f"GRANT ALL PRIVILEGES ON {db_name}.* TO {db_user_name}")
+                return True
         except self.Error as e:
             print(e)
             return False
-        finally:
-            if not connection:
-                return False
-            cursor.close()
-            connection.close()
 
     # disable user database log in
     def disable_user_log_in(self, db_user_name, db_user_pw):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"ALTER USER {db_user_name} IDENTIFIED BY '{db_user_pw}'ACCOUNT LOCK")
-
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(
+                    f"ALTER USER {db_user_name} IDENTIFIED BY '{db_user_pw}'ACCOUNT LOCK")
+                return True
         except self.Error:
             return False
-        finally:
-            if not connection:
-                return False
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
 
     # enable user database log in
     def enable_user_log_in(self, db_user_name, db_user_pw):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"ALTER USER {db_user_name} IDENTIFIED BY '{db_user_pw}'ACCOUNT UNLOCK")
-
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(
+                    f"ALTER USER {db_user_name} IDENTIFIED BY '{db_user_pw}'ACCOUNT UNLOCK")
+                return True
         except self.Error:
             return False
-        finally:
-            if not connection:
-                return False
-            if (connection.is_connected()):
-                cursor.close()
-                connection.close()
 
 
 class PostgresqlDbService(DatabaseService):
 
-    def __init__(self):
+    flavour = 'postgres'
+
+    def __init__(self, host=None, port=None):
         super(DatabaseService, self).__init__()
         self.Error = psycopg2.Error
+        self.ConnectionErrors = (
+            psycopg2.OperationalError, psycopg2.InterfaceError)
+        self.host = host or settings.ADMIN_PSQL_HOST
+        self.port = port or settings.ADMIN_PSQL_PORT
 
-    def create_connection(self):
+    def create_connection(self, db_name=None):
         try:
             super_connection = psycopg2.connect(
-                host=settings.ADMIN_PSQL_HOST,
+                host=self.host,
                 user=settings.ADMIN_PSQL_USER,
                 password=settings.ADMIN_PSQL_PASSWORD,
-                port=settings.ADMIN_PSQL_PORT
+                port=self.port,
+                database=db_name,
+                connect_timeout=settings.ADMIN_CONNECT_TIMEOUT
             )
             super_connection.autocommit = True
             return super_connection
@@ -459,28 +531,23 @@ class PostgresqlDbService(DatabaseService):
             print(e)
             return False
 
-    def check_db_connection(self):
-        super_connection = None
-        try:
-            super_connection = self.create_connection()
-            if not super_connection:
-                return False
-            return True
-        except self.Error as e:
+    def is_connection_healthy(self, connection, ping=False):
+        if connection.closed:
             return False
-        finally:
-            if not super_connection:
-                return False
-            super_connection.close()
+        if ping:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        return True
 
     def create_db_connection(self, user=None, password=None, db_name=None):
         try:
             user_connection = psycopg2.connect(
-                host=settings.ADMIN_PSQL_HOST,
+                host=self.host,
                 user=user,
                 password=password,
-                port=settings.ADMIN_PSQL_PORT,
-                database=db_name
+                port=self.port,
+                database=db_name,
+                connect_timeout=settings.ADMIN_CONNECT_TIMEOUT
             )
             return user_connection
         except self.Error as e:
@@ -506,105 +573,82 @@ class PostgresqlDbService(DatabaseService):
     # Create or check user exists database
     def create_database(self, db_name=None, user=None, password=None):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            if self.create_user(user=user, password=password):
-                cursor.execute(
-                    sql.SQL(f'CREATE DATABASE {db_name} WITH OWNER = {user}'))
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                return self._create_database(
+                    cursor, db_name=db_name, user=user, password=password)
         except self.Error:
             return False
-        finally:
-            if not connection:
-                return False
-            cursor.close()
-            connection.close()
+
+    def _create_database(self, cursor, db_name=None, user=None, password=None):
+        if not self._create_user(cursor, user=user, password=password):
+            return False
+        cursor.execute(
+            sql.SQL(f'CREATE DATABASE {db_name} WITH OWNER = {user}'))
+        return True
 
     # create database user
     def create_user(self, user=None, password=None):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                return self._create_user(cursor, user=user, password=password)
+        except self.Error:
+            return False
+
+    def _create_user(self, cursor, user=None, password=None):
+        try:
             cursor.execute(
                 f"CREATE USER {user} WITH ENCRYPTED PASSWORD '{password}'")
-            connection.commit()
             return True
         except self.Error as e:
             print(e)
             if e.pgcode == '42710':
                 return True
             return False
-        finally:
-            if not connection:
-                return False
-            cursor.close()
-            connection.close()
 
     # delete database user
     def delete_user(self, user=None):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"DROP USER {user} ")
-            connection.commit()
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(f"DROP USER {user} ")
+                return True
         except self.Error as e:
             if e.pgcode == '42704':
                 return True
             return False
-        finally:
-            if not connection:
-                return False
-            cursor.close()
-            connection.close()
 
     # delete database
     def delete_database(self, db_name):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"DROP DATABASE {db_name}")
-            # TODO: Need to delete users too
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(f"DROP DATABASE {db_name}")
+                # TODO: Need to delete users too
+                return True
         except self.Error as e:
             print(e)
             return False
-        finally:
-            if not connection:
-                return False
-            cursor.close()
-            connection.close()
 
     def reset_database(self, db_name=None, user=None, password=None):
         try:
-            connection = self.create_connection()
             user_rights = self.check_user_db_rights(
                 db_name=db_name, user=user, password=password)
-
-            if not connection or not user_rights:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"DROP DATABASE {db_name}")
-            created_db = self.create_database(
-                db_name=db_name, user=user, password=password)
-            if not created_db:
-                return False
-            return True
+            if not user_rights:
+                return False
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(f"DROP DATABASE {db_name}")
+                return self._create_database(
+                    cursor, db_name=db_name, user=user, password=password)
         except self.Error:
             return False
-        finally:
-            if not connection or not user_rights:
-                return False
-            cursor.close()
-            connection.close()
 
     def get_database_size(self, db_name=None, user=None, password=None):
         try:
@@ -627,173 +671,150 @@ class PostgresqlDbService(DatabaseService):
             cursor.close()
             connection.close()
 
+    # Sizes of all databases on the host in bytes
+    def collect_all_sizes(self, db_names=None):
+        query = """SELECT datname, pg_database_size(datname)
+            FROM pg_database WHERE NOT datistemplate"""
+        params = ()
+        if db_names is not None:
+            if not db_names:
+                return {}
+            query += " AND datname = ANY(%s)"
+            params = (list(db_names),)
+        try:
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(query, params)
+                return {name: int(size) for name, size in cursor.fetchall()}
+        except self.Error as e:
+            print(e)
+            return False
+
     # Show all databases
     def get_all_databases(self):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute("SELECT datname FROM pg_database")
-            database_list = []
-            for db in cursor:
-                database_list.append(db[0])
-            return database_list
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute("SELECT datname FROM pg_database")
+                database_list = []
+                for db in cursor:
+                    database_list.append(db[0])
+                return database_list
         except self.Error:
             return False
-        finally:
-            if not connection:
-                return False
-            cursor.close()
-            connection.close()
 
     # Show users
     def get_all_users(self):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(
-                "SELECT usename FROM pg_catalog.pg_user")
-            users_list = []
-            for db in cursor:
-                users_list.append(db[0])
-            return users_list
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(
+                    "SELECT usename FROM pg_catalog.pg_user")
+                users_list = []
+                for db in cursor:
+                    users_list.append(db[0])
+                return users_list
         except self.Error:
             return False
-        finally:
-            if not connection:
-                return False
-            cursor.close()
-            connection.close()
 
     # reset database user password
     def reset_password(self, user=None, password=None):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(
-                f"ALTER USER {user} WITH ENCRYPTED PASSWORD '{password}'")
-            connection.commit()
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(
+                    f"ALTER USER {user} WITH ENCRYPTED PASSWORD '{password}'")
+                return True
         except self.Error:
             return False
-        finally:
-            if not connection:
-                return False
-            cursor.close()
-            connection.close()
 
     def get_server_status(self):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute("SELECT pg_is_in_recovery()")
-
-            for db in cursor:
-                if db[0]:
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return {
+                        'status': 'error',
+                        'message': 'Unable to connect to database'}
+                cursor.execute("SELECT pg_is_in_recovery()")
+                in_recovery = cursor.fetchone()[0]
+                if in_recovery:
                     return {
                         'status': 'failed',
                         'message': 'in recovery'}
-                else:
-                    return {
-                        'status': 'success',
-                        'message': 'online'}
+                return {
+                    'status': 'success',
+                    'message': 'online'}
         except self.Error:
             return {
                 'status': 'error',
                 'message': 'Error has occured'}
-        finally:
-            if not connection:
-                return {
-                    'status': 'error',
-                    'message': 'Unable to connect to database'}
-
-            cursor.close()
-            connection.close()
 
     def disable_user_access(self, db_name, db_user_name):
         """Grants read and delete access to the specified user, revoking write and update privileges."""
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"REVOKE INSERT, UPDATE ON DATABASE {db_name} FROM {db_user_name}")
-            cursor.execute(
-                f"REVOKE INSERT, UPDATE ON ALL TABLES IN SCHEMA public FROM {db_user_name}")
-            cursor.execute(
-                f"REVOKE USAGE ON SCHEMA public FROM {db_user_name}")
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(
+                    f"REVOKE INSERT, UPDATE ON DATABASE {db_name} FROM {db_user_name}")
+                cursor.execute(
+                    f"REVOKE INSERT, UPDATE ON ALL TABLES IN SCHEMA public FROM {db_user_name}")
+                cursor.execute(
+                    f"REVOKE USAGE ON SCHEMA public FROM {db_user_name}")
+                return True
         except self.Error as e:
             print(e)
             return False
-        finally:
-            if not connection:
-                return False
-            cursor.close()
-            connection.close()
 
     def enable_user_write_access(self, db_name, db_user_name):
         try:
-            connection = self.create_connection(db_name=db_name)
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"GRANT INSERT, UPDATE ON DATABASE {db_name} TO {db_user_name}")
-            cursor.execute(
-                f"GRANT INSERT, UPDATE ON ALL TABLES IN SCHEMA public TO {db_user_name}")
-            cursor.execute(f"GRANT USAGE ON SCHEMA public TO {db_user_name}")
-            return True
+            # Schema grants only apply to the database we are connected to
+            with self.admin_cursor(db_name=db_name) as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(
+                    f"GRANT INSERT, UPDATE ON DATABASE {db_name} TO {db_user_name}")
+                cursor.execute(
+                    f"GRANT INSERT, UPDATE ON ALL TABLES IN SCHEMA public TO {db_user_name}")
+                cursor.execute(
+                    f"GRANT USAGE ON SCHEMA public TO {db_user_name}")
+                return True
         except self.Error as e:
             print(e)
             return False
-        finally:
-            if not connection:
-                return False
-            cursor.close()
-            connection.close()
 
     # disable user database log in
 
     def disable_user_log_in(self, db_user_name):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"ALTER USER {db_user_name} NOLOGIN")
-
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(f"ALTER USER {db_user_name} NOLOGIN")
+                return True
         except self.Error as e:
             print(e)
             return False
-        finally:
-            if not connection:
-                return False
-            cursor.close()
-            connection.close()
 
     # enable user database log in
     def enable_user_log_in(self, db_user_name):
         try:
-            connection = self.create_connection()
-            if not connection:
-                return False
-            cursor = connection.cursor()
-            cursor.execute(f"ALTER USER {db_user_name} WITH LOGIN")
-
-            return True
+            with self.admin_cursor() as cursor:
+                if not cursor:
+                    return False
+                cursor.execute(f"ALTER USER {db_user_name} WITH LOGIN")
+                return True
         except self.Error as e:
             print(e)
             return False
-        finally:
-            if not connection:
-                return False
-            cursor.close()
-            connection.close()
+
+
+def warm_up_admin_pools(database_services):
+    """ Open the configured minimum of admin connections for every service """
+    for database_service in database_services:
+        if not database_service.warm_up():
+            print(f"Unable to warm up admin pool {database_service.pool_name}")
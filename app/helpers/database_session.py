@@ -1,13 +1,36 @@
 from app.database import SessionLocal
-from fastapi import Depends
+from app.helpers.replicas import caller_key, choose_read_session, mark_recent_write, has_replicas
+from fastapi import Depends, Query, Request
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from typing import Annotated
 
-def get_db():
+def get_db(request: Request = None):
   db = SessionLocal()
+  key = caller_key(request)
+  if key and has_replicas():
+    # the caller's next reads go to the primary so they see this write
+    event.listen(db, 'after_commit', lambda session: mark_recent_write(key))
   try:
     yield db
   finally:
-    db.close
+    db.close()
 
-db_dependency = Annotated[Session, Depends(get_db)]
\ No newline at end of file
+def get_read_db(request: Request = None):
+  """ Session for read only routes, served by a replica when possible """
+  db = choose_read_session(caller_key(request))()
+  try:
+    yield db
+  finally:
+    db.close()
+
+def get_fresh_or_read_db(request: Request = None, fresh: bool = Query(False)):
+  """ Primary session for ?fresh=true, which stores what it measures, a read
+  session otherwise. Stickiness is left to choose_read_session. """
+  sessions = get_db(request) if fresh else get_read_db(request)
+  try:
+    yield next(sessions)
+  finally:
+    sessions.close()
+
+db_dependency = Annotated[Session, Depends(get_db)]
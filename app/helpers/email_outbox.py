@@ -0,0 +1,166 @@
+import asyncio
+import datetime
+import time
+from email.message import EmailMessage
+import aiosmtplib
+from fastapi_mail.connection import Connection
+from sqlalchemy import delete, func
+from sqlalchemy.orm import Session
+from config import settings
+from app.database import SessionLocal
+from app.models import EmailOutbox
+from app.helpers.email import conf
+from app.helpers.metrics import metrics
+
+
+def queue_email(db: Session, subject, recipients, body,
+                template_name='database_limit.html'):
+    """ Add an email to the outbox, it is sent by the delivery worker once
+    the caller commits.
+    """
+    message = EmailOutbox(
+        template_name=template_name,
+        subject=subject,
+        recipients=[str(recipient) for recipient in recipients],
+        body=body,
+        status='pending',
+        attempts=0,
+        next_attempt_at=datetime.datetime.now()
+    )
+    db.add(message)
+    metrics.increment('emails_queued_total', template=template_name)
+    return message
+
+
+def claim_outbox_batch(db: Session, now=None):
+    """ Lease the next due messages for EMAIL_SEND_LEASE seconds so other
+    workers skip them, returns the claimed rows.
+    """
+    now = now or datetime.datetime.now()
+    messages = db.query(EmailOutbox).filter(
+        EmailOutbox.status == 'pending',
+        EmailOutbox.next_attempt_at <= now
+    ).order_by(EmailOutbox.next_attempt_at).\
+        limit(settings.EMAIL_BATCH_SIZE).\
+        with_for_update(skip_locked=True).all()
+    for message in messages:
+        message.next_attempt_at = now + datetime.timedelta(
+            seconds=settings.EMAIL_SEND_LEASE)
+    db.commit()
+    return messages
+
+
+def retry_delay(attempts):
+    """ Seconds to wait before the next attempt, doubling per attempt """
+    return min(settings.EMAIL_RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0),
+               settings.EMAIL_RETRY_MAX_DELAY)
+
+
+def record_failure(message, error, now=None):
+    """ Schedule a retry for a message, or give up on it after
+    EMAIL_MAX_ATTEMPTS. Returns True when the message is given up on.
+    """
+    now = now or datetime.datetime.now()
+    message.attempts = (message.attempts or 0) + 1
+    message.last_error = str(error)[:500]
+    if message.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        message.status = 'failed'
+        metrics.increment('emails_failed_total', template=message.template_name)
+        return True
+    message.next_attempt_at = now + datetime.timedelta(
+        seconds=retry_delay(message.attempts))
+    metrics.increment('email_retries_total', template=message.template_name)
+    return False
+
+
+def build_email(message, template):
+    email = EmailMessage()
+    email['Subject'] = message.subject
+    email['From'] = conf.MAIL_FROM
+    email['To'] = ', '.join(message.recipients)
+    email.set_content(template.render(**(message.body or {})), subtype='html')
+    return email
+
+
+async def send_outbox(db: Session):
+    """ Send due outbox messages in batches over a single SMTP connection """
+    summary = dict(sent=0, retried=0, failed=0)
+    messages = claim_outbox_batch(db)
+    if not messages:
+        return summary
+
+    # templates are loaded once and reused for every message of the run
+    environment = conf.template_engine()
+    templates = {}
+    done = set()
+    try:
+        async with Connection(conf) as connection:
+            while messages:
+                done = set()
+                for message in messages:
+                    try:
+                        template = templates.get(message.template_name)
+                        if template is None:
+                            template = templates[message.template_name] = \
+                                environment.get_template(message.template_name)
+                        email = build_email(message, template)
+                        started = time.monotonic()
+                        if not conf.SUPPRESS_SEND:
+                            await connection.session.send_message(email)
+                        metrics.observe('email_send_seconds',
+                                        time.monotonic() - started)
+                        message.status = 'sent'
+                        message.sent_at = datetime.datetime.now()
+                        summary['sent'] += 1
+                        metrics.increment('emails_sent_total',
+                                          template=message.template_name)
+                    except aiosmtplib.SMTPServerDisconnected:
+                        # the rest of the batch can not go over this connection
+                        raise
+                    except Exception as e:
+                        print(f"Sending email {message.id} failed: {e}")
+                        summary['failed' if record_failure(message, e) else 'retried'] += 1
+                    done.add(message.id)
+                db.commit()
+                if summary['sent'] + summary['retried'] + summary['failed'] >= \
+                        settings.EMAIL_MAX_PER_RUN:
+                    break
+                messages = claim_outbox_batch(db)
+    except Exception as e:
+        # could not connect or lost the connection, retry the unsent messages
+        print(f"Email delivery failed: {e}")
+        for message in messages:
+            if message.id in done or message.status != 'pending':
+                continue
+            summary['failed' if record_failure(message, e) else 'retried'] += 1
+        db.commit()
+    return summary
+
+
+def deliver_outbox(db: Session):
+    """ Run one delivery pass over the outbox, returns counts by outcome """
+    return asyncio.run(send_outbox(db))
+
+
+def prune_outbox(db: Session):
+    """ Delete sent messages older than EMAIL_OUTBOX_RETENTION_DAYS """
+    cutoff = datetime.datetime.now() - datetime.timedelta(
+        days=settings.EMAIL_OUTBOX_RETENTION_DAYS)
+    result = db.execute(delete(EmailOutbox).where(
+        EmailOutbox.status == 'sent', EmailOutbox.sent_at < cutoff))
+    db.commit()
+    return result.rowcount
+
+
+@metrics.register_collector
+def collect_outbox_depth(registry):
+    db = SessionLocal()
+    try:
+        depth, oldest = db.query(
+            func.count(EmailOutbox.id), func.min(EmailOutbox.date_created)
+        ).filter(EmailOutbox.status == 'pending').one()
+    finally:
+        db.close()
+    registry.set_gauge('email_outbox_depth', depth)
+    registry.set_gauge('email_outbox_oldest_seconds',
+                       (datetime.datetime.now() - oldest).total_seconds() if oldest else 0)
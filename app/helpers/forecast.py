@@ -0,0 +1,121 @@
+import datetime
+import numpy as np
+from types import SimpleNamespace
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from config import settings
+from app.models import Database, DatabaseSizeSample
+from app.helpers.placement import DEFAULT_ALLOCATED_SIZE_KB
+
+SECONDS_PER_DAY = 86400
+
+
+def fit_growth(codes, timestamps, sizes, count):
+    """ Fit a least squares growth line for every database in one pass.
+
+    `codes` maps each sample to a database index below `count`. Returns
+    per database arrays of the slope in bytes per second, the latest size,
+    the time of the latest sample and the number of samples.
+    """
+    samples = np.bincount(codes, minlength=count).astype(float)
+    safe_samples = np.maximum(samples, 1)
+    # centre each series on its mean so the sums stay well conditioned
+    mean_time = np.bincount(codes, weights=timestamps, minlength=count) / safe_samples
+    mean_size = np.bincount(codes, weights=sizes, minlength=count) / safe_samples
+    time_offsets = timestamps - mean_time[codes]
+    size_offsets = sizes - mean_size[codes]
+    sxx = np.bincount(codes, weights=time_offsets * time_offsets, minlength=count)
+    sxy = np.bincount(codes, weights=time_offsets * size_offsets, minlength=count)
+    slopes = np.divide(sxy, sxx, out=np.zeros(count), where=sxx > 0)
+
+    latest_size = np.full(count, np.nan)
+    latest_time = np.full(count, np.nan)
+    if len(codes):
+        order = np.lexsort((timestamps, codes))
+        ordered_codes = codes[order]
+        last = order[np.r_[np.nonzero(np.diff(ordered_codes))[0], len(order) - 1]]
+        latest_size[codes[last]] = sizes[last]
+        latest_time[codes[last]] = timestamps[last]
+    return slopes, latest_size, latest_time, samples
+
+
+def time_to_full(slopes, latest_size, allocated):
+    """ Seconds until each database reaches its allocation, inf if never """
+    remaining = allocated - latest_size
+    seconds = np.full(len(slopes), np.inf)
+    growing = (slopes > 0) & (remaining > 0)
+    seconds[growing] = remaining[growing] / slopes[growing]
+    seconds[remaining <= 0] = 0
+    return seconds
+
+
+def forecast_databases(db: Session, database_ids=None, now=None):
+    """ Forecast growth and time to full from the stored size samples.
+
+    Samples are averaged per hour over the last FORECAST_WINDOW_DAYS.
+    Returns {database_id: forecast} for databases with enough samples.
+    """
+    now = now or datetime.datetime.now()
+    since = now - datetime.timedelta(days=settings.FORECAST_WINDOW_DAYS)
+
+    hour = func.date_trunc('hour', DatabaseSizeSample.sampled_at)
+    query = db.query(
+        DatabaseSizeSample.database_id, hour, func.avg(DatabaseSizeSample.size_bytes)
+    ).filter(DatabaseSizeSample.sampled_at >= since)
+    if database_ids is not None:
+        query = query.filter(DatabaseSizeSample.database_id.in_(database_ids))
+    rows = query.group_by(DatabaseSizeSample.database_id, hour).all()
+    if not rows:
+        return {}
+
+    ids = list({row[0] for row in rows})
+    index = {database_id: position for position, database_id in enumerate(ids)}
+    codes = np.fromiter((index[row[0]] for row in rows), dtype=np.int64, count=len(rows))
+    timestamps = np.fromiter(((row[1] - since).total_seconds() for row in rows),
+                             dtype=float, count=len(rows))
+    sizes = np.fromiter((float(row[2]) for row in rows), dtype=float, count=len(rows))
+
+    allocations = dict(db.query(Database.id, Database.allocated_size_kb).filter(
+        Database.id.in_(ids)).all())
+    allocated = np.array([
+        float(allocations.get(database_id) or DEFAULT_ALLOCATED_SIZE_KB) * 1024
+        for database_id in ids])
+
+    slopes, latest_size, latest_time, samples = fit_growth(
+        codes, timestamps, sizes, len(ids))
+    seconds = time_to_full(slopes, latest_size, allocated)
+
+    forecasts = {}
+    for position, database_id in enumerate(ids):
+        if samples[position] < settings.FORECAST_MIN_SAMPLES:
+            continue
+        seconds_to_full = float(seconds[position])
+        # the clock starts at the latest sample, not now
+        latest_at = since + datetime.timedelta(seconds=float(latest_time[position]))
+        full_at = None
+        if np.isfinite(seconds_to_full):
+            full_at = latest_at + datetime.timedelta(seconds=seconds_to_full)
+        forecasts[database_id] = SimpleNamespace(
+            growth_bytes_per_day=float(slopes[position] * SECONDS_PER_DAY),
+            latest_bytes=int(latest_size[position]),
+            allocated_bytes=int(allocated[position]),
+            days_to_full=max((full_at - now).total_seconds(), 0) / SECONDS_PER_DAY
+            if full_at else None,
+            full_at=full_at,
+            samples=int(samples[position])
+        )
+    return forecasts
+
+
+def update_forecasts(db: Session):
+    """ Refit the whole fleet and store the growth rate and projected full
+    date on each database """
+    forecasts = forecast_databases(db)
+    if forecasts:
+        db.execute(update(Database), [
+            dict(id=database_id, growth_bytes_per_day=forecast.growth_bytes_per_day,
+                 forecast_full_at=forecast.full_at)
+            for database_id, forecast in forecasts.items()
+        ])
+    db.commit()
+    return forecasts
@@ -0,0 +1,148 @@
+import threading
+import time
+from config import settings
+from app.helpers.metrics import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class HostHealth:
+    """Health state and circuit breaker for a single admin server.
+
+    The breaker opens after `failure_threshold` consecutive failures and
+    rejects requests until `reset_timeout` seconds have passed. It then
+    half opens and lets a single trial through, a success closes it again
+    while a failure re-opens it.
+    """
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.ADMIN_HEALTH_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or settings.ADMIN_HEALTH_RESET_TIMEOUT
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self.last_checked = None
+        self.last_error = None
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and \
+                time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+        return self._state
+
+    def is_available(self):
+        """Whether a request would currently be let through, without taking the trial slot"""
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and not self._trial_in_flight)
+
+    def allow_request(self):
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+        metrics.increment('admin_host_rejected_total', host=self.name)
+        return False
+
+    def cancel_trial(self):
+        """Give the half open trial slot back when no attempt was made"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def retry_after(self):
+        with self._lock:
+            if self._state != OPEN:
+                return 0
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            return max(int(remaining) + 1, 1)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self.last_checked = time.time()
+            self.last_error = None
+            self._set_state(CLOSED)
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            self.last_checked = time.time()
+            self.last_error = str(error) if error else None
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+        metrics.increment('admin_host_failures_total', host=self.name)
+
+    def _set_state(self, state):
+        self._state = state
+        metrics.set_gauge('admin_host_breaker_state',
+                          STATE_VALUES[state], host=self.name)
+        metrics.set_gauge('admin_host_up', int(state == CLOSED), host=self.name)
+
+    def to_dict(self):
+        return dict(
+            host=self.name,
+            state=self.state,
+            last_checked=self.last_checked,
+            last_error=self.last_error
+        )
+
+
+_hosts = {}
+_hosts_lock = threading.Lock()
+
+
+def get_host_health(name):
+    with _hosts_lock:
+        health = _hosts.get(name)
+        if health is None:
+            health = HostHealth(name)
+            _hosts[name] = health
+        return health
+
+
+class HealthProber:
+    """Background thread that pings every admin server at a fixed interval"""
+
+    def __init__(self, database_services, interval=None):
+        self.database_services = database_services
+        self.interval = interval or settings.ADMIN_HEALTH_PROBE_INTERVAL
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='admin-health-prober', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def probe_all(self):
+        for database_service in self.database_services:
+            database_service.probe()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe_all()
+            self._stop.wait(self.interval)
@@ -0,0 +1,211 @@
+import json
+import os
+import socket
+import threading
+import time
+from config import settings
+from app.helpers.metrics import metrics
+
+# a segment being written ends in .open, a full one in .log and one being
+# replayed in .draining
+OPEN_SUFFIX = '.open'
+CLOSED_SUFFIX = '.log'
+DRAINING_SUFFIX = '.draining'
+
+
+class LogSpool:
+    """Append-only spool of JSON lines split over segment files.
+
+    Each process appends to its own open segment, closed segments are
+    replayed oldest first by whichever process claims them. Segment names
+    are `{creation time in ns}-{host}-{pid}{suffix}` so they sort in order
+    and tell which process owns them.
+    """
+
+    def __init__(self, directory, segment_bytes=None, max_bytes=None,
+                 fsync_policy=None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes or settings.ACTIVITY_SPOOL_SEGMENT_BYTES
+        self.max_bytes = max_bytes or settings.ACTIVITY_SPOOL_MAX_BYTES
+        self.fsync_policy = fsync_policy or settings.ACTIVITY_SPOOL_FSYNC
+        self._lock = threading.Lock()
+        self.hostname = socket.gethostname()
+        self._file = None
+        self._path = None
+        self._pid = None
+        self._last_fsync = 0
+
+    def append(self, events):
+        """ Write events to the open segment, rotating it when full """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            if self._file is not None and (
+                    self._pid != os.getpid() or not os.path.exists(self._path)):
+                # a forked child must not write to its parent's segment, and
+                # one recovered by another process is no longer ours
+                self._forget_segment()
+            if self._file is None:
+                self._pid = os.getpid()
+                self._path = os.path.join(
+                    self.directory,
+                    f'{time.time_ns()}-{self.hostname}-{self._pid}{OPEN_SUFFIX}')
+                self._file = open(self._path, 'a', encoding='utf-8')
+            for event in events:
+                self._file.write(json.dumps(event, default=str) + '\n')
+            self._file.flush()
+            if self.fsync_policy == 'always' or (
+                    self.fsync_policy == 'interval' and
+                    time.monotonic() - self._last_fsync >= settings.ACTIVITY_SPOOL_FSYNC_INTERVAL):
+                os.fsync(self._file.fileno())
+                self._last_fsync = time.monotonic()
+            if self._file.tell() >= self.segment_bytes:
+                self._close_segment()
+        metrics.increment('activity_logs_spooled_total', len(events))
+        self._enforce_limit()
+
+    def rotate(self):
+        """ Close the open segment so it can be replayed """
+        with self._lock:
+            self._close_segment()
+
+    def _close_segment(self):
+        if self._file is None:
+            return
+        if self._pid != os.getpid():
+            self._forget_segment()
+            return
+        try:
+            if self.fsync_policy != 'never':
+                os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self._path, self._path[:-len(OPEN_SUFFIX)] + CLOSED_SUFFIX)
+        except FileNotFoundError:
+            # already recovered by another process, which replays it
+            pass
+        finally:
+            self._file = None
+            self._path = None
+
+    def _forget_segment(self):
+        """ Drop the open segment without closing it out """
+        try:
+            self._file.close()
+        except OSError:
+            pass
+        self._file = None
+        self._path = None
+
+    def _segments(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            (name for name in names
+             if name.endswith((OPEN_SUFFIX, CLOSED_SUFFIX, DRAINING_SUFFIX))),
+            key=lambda name: int(name.split('-', 1)[0]))
+
+    def _owner_alive(self, name):
+        """ True or False when the process owning a segment is running, None
+        when it is on another host and can not be checked from here """
+        owner = name[:name.rindex('.')].split('-', 1)[1]
+        host, _, pid = owner.rpartition('-')
+        if host and host != self.hostname:
+            return None
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            # running under another user
+            pass
+        return True
+
+    def _recover_stale(self, name):
+        """ Reopen segments left behind by a process that went away """
+        path = os.path.join(self.directory, name)
+        if path == self._path:
+            return None
+        try:
+            alive = self._owner_alive(name)
+            if alive:
+                return None
+            if alive is None and time.time() - os.path.getmtime(path) < \
+                    settings.ACTIVITY_SPOOL_STALE_SECONDS:
+                return None
+            closed = path[:path.rindex('.')] + CLOSED_SUFFIX
+            os.replace(path, closed)
+            return os.path.basename(closed)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def claim_oldest(self):
+        """ Claim the oldest closed segment, returns (path, events) or None """
+        if self._path and not any(
+                name.endswith(CLOSED_SUFFIX) for name in self._segments()):
+            # nothing else to replay, hand over what this process spooled
+            self.rotate()
+        for name in self._segments():
+            if not name.endswith(CLOSED_SUFFIX):
+                name = self._recover_stale(name)
+                if not name:
+                    continue
+            path = os.path.join(self.directory, name)
+            claimed = path[:-len(CLOSED_SUFFIX)] + DRAINING_SUFFIX
+            try:
+                # the rename is atomic, another process may win it
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue
+            with open(claimed, encoding='utf-8') as segment:
+                events = [json.loads(line) for line in segment if line.strip()]
+            return claimed, events
+        return None
+
+    def release(self, path, remaining):
+        """ Finish a claimed segment, keeping the events not replayed yet """
+        if remaining:
+            closed = path[:-len(DRAINING_SUFFIX)] + CLOSED_SUFFIX
+            temporary = closed + '.tmp'
+            with open(temporary, 'w', encoding='utf-8') as segment:
+                for event in remaining:
+                    segment.write(json.dumps(event, default=str) + '\n')
+                segment.flush()
+                if self.fsync_policy != 'never':
+                    os.fsync(segment.fileno())
+            os.replace(temporary, closed)
+        os.remove(path)
+
+    def _enforce_limit(self):
+        """ Drop the oldest closed segments once over max_bytes """
+        segments = self._segments()
+        sizes = {}
+        for name in segments:
+            try:
+                sizes[name] = os.path.getsize(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+        total = sum(sizes.values())
+        for name in segments:
+            if total <= self.max_bytes:
+                break
+            if not name.endswith(CLOSED_SUFFIX) or name not in sizes:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            total -= sizes[name]
+            metrics.increment('activity_spool_dropped_segments_total')
+
+    def stats(self):
+        """ Return (bytes, segments, seconds since the oldest segment began) """
+        total = 0
+        segments = self._segments()
+        for name in segments:
+            try:
+                total += os.path.getsize(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+        lag = time.time() - int(segments[0].split('-', 1)[0]) / 1e9 if segments else 0
+        return total, len(segments), lag
@@ -1,8 +1,14 @@
+import atexit
+import queue
+import threading
+import time
 import requests
 from functools import wraps
 import datetime
 from config import settings
-from threading import Thread
+from app.helpers.metrics import metrics
+from app.helpers.log_spool import LogSpool
+from app.helpers.audit import record_audit_event
 
 DEFAULT_DATA = {
     "creation_date": str(datetime.datetime.now()),
@@ -13,15 +19,24 @@ DEFAULT_DATA = {
 def send_log_message(data):
     temp_data = {
         **DEFAULT_DATA, **data}
+    record_audit_event(temp_data)
+
+    if activity_log_shipper.is_backing_off():
+        # the logger is down, do not wait on another connect timeout
+        activity_log_shipper.spool_events([temp_data])
+        return
 
     logger_url = settings.ACTIVITY_LOGGER_URL
     headers = {"Content-Type": "application/json"}
     try:
         response = requests.post(
-            f'{logger_url}/api/activities', headers=headers, json=temp_data)
+            f'{logger_url}/api/activities', headers=headers, json=temp_data,
+            timeout=settings.ACTIVITY_LOG_TIMEOUT)
         response.raise_for_status()
     except Exception as e:
         print(f"Error occurred while sending log message: {str(e)}")
+        activity_log_shipper.spool_events([temp_data])
+        activity_log_shipper._back_off()
 
 
 def log_response(func):
@@ -39,7 +54,188 @@ def log_response(func):
     return wrapper
 
 
+class ActivityLogShipper:
+    """Background thread that ships queued activity logs in batches over
+    one keep-alive HTTP session.
+
+    Events that can not be delivered go to the spool, which is replayed
+    with backoff once the logger answers again.
+    """
+
+    def __init__(self, queue_size=None, batch_size=None, flush_interval=None,
+                 full_policy=None, spool=None):
+        self.batch_size = batch_size or settings.ACTIVITY_LOG_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.ACTIVITY_LOG_FLUSH_INTERVAL
+        self.full_policy = full_policy or settings.ACTIVITY_LOG_FULL_POLICY
+        self._queue = queue.Queue(
+            maxsize=queue_size or settings.ACTIVITY_LOG_QUEUE_SIZE)
+        self._session = requests.Session()
+        self.spool = spool
+        self._retry_delay = 0
+        self._retry_at = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='activity-log-shipper', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        """ Stop the thread and send whatever is still queued """
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout or self.flush_interval + settings.ACTIVITY_LOG_TIMEOUT)
+        self.flush()
+
+    def submit(self, data):
+        """ Queue a log event, returns False when it had to be dropped """
+        if not self._stop.is_set():
+            self.start()
+        event = {**DEFAULT_DATA,
+                 "creation_date": str(datetime.datetime.now()), **data}
+        try:
+            if self.full_policy == 'block':
+                self._queue.put(event, timeout=settings.ACTIVITY_LOG_BLOCK_TIMEOUT)
+            else:
+                self._queue.put_nowait(event)
+        except queue.Full:
+            metrics.increment('activity_logs_dropped_total')
+            return False
+        metrics.increment('activity_logs_queued_total')
+        return True
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """ Send everything queued right now from the calling thread """
+        while True:
+            batch = self._take(self.batch_size)
+            if not batch:
+                return
+            self.ship(batch)
+
+    def is_backing_off(self):
+        return self.spool is not None and time.monotonic() < self._retry_at
+
+    def spool_events(self, events):
+        if self.spool is None or not events:
+            return
+        try:
+            self.spool.append(events)
+        except OSError as e:
+            metrics.increment('activity_logs_dropped_total', len(events))
+            print(f"Error occurred while spooling log messages: {str(e)}")
+
+    def _post(self, event):
+        response = self._session.post(
+            f'{settings.ACTIVITY_LOGGER_URL}/api/activities', json=event,
+            timeout=settings.ACTIVITY_LOG_TIMEOUT)
+        response.raise_for_status()
+
+    def _back_off(self):
+        self._retry_delay = min(
+            max(self._retry_delay * 2, settings.ACTIVITY_SPOOL_RETRY_BASE_DELAY),
+            settings.ACTIVITY_SPOOL_RETRY_MAX_DELAY)
+        self._retry_at = time.monotonic() + self._retry_delay
+
+    def ship(self, batch):
+        """ Post a batch of events, each one is its own activity """
+        if self.is_backing_off():
+            self.spool_events(batch)
+            return
+        started = time.monotonic()
+        for index, event in enumerate(batch):
+            try:
+                self._post(event)
+                metrics.increment('activity_logs_sent_total')
+            except Exception as e:
+                metrics.increment('activity_logs_failed_total')
+                print(f"Error occurred while sending log message: {str(e)}")
+                if self.spool is not None:
+                    # the rest would most likely fail the same way
+                    self.spool_events(batch[index:])
+                    self._back_off()
+                    break
+        metrics.observe('activity_log_batch_seconds', time.monotonic() - started)
+
+    def drain_spool(self):
+        """ Replay the oldest spooled segment, returns the events sent """
+        if self.spool is None or self.is_backing_off():
+            return 0
+        try:
+            claimed = self.spool.claim_oldest()
+        except (OSError, ValueError) as e:
+            print(f"Error occurred while reading the log spool: {str(e)}")
+            return 0
+        if not claimed:
+            return 0
+        path, events = claimed
+        sent = 0
+        for event in events:
+            try:
+                self._post(event)
+            except Exception:
+                self._back_off()
+                break
+            sent += 1
+        else:
+            self._retry_delay = 0
+        self.spool.release(path, events[sent:])
+        metrics.increment('activity_logs_replayed_total', sent)
+        return sent
+
+    def _take(self, count):
+        batch = []
+        while len(batch) < count:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                self.drain_spool()
+                continue
+            # wait for a full batch or until the flush interval is up
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.ship(batch)
+            self.drain_spool()
+
+
+activity_log_shipper = ActivityLogShipper(
+    spool=LogSpool(settings.ACTIVITY_SPOOL_DIR) if settings.ACTIVITY_SPOOL_DIR else None)
+atexit.register(activity_log_shipper.stop)
+
+
+@metrics.register_collector
+def collect_activity_log_depth(registry):
+    registry.set_gauge('activity_log_queue_depth', activity_log_shipper.depth())
+    if activity_log_shipper.spool is not None:
+        size, segments, lag = activity_log_shipper.spool.stats()
+        registry.set_gauge('activity_spool_bytes', size)
+        registry.set_gauge('activity_spool_segments', segments)
+        registry.set_gauge('activity_spool_lag_seconds', lag)
+
+
 def send_async_log_message(data):
-    
-    thread = Thread(target=send_log_message, args=(data,))
-    thread.start()
+    record_audit_event(data)
+    activity_log_shipper.submit(data)
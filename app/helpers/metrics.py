@@ -0,0 +1,84 @@
+import threading
+from collections import defaultdict
+
+
+def _metric_key(name, labels):
+    if not labels:
+        return name
+    label_str = ','.join(
+        f'{key}="{value}"' for key, value in sorted(labels.items()))
+    return f'{name}{{{label_str}}}'
+
+
+class MetricsRegistry:
+    """Thread safe in-process store for counters, gauges and timings"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._timings = {}
+        self._collectors = []
+
+    def increment(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[_metric_key(name, labels)] += value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_metric_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _metric_key(name, labels)
+        with self._lock:
+            timing = self._timings.setdefault(
+                key, {'count': 0, 'sum': 0.0, 'max': 0.0})
+            timing['count'] += 1
+            timing['sum'] += value
+            timing['max'] = max(timing['max'], value)
+
+    def register_collector(self, collector):
+        """Register a callable that refreshes gauges right before they are read"""
+        self._collectors.append(collector)
+        return collector
+
+    def collect(self):
+        for collector in self._collectors:
+            try:
+                collector(self)
+            except Exception as e:
+                print(f"Metrics collector {collector.__name__} failed: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'timings': {key: dict(value) for key, value in self._timings.items()}
+            }
+
+    def render_prometheus(self):
+        """Return all metrics in the prometheus text exposition format"""
+        self.collect()
+        data = self.snapshot()
+        lines = []
+        for key, value in sorted(data['counters'].items()):
+            lines.append(f'{key} {value}')
+        for key, value in sorted(data['gauges'].items()):
+            lines.append(f'{key} {value}')
+        for key, timing in sorted(data['timings'].items()):
+            name, _, labels = key.partition('{')
+            labels = '{' + labels if labels else ''
+            lines.append(f'{name}_count{labels} {timing["count"]}')
+            lines.append(f'{name}_sum{labels} {timing["sum"]}')
+            lines.append(f'{name}_max{labels} {timing["max"]}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,68 @@
+from collections import defaultdict
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.models import Database
+from app.helpers.email_outbox import queue_email
+from app.helpers.metrics import metrics
+
+
+def get_notified_owners(db: Session, owner_ids):
+    """ Return the owners among `owner_ids` that were already warned """
+    if not owner_ids:
+        return set()
+    rows = db.query(Database.owner_id).filter(
+        Database.owner_id.in_(owner_ids),
+        Database.notified == True
+    ).distinct().all()
+    return {owner_id for owner_id, in rows}
+
+
+def queue_capping_digests(db: Session, events):
+    """ Queue one email per owner for the capping events of a run.
+
+    `events` is a list of (database, outcome, used_kb) with outcome
+    'revoked' or 'warning'. Warnings are dropped for owners that were
+    already notified, revocations are always reported. The caller commits.
+    Returns the number of databases warned about.
+    """
+    by_owner = defaultdict(list)
+    for database, outcome, used_kb in events:
+        by_owner[database.owner_id].append((database, outcome, used_kb))
+    notified_owners = get_notified_owners(db, list(by_owner))
+
+    warned = []
+    for owner_id, owner_events in by_owner.items():
+        if owner_id in notified_owners:
+            owner_events = [event for event in owner_events if event[1] == 'revoked']
+        if not owner_events:
+            continue
+
+        databases = []
+        for database, outcome, used_kb in owner_events:
+            databases.append(dict(
+                name=database.name,
+                status=outcome,
+                used_kb=used_kb,
+                allocated_kb=database.allocated_size_kb,
+                percent=round(100 * used_kb / database.allocated_size_kb)
+                if database.allocated_size_kb else 100
+            ))
+            if outcome == 'warning':
+                warned.append(database.id)
+
+        recipients = sorted({str(database.email) for database, _, _ in owner_events
+                             if database.email})
+        if not recipients:
+            continue
+        subject = "Database Revoked" if any(
+            event[1] == 'revoked' for event in owner_events) else \
+            "Warning: Database Storage Almost Full"
+        queue_email(db, subject, recipients,
+                    dict(email=', '.join(recipients), databases=databases),
+                    template_name='database_digest.html')
+        metrics.increment('capping_digests_total')
+
+    if warned:
+        db.execute(update(Database), [
+            dict(id=database_id, notified=True) for database_id in warned])
+    return len(warned)
@@ -0,0 +1,22 @@
+import base64
+import datetime
+import json
+import uuid
+
+
+def encode_cursor(date_created, database_id):
+    """ Opaque cursor pointing just past the given (date_created, id) """
+    raw = json.dumps([date_created.isoformat(), str(database_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """ Return the (date_created, id) a cursor points past, raises
+    ValueError when it was not made by encode_cursor """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        date_created, database_id = json.loads(raw)
+        return (datetime.datetime.fromisoformat(date_created),
+                uuid.UUID(database_id))
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
@@ -0,0 +1,105 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from config import settings
+from app.models import Database, StandbyDatabase
+from app.helpers.database_flavor import get_db_flavour, get_flavour_service
+from app.helpers.metrics import metrics
+
+# allocation given to a database that does not record one
+DEFAULT_ALLOCATED_SIZE_KB = 1048576
+
+
+def get_host_usage(db: Session, flavour_name):
+    """ Return {(host, port): usage} for the databases of a flavour.
+
+    Standby databases count towards their host as they will be handed
+    out with the default allocation.
+    """
+    usage = {}
+    rows = db.query(
+        Database.host, Database.port,
+        func.count(Database.id),
+        func.coalesce(func.sum(Database.allocated_size_kb), 0),
+        func.avg(Database.probe_latency_ms)
+    ).filter(
+        Database.database_flavour_name == flavour_name,
+        Database.deleted == False
+    ).group_by(Database.host, Database.port).all()
+    for host, port, count, allocated_kb, latency in rows:
+        usage[(host, port)] = dict(
+            count=count, allocated_kb=int(allocated_kb), latency=float(latency or 0))
+
+    standby_rows = db.query(
+        StandbyDatabase.host, StandbyDatabase.port, func.count(StandbyDatabase.id)
+    ).filter(
+        StandbyDatabase.database_flavour_name == flavour_name
+    ).group_by(StandbyDatabase.host, StandbyDatabase.port).all()
+    for host, port, count in standby_rows:
+        host_usage = usage.setdefault(
+            (host, port), dict(count=0, allocated_kb=0, latency=0.0))
+        host_usage['count'] += count
+        host_usage['allocated_kb'] += count * DEFAULT_ALLOCATED_SIZE_KB
+    return usage
+
+
+def _has_capacity(admin_host, usage):
+    if admin_host.max_databases and usage['count'] >= admin_host.max_databases:
+        return False
+    if settings.ADMIN_HOST_MAX_STORAGE_KB and \
+            usage['allocated_kb'] + DEFAULT_ALLOCATED_SIZE_KB > settings.ADMIN_HOST_MAX_STORAGE_KB:
+        return False
+    return True
+
+
+def _score(usage):
+    if settings.PLACEMENT_STRATEGY == 'count':
+        return (usage['count'], usage['allocated_kb'])
+    if settings.PLACEMENT_STRATEGY == 'load':
+        return (usage['latency'], usage['count'])
+    return (usage['allocated_kb'], usage['count'])
+
+
+def place_databases(db: Session, flavour_name, count=1):
+    """ Choose an admin host for each of `count` new databases.
+
+    Hosts whose circuit breaker is open or that reached their capacity are
+    skipped, the rest are ranked by PLACEMENT_STRATEGY. Returns a list of
+    hosts with None for databases that could not be placed.
+    """
+    db_flavour = get_db_flavour(flavour_name)
+    if not db_flavour:
+        return [None] * count
+
+    usage = get_host_usage(db, flavour_name)
+    candidates = []
+    for admin_host in db_flavour['hosts']:
+        service = get_flavour_service(
+            db_flavour, admin_host.host, admin_host.port, is_async=False)
+        if not service.get_health().is_available():
+            continue
+        host_usage = dict(usage.get(
+            (admin_host.host, admin_host.port),
+            dict(count=0, allocated_kb=0, latency=0.0)))
+        candidates.append((admin_host, host_usage))
+
+    placements = []
+    for _ in range(count):
+        available = [(admin_host, host_usage) for admin_host, host_usage in candidates
+                     if _has_capacity(admin_host, host_usage)]
+        if not available:
+            metrics.increment('placement_rejections_total', flavour=flavour_name)
+            placements.append(None)
+            continue
+        admin_host, host_usage = min(
+            available, key=lambda candidate: _score(candidate[1]))
+        host_usage['count'] += 1
+        host_usage['allocated_kb'] += DEFAULT_ALLOCATED_SIZE_KB
+        metrics.increment('placement_decisions_total', flavour=flavour_name,
+                          host=f"{admin_host.host}:{admin_host.port}")
+        placements.append(admin_host)
+    return placements
+
+
+def choose_host(db: Session, flavour_name):
+    """ Return the admin host for a new database, None when all are full """
+    return place_databases(db, flavour_name)[0]
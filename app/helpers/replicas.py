@@ -0,0 +1,102 @@
+import hashlib
+import random
+import threading
+import time
+from sqlalchemy import text
+from app.database import SessionLocal, ReplicaSessionLocals, replica_engines
+from app.helpers.metrics import metrics
+from config import settings
+
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END""")
+
+# {caller key: time until which reads stay on the primary}
+_recent_writers = {}
+_recent_writers_lock = threading.Lock()
+# {replica index: (checked at, lag in seconds or None)}
+_replica_lag = {}
+
+
+def caller_key(request):
+    """ Identify the caller by a hash of its bearer token """
+    if request is None:
+        return None
+    authorization = request.headers.get('authorization')
+    if not authorization:
+        return None
+    return hashlib.sha256(authorization.encode()).hexdigest()
+
+
+def has_replicas():
+    return bool(ReplicaSessionLocals)
+
+
+def mark_recent_write(key):
+    """ Keep the caller's reads on the primary for READ_YOUR_WRITES_SECONDS """
+    if not key:
+        return
+    now = time.monotonic()
+    with _recent_writers_lock:
+        _recent_writers[key] = now + settings.READ_YOUR_WRITES_SECONDS
+        # drop expired entries now and then so the dict stays small
+        if len(_recent_writers) > 10000:
+            for writer, until in list(_recent_writers.items()):
+                if until < now:
+                    del _recent_writers[writer]
+
+
+def has_recent_write(key):
+    if not key:
+        return False
+    with _recent_writers_lock:
+        until = _recent_writers.get(key)
+    return until is not None and until > time.monotonic()
+
+
+def get_replica_lag(index):
+    """ Replication lag of a replica in seconds, None if it cannot be read.
+
+    The value is cached for REPLICA_LAG_CHECK_INTERVAL seconds.
+    """
+    checked_at, lag = _replica_lag.get(index, (None, None))
+    if checked_at is not None and \
+            time.monotonic() - checked_at < settings.REPLICA_LAG_CHECK_INTERVAL:
+        return lag
+    try:
+        with replica_engines[index].connect() as connection:
+            lag = float(connection.execute(REPLICA_LAG_QUERY).scalar() or 0)
+    except Exception as e:
+        print(f"Failed to read replica lag: {e}")
+        lag = None
+    _replica_lag[index] = (time.monotonic(), lag)
+    metrics.set_gauge('replica_lag_seconds', -1 if lag is None else lag,
+                      replica=str(index))
+    return lag
+
+
+def choose_read_session(key=None):
+    """ Return a session factory for reads, the primary when no replica
+    is fresh enough or the caller wrote recently """
+    if not ReplicaSessionLocals:
+        return SessionLocal
+    if has_recent_write(key):
+        metrics.increment('primary_reads_total', reason='recent_write')
+        return SessionLocal
+    indexes = list(range(len(ReplicaSessionLocals)))
+    random.shuffle(indexes)
+    for index in indexes:
+        lag = get_replica_lag(index)
+        if lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS:
+            metrics.increment('replica_reads_total', replica=str(index))
+            return ReplicaSessionLocals[index]
+    metrics.increment('primary_reads_total', reason='replica_lag')
+    return SessionLocal
+
+
+@metrics.register_collector
+def collect_replica_lag(registry):
+    for index in range(len(replica_engines)):
+      get_replica_lag(index)
@@ -0,0 +1,67 @@
+import datetime
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from config import settings
+from app.models import Database, DatabaseSizeSample
+from app.helpers.database_flavor import get_database_service
+from app.helpers.metrics import metrics
+
+
+def record_size_samples(db: Session, sizes, sampled_at=None):
+    """ Store {database_id: size_in_bytes} as samples and update the
+    cached size on each database. The caller commits.
+    """
+    if not sizes:
+        return
+    sampled_at = sampled_at or datetime.datetime.now()
+    db.execute(insert(DatabaseSizeSample), [
+        dict(database_id=database_id, sampled_at=sampled_at, size_bytes=size)
+        for database_id, size in sizes.items()
+    ])
+    db.execute(update(Database), [
+        dict(id=database_id, default_storage_kb=size // 1024,
+             size_sampled_at=sampled_at)
+        for database_id, size in sizes.items()
+    ])
+
+
+def sample_database_sizes(db: Session, databases=None):
+    """ Sample the size of every database, one admin query per host.
+
+    Returns {database_id: size_in_bytes} for the databases that were found.
+    """
+    if databases is None:
+        databases = db.query(Database).filter(Database.deleted == False).all()
+
+    by_host = {}
+    for database in databases:
+        database_service = get_database_service(database, is_async=False)
+        if not database_service:
+            continue
+        by_host.setdefault(database_service.pool_name,
+                           (database_service, []))[1].append(database)
+
+    sizes = {}
+    for database_service, host_databases in by_host.values():
+        host_sizes = database_service.collect_all_sizes(
+            [database.name for database in host_databases])
+        if host_sizes is False:
+            metrics.increment('size_sample_failures_total',
+                              host=database_service.pool_name)
+            continue
+        for database in host_databases:
+            if database.name in host_sizes:
+                sizes[database.id] = host_sizes[database.name]
+
+    record_size_samples(db, sizes)
+    db.commit()
+    metrics.increment('size_samples_total', len(sizes))
+    return sizes
+
+
+def prune_size_samples(db: Session):
+    cutoff = datetime.datetime.now() - datetime.timedelta(
+        days=settings.SIZE_SAMPLE_RETENTION_DAYS)
+    db.execute(delete(DatabaseSizeSample).where(
+        DatabaseSizeSample.sampled_at < cutoff))
+    db.commit()
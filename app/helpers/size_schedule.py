@@ -0,0 +1,52 @@
+import datetime
+import numpy as np
+from config import settings
+
+# a growing database is checked at least this many times before it can fill up
+CHECKS_BEFORE_FULL = 10
+# the interval follows the cube of the headroom, so it falls off fast as a
+# database nears its limit: 50% free waits 1/8 of the range, 5% free 1/8000
+HEADROOM_EXPONENT = 3
+
+
+def next_check_intervals(used_kb, allocated_kb, growth_kb_per_day):
+    """ Seconds until the next size check of each database.
+
+    The interval runs from SIZE_CHECK_MAX_INTERVAL for an empty database
+    down to SIZE_CHECK_MIN_INTERVAL for a full one along a cubic curve of
+    the headroom left. It is shortened further by the projected time to
+    full so fast growers are seen often enough to be stopped in time.
+    """
+    used = np.asarray(used_kb, dtype=float)
+    allocated = np.maximum(np.asarray(allocated_kb, dtype=float), 1)
+    growth = np.nan_to_num(np.asarray(growth_kb_per_day, dtype=float))
+
+    headroom = np.clip(1 - used / allocated, 0, 1)
+    intervals = settings.SIZE_CHECK_MIN_INTERVAL + (
+        settings.SIZE_CHECK_MAX_INTERVAL - settings.SIZE_CHECK_MIN_INTERVAL
+    ) * headroom ** HEADROOM_EXPONENT
+
+    growing = growth > 0
+    seconds_to_full = np.maximum(allocated - used, 0)[growing] / growth[growing] * 86400
+    intervals[growing] = np.minimum(
+        intervals[growing], seconds_to_full / CHECKS_BEFORE_FULL)
+
+    return np.clip(intervals, settings.SIZE_CHECK_MIN_INTERVAL,
+                   settings.SIZE_CHECK_MAX_INTERVAL)
+
+
+def next_check_times(databases, sizes, now=None):
+    """ Return {database_id: next check time} for the databases with a
+    measured size in `sizes` """
+    now = now or datetime.datetime.now()
+    measured = [database for database in databases if database.id in sizes]
+    if not measured:
+        return {}
+    intervals = next_check_intervals(
+        [sizes[database.id] / 1024 for database in measured],
+        [database.allocated_size_kb or 0 for database in measured],
+        [(database.growth_bytes_per_day or 0) / 1024 for database in measured])
+    return {
+        database.id: now + datetime.timedelta(seconds=float(interval))
+        for database, interval in zip(measured, intervals)
+    }
@@ -0,0 +1,141 @@
+import time
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+from config import settings
+from app.database import SessionLocal, engine
+from app.models import StandbyDatabase
+from app.helpers.database_service import generate_db_credentials
+from app.helpers.database_flavor import get_flavour_service
+from app.helpers.placement import place_databases
+from app.helpers.metrics import metrics
+
+# arbitrary key for the advisory lock held while replenishing
+REPLENISH_LOCK_ID = 5_400_001
+
+# depths last read for /metrics and when, scrapes within
+# STANDBY_POOL_METRICS_TTL reuse them
+_cached_depths = dict(depths=None, read_at=0)
+
+
+def get_standby_targets():
+    """ Parse STANDBY_POOL_TARGETS into a {flavour_name: count} dict """
+    targets = {}
+    for entry in settings.STANDBY_POOL_TARGETS.split(','):
+        if not entry.strip():
+            continue
+        flavour_name, _, count = entry.partition(':')
+        try:
+            targets[flavour_name.strip()] = max(int(count), 0)
+        except ValueError:
+            print(f"Ignoring invalid standby pool target: {entry}")
+    return targets
+
+
+def get_standby_depths(db: Session):
+    rows = db.query(StandbyDatabase.database_flavour_name, func.count(StandbyDatabase.id)).\
+        group_by(StandbyDatabase.database_flavour_name).all()
+    return dict(rows)
+
+
+def get_cached_standby_depths():
+    now = time.monotonic()
+    if _cached_depths['depths'] is None or \
+            now - _cached_depths['read_at'] >= settings.STANDBY_POOL_METRICS_TTL:
+        db = SessionLocal()
+        try:
+            _cached_depths.update(depths=get_standby_depths(db), read_at=now)
+        finally:
+            db.close()
+    return _cached_depths['depths']
+
+
+def claim_standby_database(db: Session, flavour_name):
+    """ Take a ready made database out of the standby pool.
+
+    The row is locked and deleted in the caller's transaction, so it is
+    only gone once the caller commits the Database row that replaces it.
+    Returns None when the pool for the flavour is empty.
+    """
+    started = time.monotonic()
+    standby = db.query(StandbyDatabase).\
+        filter(StandbyDatabase.database_flavour_name == flavour_name).\
+        order_by(StandbyDatabase.date_created).\
+        with_for_update(skip_locked=True).\
+        first()
+    if not standby:
+        metrics.increment('standby_pool_misses_total', flavour=flavour_name)
+        return None
+    db.delete(standby)
+    metrics.increment('standby_pool_claims_total', flavour=flavour_name)
+    metrics.observe('standby_pool_claim_seconds',
+                    time.monotonic() - started, flavour=flavour_name)
+    return standby
+
+
+def replenish_standby_databases(db: Session, database_flavours):
+    """ Provision databases until every flavour reaches its target.
+
+    Returns the number of databases created per flavour.
+    """
+    targets = get_standby_targets()
+    if not targets:
+        return {}
+
+    # only one worker replenishes at a time, the advisory lock lives on its
+    # own connection so it survives the commits made below
+    with engine.connect() as lock_connection:
+        locked = lock_connection.execute(
+            text("SELECT pg_try_advisory_lock(:id)"), {"id": REPLENISH_LOCK_ID}).scalar()
+        if not locked:
+            return {}
+        try:
+            return _replenish(db, database_flavours, targets)
+        finally:
+            lock_connection.execute(
+                text("SELECT pg_advisory_unlock(:id)"), {"id": REPLENISH_LOCK_ID})
+
+
+def _replenish(db: Session, database_flavours, targets):
+    depths = get_standby_depths(db)
+    created = {}
+    for flavour in database_flavours:
+        missing = targets.get(flavour['name'], 0) - depths.get(flavour['name'], 0)
+        if missing <= 0:
+            continue
+
+        created[flavour['name']] = 0
+        for admin_host in place_databases(db, flavour['name'], missing):
+            if not admin_host:
+                break
+            database_service = get_flavour_service(
+                flavour, admin_host.host, admin_host.port, is_async=False)
+            credentials = generate_db_credentials()
+            if not database_service.check_db_connection() or \
+                    not database_service.create_database(
+                        db_name=credentials.name,
+                        user=credentials.user,
+                        password=credentials.password):
+                continue
+            db.add(StandbyDatabase(
+                name=credentials.name,
+                user=credentials.user,
+                password=credentials.password,
+                database_flavour_name=flavour['name'],
+                host=admin_host.host,
+                port=admin_host.port
+            ))
+            # commit as we go so a later failure does not orphan created databases
+            db.commit()
+            created[flavour['name']] += 1
+    return created
+
+
+@metrics.register_collector
+def collect_standby_depths(registry):
+    if not get_standby_targets():
+        return
+    depths = get_cached_standby_depths()
+    for flavour_name, target in get_standby_targets().items():
+        registry.set_gauge('standby_pool_depth',
+                           depths.get(flavour_name, 0), flavour=flavour_name)
+        registry.set_gauge('standby_pool_target', target, flavour=flavour_name)
@@ -0,0 +1,67 @@
+import asyncio
+import datetime
+import time
+from collections import defaultdict
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from config import settings
+from app.models import Database
+from app.helpers.database_flavor import get_database_service
+from app.helpers.metrics import metrics
+
+
+async def probe_database(database_service, database):
+    """ Log in to a tenant database, returns (status, latency_ms) """
+    started = time.monotonic()
+    status = await database_service.check_user_db_rights(
+        user=database.user, password=database.password, db_name=database.name)
+    latency = time.monotonic() - started
+    metrics.observe('tenant_probe_seconds', latency,
+                    flavour=database.database_flavour_name)
+    if not status:
+        metrics.increment('tenant_probe_failures_total',
+                          flavour=database.database_flavour_name)
+    return bool(status), int(latency * 1000)
+
+
+async def probe_databases(databases):
+    """ Probe the databases with bounded concurrency overall and per host.
+
+    Returns {database_id: (status, latency_ms)}.
+    """
+    limit = asyncio.Semaphore(settings.STATUS_PROBE_CONCURRENCY)
+    host_limits = defaultdict(
+        lambda: asyncio.Semaphore(settings.STATUS_PROBE_PER_HOST))
+
+    async def run(database_service, database):
+        async with host_limits[database_service.pool_name], limit:
+            return database.id, await probe_database(database_service, database)
+
+    probes = []
+    for database in databases:
+        database_service = get_database_service(database)
+        if database_service:
+            probes.append(run(database_service, database))
+    return dict(await asyncio.gather(*probes))
+
+
+def record_statuses(db: Session, statuses, checked_at=None):
+    """ Store probe results on the databases. The caller commits. """
+    if not statuses:
+        return
+    checked_at = checked_at or datetime.datetime.now()
+    db.execute(update(Database), [
+        dict(id=database_id, db_status=status, probe_latency_ms=latency,
+             status_checked_at=checked_at)
+        for database_id, (status, latency) in statuses.items()
+    ])
+
+
+def probe_database_statuses(db: Session):
+    databases = db.query(Database).filter(Database.deleted == False).all()
+    statuses = asyncio.run(probe_databases(databases))
+    record_statuses(db, statuses)
+    db.commit()
+    metrics.set_gauge('tenant_databases_down', sum(
+        1 for status, _ in statuses.values() if not status))
+    return statuses
@@ -1,12 +1,24 @@
 import datetime
 import uuid
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, BigInteger
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, BigInteger, Float, ForeignKey, Index, JSON, text
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
 
 
 class Database(Base):
     __tablename__ = 'user_databases'
+    __table_args__ = (
+        # the GET /databases shapes, live rows only and in listing order
+        Index('ix_user_databases_live_date_created', 'date_created', 'id',
+              postgresql_where=text('deleted = false')),
+        Index('ix_user_databases_live_owner_id', 'owner_id', 'date_created', 'id',
+              postgresql_where=text('deleted = false')),
+        Index('ix_user_databases_live_project_id', 'project_id', 'date_created', 'id',
+              postgresql_where=text('deleted = false')),
+        Index('ix_user_databases_live_flavour', 'database_flavour_name', 'date_created', 'id',
+              postgresql_where=text('deleted = false')),
+        Index('ux_user_databases_name', 'name', unique=True),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True,
                    default=uuid.uuid4, index=True)
@@ -14,6 +26,8 @@ class Database(Base):
     name = Column(String, nullable=False)
     user = Column(String, nullable=False)
     password = Column(String, nullable=False)
+    # a new password waiting for its reset job, kept out of the task arguments
+    pending_password = Column(String, nullable=True)
     owner_id = Column(UUID(as_uuid=True), index=True)
     project_id = Column(UUID(as_uuid=True), index=True)
     date_created = Column(DateTime, default=datetime.datetime.now)
@@ -22,7 +36,115 @@ class Database(Base):
     deleted = Column(Boolean, default=False)
     disabled = Column(Boolean, default=False)
     admin_disabled = Column(Boolean, default=False)
+    revoked = Column(Boolean, default=False)
     email = Column(String, nullable=True)
     notified = Column(Boolean, default=False)
     default_storage_kb = Column(BigInteger, nullable=True,)
+    size_sampled_at = Column(DateTime, nullable=True)
+    growth_bytes_per_day = Column(Float, nullable=True)
+    forecast_full_at = Column(DateTime, nullable=True, index=True)
+    next_size_check_at = Column(DateTime, nullable=True, index=True)
+    db_status = Column(Boolean, nullable=True)
+    status_checked_at = Column(DateTime, nullable=True)
+    probe_latency_ms = Column(Integer, nullable=True)
     allocated_size_kb = Column(BigInteger, nullable=True, default=1048576)
+
+
+class DatabaseCounter(Base):
+    """ Running database counts per flavour and status for /databases/stats """
+    __tablename__ = 'database_counters'
+
+    database_flavour_name = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+
+class DatabaseDailyCount(Base):
+    """ Databases created per day and flavour, read by /databases/graph """
+    __tablename__ = 'database_daily_counts'
+
+    day = Column(Date, primary_key=True)
+    # databases without a flavour are counted under ''
+    database_flavour_name = Column(String, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+
+class StandbyDatabase(Base):
+    __tablename__ = 'standby_databases'
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    host = Column(String, nullable=True)
+    port = Column(Integer, nullable=True)
+    name = Column(String, nullable=False, unique=True)
+    user = Column(String, nullable=False)
+    password = Column(String, nullable=False)
+    database_flavour_name = Column(String, nullable=False, index=True)
+    date_created = Column(DateTime, default=datetime.datetime.now)
+
+
+class DatabaseSizeSample(Base):
+    __tablename__ = 'database_size_samples'
+    __table_args__ = (
+        Index('ix_database_size_samples_database_id_sampled_at',
+              'database_id', 'sampled_at'),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    database_id = Column(UUID(as_uuid=True), ForeignKey(
+        'user_databases.id', ondelete='CASCADE'), nullable=False)
+    sampled_at = Column(DateTime, nullable=False,
+                        default=datetime.datetime.now, index=True)
+    size_bytes = Column(BigInteger, nullable=False)
+
+
+class TaskCheckpoint(Base):
+    __tablename__ = 'task_checkpoints'
+
+    name = Column(String, primary_key=True)
+    last_id = Column(UUID(as_uuid=True), nullable=True)
+    summary = Column(JSON, nullable=True)
+    run_started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class EmailOutbox(Base):
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        Index('ix_email_outbox_status_next_attempt_at',
+              'status', 'next_attempt_at'),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    template_name = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    recipients = Column(JSON, nullable=False)
+    body = Column(JSON, nullable=True)
+    # pending, sent or failed once EMAIL_MAX_ATTEMPTS are used up
+    status = Column(String, nullable=False, default='pending')
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False,
+                             default=datetime.datetime.now)
+    last_error = Column(String, nullable=True)
+    date_created = Column(DateTime, default=datetime.datetime.now)
+    sent_at = Column(DateTime, nullable=True)
+
+
+class AuditEvent(Base):
+    """ Operational history, range partitioned by month on created_at """
+    __tablename__ = 'audit_events'
+    __table_args__ = (
+        Index('ix_audit_events_database_id_created_at',
+              'database_id', 'created_at'),
+        {'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, primary_key=True,
+                        default=datetime.datetime.now)
+    database_id = Column(UUID(as_uuid=True), nullable=True)
+    user_id = Column(String, nullable=True)
+    user_email = Column(String, nullable=True)
+    operation = Column(String, nullable=True)
+    status = Column(String, nullable=True)
+    description = Column(String, nullable=True)
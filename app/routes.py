@@ -1,14 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, Header, Query, security
-from app.schema import (DatabaseSchema, DatabaseFlavor, PasswordUpdate)
-from app.models import Database
+from app.schema import (DatabaseSchema, DatabaseFlavor, DatabaseBatch, PasswordUpdate)
+from app.models import Database, AuditEvent
 from sqlalchemy.orm import Session
-from sqlalchemy import func, column, cast, Date
-from app.helpers.database_session import get_db
+from sqlalchemy import distinct, func, tuple_
+from sqlalchemy.exc import SQLAlchemyError
+from app.helpers.database_session import get_db, get_read_db, get_fresh_or_read_db
 from typing import Optional
 from fastapi.responses import JSONResponse
-from app.helpers.database_service import generate_db_credentials, MysqlDbService
-from app.helpers.database_flavor import disable_database_flavour, enable_database_flavour, get_db_flavour, database_flavours, graph_filter_datat, undo_database_revoke, revoke_database, failed_database_connection, database_not_found, save_to_database
+from fastapi.concurrency import contextmanager_in_threadpool, run_in_threadpool
+from app.helpers.database_service import generate_db_credentials
+from app.helpers.database_flavor import disable_database_flavour, enable_database_flavour, get_db_flavour, get_flavour_service, get_database_service, database_flavours, graph_filter_datat, undo_database_revoke, revoke_database_async, failed_database_connection, database_not_found, save_to_database
 from app.helpers.logger import send_async_log_message
+from app.helpers.standby_pool import claim_standby_database
+from app.helpers.placement import choose_host, place_databases
+from app.helpers.size_sampler import record_size_samples
+from app.helpers.status_prober import probe_database, record_statuses
+from app.helpers.forecast import forecast_databases
+from app.helpers.database_counters import get_database_counts
+from app.helpers.pagination import encode_cursor, decode_cursor
+from app.helpers.database_rollups import GRAPH_PERIODS, get_graph_data, get_creation_totals
+from app.tasks import (celery_app, create_database_job, reset_database_job, reset_database_password_job,
+                       submit_job, get_job_owner, database_job_lock)
+from celery.result import AsyncResult
+from uuid import uuid4
 from typing import Annotated
 from datetime import datetime
 from types import SimpleNamespace
@@ -20,27 +34,39 @@ router = APIRouter()
 security = HTTPBearer()
 
 
-@router.get("/databases/stats")
-def fetch_database_stats(access_token: str = Depends(security), db: Session = Depends(get_db)):
+def authenticated_user(access_token: str = Depends(security)):
+    """ Shared dependency that resolves the caller from the bearer token """
     current_user = get_current_user(access_token.credentials)
     check_authentication(current_user)
+    return current_user
+
+
+@router.get("/databases/stats")
+def fetch_database_stats(current_user: SimpleNamespace = Depends(authenticated_user), db: Session = Depends(get_read_db)):
+    # counters are kept up to date as databases change, no rows are loaded
+    counts = get_database_counts(db)
 
     dbs_per_flavour = {}
+    status_per_flavour = {}
+    status_totals = dict(disabled=0, admin_disabled=0, revoked=0)
     total = 0
 
     for flavour in database_flavours:
-        databases = db.query(Database).filter(
-            Database.database_flavour_name == flavour['name'],
-            Database.deleted == False
-        ).all()
-
-        database_count = len(databases)
+        flavour_counts = counts.get(flavour['name'], {})
+        database_count = flavour_counts.get('total', 0)
         dbs_per_flavour[f"{flavour['name']}_db_count"] = database_count
 
+        status_per_flavour[flavour['name']] = {
+            status: flavour_counts.get(status, 0) for status in status_totals}
+        for status in status_totals:
+            status_totals[status] += flavour_counts.get(status, 0)
+
         total = total + database_count
 
     data = dict(total_database_count=total,
-                dbs_stats_per_flavour=dbs_per_flavour)
+                dbs_stats_per_flavour=dbs_per_flavour,
+                dbs_status_per_flavour=status_per_flavour,
+                status_counts=status_totals)
 
     return SimpleNamespace(status_code=200,
                            data=dict(databases=data))
@@ -48,19 +74,23 @@ def fetch_database_stats(access_token: str = Depends(security), db: Session = De
 
 @router.get("/databases")
 def get_all_databases(
-    access_token: str = Depends(security),
-    db: Session = Depends(get_db),
+    current_user: SimpleNamespace = Depends(authenticated_user),
+    db: Session = Depends(get_read_db),
     project_id: str = Query(None, description="Project ID"),
     database_flavour_name: str = Query(
         None, description="Database flavour name"),
     page: int = Query(default=1, ge=1, description="Page number"),
     per_page: int = Query(default=10, ge=1, le=100,
-                          description="Items per page")
+                          description="Items per page"),
+    cursor: Optional[str] = Query(
+        None, description="next_cursor from the previous page, replaces page"),
+    include_total: bool = Query(
+        default=True, description="Count the matching databases")
 ):
-    current_user = get_current_user(access_token.credentials)
-    check_authentication(current_user)
-
-    query = db.query(Database).order_by(Database.date_created.desc())
+    # date_created alone is not unique, id breaks the ties so a cursor
+    # never skips or repeats a row
+    query = db.query(Database).order_by(
+        Database.date_created.desc(), Database.id.desc())
 
     if current_user.role != "administrator":
         query = query.filter(
@@ -76,27 +106,50 @@ def get_all_databases(
     # ensure at this point that deleted databases are not part of the query for the above filters
     query = query.filter(Database.deleted == False)
 
-    total_count = query.count()
-    total_pages = (total_count + per_page - 1) // per_page
+    total_count = None
+    if include_total:
+        if current_user.role == "administrator" and not project_id:
+            # the whole table, read the status counters instead of counting
+            counts = get_database_counts(db)
+            total_count = sum(
+                statuses.get('total', 0) for flavour_name, statuses in counts.items()
+                if not database_flavour_name or flavour_name == database_flavour_name)
+        else:
+            total_count = query.count()
 
-    offset = (page - 1) * per_page
-    paginated_query = query.offset(offset).limit(per_page)
+    if cursor:
+        try:
+            cursor_date, cursor_id = decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.filter(
+            tuple_(Database.date_created, Database.id) < tuple_(cursor_date, cursor_id))
+        page = None
+    else:
+        query = query.offset((page - 1) * per_page)
 
-    databases = paginated_query.all()
+    # one extra row tells whether there is a next page without a count
+    databases = query.limit(per_page + 1).all()
+    has_next = len(databases) > per_page
+    databases = databases[:per_page]
 
-    next_num = page + 1 if page < total_pages else None
-    prev_num = page - 1 if page > 1 else None
+    next_cursor = None
+    if has_next:
+        last = databases[-1]
+        next_cursor = encode_cursor(last.date_created, last.id)
 
     return {
         "status_code": 200,
         "data": {
             "pagination": {
                 "total": total_count,
-                "pages": total_pages,
+                "pages": (total_count + per_page - 1) // per_page
+                if total_count is not None else None,
                 "page": page,
                 "per_page": per_page,
-                "next": next_num,
-                "prev": prev_num
+                "next": page + 1 if page and has_next else None,
+                "prev": page - 1 if page and page > 1 else None,
+                "next_cursor": next_cursor
             },
             "databases": databases
         }
@@ -104,34 +157,65 @@ def get_all_databases(
 
 
 @router.post("/databases")
-def create_database(database: DatabaseFlavor, access_token: str = Depends(security), db: Session = Depends(get_db)):
-    credentials = generate_db_credentials()
+async def create_database(database: DatabaseFlavor, current_user: SimpleNamespace = Depends(authenticated_user), db: Session = Depends(get_db),
+                          run_async: bool = Query(False, alias="async", description="Provision in the background")):
     db_flavor = get_db_flavour(database.database_flavour_name)
 
-    current_user = get_current_user(access_token.credentials)
-    check_authentication(current_user)
+    if run_async and db_flavor:
+        database_id = str(uuid4())
+        job = await run_in_threadpool(
+            submit_job, create_database_job, job_user(current_user),
+            database_id, db_flavor['name'], str(database.project_id))
+        return job_accepted(job, database_id)
+
+    # a ready made database from the standby pool saves the admin round trips
+    standby = await run_in_threadpool(
+        claim_standby_database, db, db_flavor['name']) if db_flavor else None
+
+    if standby:
+        credentials = SimpleNamespace(
+            name=standby.name, user=standby.user, password=standby.password)
+    else:
+        credentials = generate_db_credentials()
 
-    existing_name = db.query(Database).filter(
-        Database.name == credentials.name).first()
-    if existing_name:
+        existing_name = await run_in_threadpool(db.query(Database).filter(
+            Database.name == credentials.name).first)
+        if existing_name:
+            log_data = {
+                "operation": "Create",
+                "status": "Failed",
+                "user_id": current_user.id,
+                "model": "Database",
+                "description": "Database with this name already exists"
+            }
+            send_async_log_message(log_data)
+            raise HTTPException(
+                status_code=400, message="Database with this name already exists")
+
+    admin_host = standby or (await run_in_threadpool(
+        choose_host, db, db_flavor['name']) if db_flavor else None)
+    if db_flavor and not admin_host:
         log_data = {
             "operation": "Create",
             "status": "Failed",
             "user_id": current_user.id,
+            "user_email": current_user.email,
             "model": "Database",
-            "description": "Database with this name already exists"
+            "description": "No database host has capacity for a new database"
         }
         send_async_log_message(log_data)
-        raise HTTPException(
-            status_code=400, message="Database with this name already exists")
+        return dict(
+            status_code=503,
+            message="No database host has capacity for a new database"
+        )
 
     new_database_info = dict(
         user=credentials.user,
         password=credentials.password,
         name=credentials.name,
         database_flavour_name=database.database_flavour_name,
-        host=db_flavor['host'],
-        port=db_flavor['port'],
+        host=admin_host.host if admin_host else None,
+        port=admin_host.port if admin_host else None,
         owner_id=current_user.id,
         project_id=database.project_id,
         email=current_user.email
@@ -142,43 +226,46 @@ def create_database(database: DatabaseFlavor, access_token: str = Depends(securi
     except ValueError as e:
         return {"error": f"Validation failed: {str(e)}", "status_code": 409}
 
-    database_service = db_flavor['class']
-    database_connection = database_service.check_db_connection()
-
-    if not database_connection:
-        return failed_database_connection(current_user, "CREATE")
+    if not standby:
+        database_service = get_flavour_service(
+            db_flavor, admin_host.host, admin_host.port)
+        database_connection = database_service.check_db_connection()
 
-    create_database = database_service.create_database(
-        db_name=credentials.name,
-        user=credentials.user,
-        password=credentials.password
-    )
+        if not database_connection:
+            return failed_database_connection(current_user, "CREATE", database_service)
 
-    if not create_database:
-        log_data = {
-            "operation": "Create",
-            "status": "Failed",
-            "user_id": current_user.id,
-            "user_email": current_user.email,
-            "model": "Database",
-            "description": "Failed to create database"
-        }
-        send_async_log_message(log_data)
-        return dict(
-            status_code=500,
-            message=f"Unable to create database"
+        create_database = await database_service.create_database(
+            db_name=credentials.name,
+            user=credentials.user,
+            password=credentials.password
         )
 
+        if not create_database:
+            log_data = {
+                "operation": "Create",
+                "status": "Failed",
+                "user_id": current_user.id,
+                "user_email": current_user.email,
+                "model": "Database",
+                "description": "Failed to create database"
+            }
+            send_async_log_message(log_data)
+            return dict(
+                status_code=500,
+                message=f"Unable to create database"
+            )
+
     database = Database(**new_database_info)
     db.add(database)
-    save_to_database(db)
-    db.refresh(database)
+    await run_in_threadpool(save_to_database, db)
+    await run_in_threadpool(db.refresh, database)
     log_data = {
         "operation": "Create",
         "status": "Success",
         "user_id": current_user.id,
         "user_email": current_user.email,
         "model": "Database",
+        "a_db_id": str(database.id),
         "description": "Database successfully created."
     }
     send_async_log_message(log_data)
@@ -186,39 +273,143 @@ def create_database(database: DatabaseFlavor, access_token: str = Depends(securi
     return SimpleNamespace(status_code=201, data={"database": database})
 
 
-@router.post("/databases/{database_id}/enable")
-def enable_database(database_id: str, access_token: str = Depends(security), db: Session = Depends(get_db)):
-    current_user = get_current_user(access_token.credentials)
-    check_authentication(current_user)
+@router.post("/databases/batch")
+async def create_database_batch(batch: DatabaseBatch, current_user: SimpleNamespace = Depends(authenticated_user), db: Session = Depends(get_db)):
+    """ Create several databases, one admin connection is used per host """
+    results = [None] * len(batch.databases)
+    credentials = [generate_db_credentials() for _ in batch.databases]
+
+    # regenerate the rare names that are already taken
+    existing_names = {name for (name,) in await run_in_threadpool(db.query(Database.name).filter(
+        Database.name.in_([item.name for item in credentials])).all)}
+    for index, item in enumerate(credentials):
+        while item.name in existing_names:
+            item = credentials[index] = generate_db_credentials()
+
+    groups = {}
+    for index, database in enumerate(batch.databases):
+        db_flavor = get_db_flavour(database.database_flavour_name)
+        if not db_flavor:
+            results[index] = dict(
+                status_code=400,
+                message=f"Database flavour {database.database_flavour_name} is not mysql or postgres")
+            continue
+        groups.setdefault(db_flavor['name'], (db_flavor, []))[1].append(index)
+
+    # spread each flavour's databases over its hosts
+    host_groups = {}
+    for db_flavor, indexes in groups.values():
+        placements = await run_in_threadpool(
+            place_databases, db, db_flavor['name'], len(indexes))
+        for index, admin_host in zip(indexes, placements):
+            if not admin_host:
+                results[index] = dict(
+                    status_code=503, message="No database host has capacity for a new database")
+                continue
+            host_key = (db_flavor['name'], admin_host.host, admin_host.port)
+            host_groups.setdefault(host_key, (db_flavor, admin_host, []))[2].append(index)
+
+    new_databases = []
+    for db_flavor, admin_host, indexes in host_groups.values():
+        database_service = get_flavour_service(
+            db_flavor, admin_host.host, admin_host.port)
+        if not database_service.check_db_connection():
+            for index in indexes:
+                results[index] = dict(
+                    status_code=503, message="Failed to connect to the database service")
+            continue
+
+        created = await database_service.create_databases(
+            [credentials[index] for index in indexes])
+
+        for index, was_created in zip(indexes, created):
+            if not was_created:
+                results[index] = dict(
+                    status_code=500, message="Unable to create database")
+                continue
+            new_database = Database(
+                user=credentials[index].user,
+                password=credentials[index].password,
+                name=credentials[index].name,
+                database_flavour_name=db_flavor['name'],
+                host=admin_host.host,
+                port=admin_host.port,
+                owner_id=current_user.id,
+                project_id=batch.databases[index].project_id,
+                email=current_user.email
+            )
+            new_databases.append((index, new_database, database_service))
+
+    def save_new_databases():
+        # a single multi row insert for every database that was created
+        db.add_all([new_database for _, new_database, _ in new_databases])
+        db.flush()
+        for index, new_database, _ in new_databases:
+            results[index] = dict(status_code=201, database={
+                column.name: getattr(new_database, column.name)
+                for column in Database.__table__.columns})
+        db.commit()
 
-    database = db.query(Database).filter(Database.id == database_id).first()
+    try:
+        await run_in_threadpool(save_new_databases)
+    except SQLAlchemyError as e:
+        await run_in_threadpool(db.rollback)
+        print(f"Failed to save the batch databases: {e}")
+        # without their records nobody could reach them, drop them again
+        for index, new_database, database_service in new_databases:
+            await database_service.delete_database(new_database.name)
+            await database_service.delete_user(new_database.user)
+            results[index] = dict(
+                status_code=500, message="Failed to save the database")
+
+    failed = sum(1 for result in results if result['status_code'] != 201)
+    log_data = {
+        "operation": "Batch Create",
+        "status": "Failed" if failed == len(results) else "Success",
+        "user_id": current_user.id,
+        "user_email": current_user.email,
+        "model": "Database",
+        "description": f"{len(results) - failed} of {len(results)} databases successfully created."
+    }
+    send_async_log_message(log_data)
+
+    return SimpleNamespace(status_code=201 if not failed else 207,
+                           data={"databases": results})
+
+
+@router.post("/databases/{database_id}/enable")
+async def enable_database(database_id: str, current_user: SimpleNamespace = Depends(authenticated_user), db: Session = Depends(get_db)):
+    database = await run_in_threadpool(
+        db.query(Database).filter(Database.id == database_id).first)
     if not database:
-        database_not_found(current_user, "Enable", database.id)
+        database_not_found(current_user, "Enable", database_id)
     if current_user.role == "administrator":
         if not database.admin_disabled:
             raise HTTPException(
                 status_code=409, detail="Database is already enabled.")
 
-        enabled_database = enable_database_flavour(database, db)
+        enabled_database = await enable_database_flavour(database, db)
         if type(enabled_database) == SimpleNamespace:
             status_code = enabled_database.status_code if enabled_database.status_code else 500
             log_data = {
                 "operation": "DATABASE ENABLE",
+                "a_db_id": database_id,
                 "status": "Failed",
                 "user_id": current_user.id,
                 "user_email": current_user.email,
                 "model": "Database",
-                "description": f"Database: {database.id} is {enabled_database.message}."
+                "description": f"Database: {database_id} is {enabled_database.message}."
             }
             send_async_log_message(log_data)
             return dict(status_code=status_code, message=enabled_database.message)
         log_data = {
             "operation": "DATABASE ENABLE",
+            "a_db_id": database_id,
             "status": "Success",
             "user_id": current_user.id,
             "user_email": current_user.email,
             "model": "Database",
-            "description": f"Database: {database.id} is successfully enabled."
+            "description": f"Database: {database_id} is successfully enabled."
         }
         send_async_log_message(log_data)
         return {"status_code": 200, "message": "Database enabled successfully"}
@@ -230,50 +421,51 @@ def enable_database(database_id: str, access_token: str = Depends(security), db:
         if database.admin_disabled:
             log_data = {
                 "operation": "DATABASE ENABLE",
+                "a_db_id": database_id,
                 "status": "Failed",
                 "user_id": current_user.id,
                 "user_email": current_user.email,
                 "model": "Database",
-                "description": f"You are not authorised to enable Database: {database.id}"
+                "description": f"You are not authorised to enable Database: {database_id}"
             }
             send_async_log_message(log_data)
             return {"message": f"You are not authorised to enable Database with id {database_id}, please contact an admin", "status_code": 403}
 
-        enabled_database = enable_database_flavour(database, db)
+        enabled_database = await enable_database_flavour(database, db)
         if type(enabled_database) == SimpleNamespace:
             status_code = enabled_database.status_code if enabled_database.status_code else 500
             log_data = {
                 "operation": "DATABASE ENABLE",
+                "a_db_id": database_id,
                 "status": "Failed",
                 "user_id": current_user.id,
                 "user_email": current_user.email,
                 "model": "Database",
-                "description": f"Database: {database.id} is {enabled_database.message}."
+                "description": f"Database: {database_id} is {enabled_database.message}."
             }
             send_async_log_message(log_data)
             return dict(status_code=status_code, message=enabled_database.message)
 
         log_data = {
             "operation": "DATABASE ENABLE",
+            "a_db_id": database_id,
             "status": "Success",
             "user_id": current_user.id,
             "user_email": current_user.email,
             "model": "Database",
-            "description": f"Database: {database.id} is successfully enabled."
+            "description": f"Database: {database_id} is successfully enabled."
         }
         send_async_log_message(log_data)
         return {"status_code": 200, "message": "Database enabled successfully"}
 
 
 @router.post("/databases/{database_id}/disable")
-def disable_database(database_id: str, access_token: str = Depends(security), db: Session = Depends(get_db)):
-    current_user = get_current_user(access_token.credentials)
-    check_authentication(current_user)
-
-    database = db.query(Database).filter(Database.id == database_id).first()
+async def disable_database(database_id: str, current_user: SimpleNamespace = Depends(authenticated_user), db: Session = Depends(get_db)):
+    database = await run_in_threadpool(
+        db.query(Database).filter(Database.id == database_id).first)
 
     if not database:
-        database_not_found(current_user, "Disable", database.id)
+        database_not_found(current_user, "Disable", database_id)
 
     if current_user.role == "administrator":
 
@@ -281,26 +473,28 @@ def disable_database(database_id: str, access_token: str = Depends(security), db
             raise HTTPException(
                 status_code=404, detail="Databases is already disabled.")
 
-        disbled_database = disable_database_flavour(database, db, True)
+        disbled_database = await disable_database_flavour(database, db, True)
         if type(disbled_database) == SimpleNamespace:
             status_code = disbled_database.status_code if disbled_database.status_code else 500
             log_data = {
                 "operation": "DATABASE ENABLE",
+                "a_db_id": database_id,
                 "status": "Failed",
                 "user_id": current_user.id,
                 "user_email": current_user.email,
                 "model": "Database",
-                "description": f"Database: {database.id} is {disbled_database.message}."
+                "description": f"Database: {database_id} is {disbled_database.message}."
             }
             send_async_log_message(log_data)
             return dict(status_code=status_code, message=disbled_database.message)
         log_data = {
             "operation": "DATABASE DISABLE",
+            "a_db_id": database_id,
             "status": "Success",
             "user_id": current_user.id,
             "user_email": current_user.email,
             "model": "Database",
-            "description": f"Database: {database.id} is successfully disabled."
+            "description": f"Database: {database_id} is successfully disabled."
         }
         send_async_log_message(log_data)
         return {"message": "Database disabled successfully", "status_code": 200}
@@ -312,6 +506,7 @@ def disable_database(database_id: str, access_token: str = Depends(security), db
         if database.admin_disabled:
             log_data = {
                 "operation": "DATABASE DISABLE",
+                "a_db_id": database_id,
                 "status": "Failed",
                 "user_id": current_user.id,
                 "user_email": current_user.email,
@@ -321,11 +516,12 @@ def disable_database(database_id: str, access_token: str = Depends(security), db
             send_async_log_message(log_data)
             return {"message": 'Database with id {database_id} is disabled, please contact an admin', "status_code": 403}
 
-        disbled_database = disable_database_flavour(database, db, False)
+        disbled_database = await disable_database_flavour(database, db, False)
         if type(disbled_database) == SimpleNamespace:
             status_code = disbled_database.status_code if disbled_database.status_code else 500
             log_data = {
                 "operation": "DATABASE ENABLE",
+                "a_db_id": database_id,
                 "status": "Failed",
                 "user_id": current_user.id,
                 "user_email": current_user.email,
@@ -336,6 +532,7 @@ def disable_database(database_id: str, access_token: str = Depends(security), db
             return dict(status_code=status_code, message=disbled_database.message)
         log_data = {
             "operation": "DATABASE DISABLE",
+            "a_db_id": database_id,
             "status": "Success",
             "user_id": current_user.id,
             "user_email": current_user.email,
@@ -347,14 +544,12 @@ def disable_database(database_id: str, access_token: str = Depends(security), db
 
 
 @router.delete("/databases/{database_id}")
-def delete_database(database_id: str, access_token: str = Depends(security), db: Session = Depends(get_db)):
-    current_user = get_current_user(access_token.credentials)
-    check_authentication(current_user)
-
+def delete_database(database_id: str, current_user: SimpleNamespace = Depends(authenticated_user), db: Session = Depends(get_db)):
     database = db.query(Database).filter(Database.id == database_id).first()
     if database is None:
         log_data = {
             "operation": "DATABASE DELETE",
+            "a_db_id": database_id,
             "status": "Failed",
             "user_id": current_user.id,
             "description": f"Failed to get Database with ID: {database_id}"
@@ -366,6 +561,7 @@ def delete_database(database_id: str, access_token: str = Depends(security), db:
     save_to_database(db)
     log_data = {
         "operation": "DATABASE DELETE",
+        "a_db_id": database_id,
         "status": "Success",
         "user_id": current_user.id,
         "description": f"Database: {database.id} is successfully deleted."
@@ -375,13 +571,12 @@ def delete_database(database_id: str, access_token: str = Depends(security), db:
 
 
 @router.post("/databases/{database_id}/reset")
-def reset_database(database_id: str, access_token: str = Depends(security), db: Session = Depends(get_db)):
-    current_user = get_current_user(access_token.credentials)
-    check_authentication(current_user)
-
-    database = db.query(Database).filter(Database.id == database_id).first()
+async def reset_database(database_id: str, current_user: SimpleNamespace = Depends(authenticated_user), db: Session = Depends(get_db),
+                         run_async: bool = Query(False, alias="async", description="Reset in the background")):
+    database = await run_in_threadpool(
+        db.query(Database).filter(Database.id == database_id).first)
     if not database:
-        database_not_found(current_user, "Enable", database.id)
+        database_not_found(current_user, "Enable", database_id)
 
     db_flavour = get_db_flavour(database.database_flavour_name)
 
@@ -392,60 +587,75 @@ def reset_database(database_id: str, access_token: str = Depends(security), db:
                 {database.database_flavour_name} is not mysql or postgres."""
         )
 
-    database_service = db_flavour['class']
+    if run_async:
+        job = await run_in_threadpool(
+            submit_job, reset_database_job, job_user(current_user), str(database.id))
+        return job_accepted(job, database.id)
 
-    database_connection = database_service.check_db_connection()
+    async with contextmanager_in_threadpool(database_job_lock(str(database.id))) as locked:
+        if not locked:
+            # a background job is working on this database
+            return dict(
+                status_code=409,
+                message="Another job is working on this database, try again later"
+            )
 
-    if not database_connection:
-        return failed_database_connection(current_user, "RESET")
+        database_service = get_database_service(database)
 
-    reset_database = database_service.reset_database(
-        db_name=database.name,
-        user=database.user,
-        password=database.password
-    )
+        database_connection = database_service.check_db_connection()
+
+        if not database_connection:
+            return failed_database_connection(current_user, "RESET", database_service)
+
+        reset_database = await database_service.reset_database(
+            db_name=database.name,
+            user=database.user,
+            password=database.password
+        )
+
+        if not reset_database:
+            log_data = {
+                "operation": "RESET",
+                "a_db_id": database_id,
+                "status": "Failed",
+                "user_id": current_user.id,
+                "user_email": current_user.email,
+                "model": "Database",
+                "description": f"Failed to reset database: {database_id}"
+            }
+            send_async_log_message(log_data)
+            return dict(
+                status=500,
+                message=f"Unable to reset database"
+            )
 
-    if not reset_database:
         log_data = {
-            "operation": "RESET",
-            "status": "Failed",
+            "operation": "DATABASE RESET",
+            "a_db_id": database_id,
+            "status": "Success",
             "user_id": current_user.id,
             "user_email": current_user.email,
             "model": "Database",
-            "description": f"Failed to reset database: {database.id}"
+            "description": f"Database: {database_id} is successfully reset."
         }
         send_async_log_message(log_data)
-        return dict(
-            status=500,
-            message=f"Unable to reset database"
-        )
-
-    log_data = {
-        "operation": "DATABASE RESET",
-        "status": "Success",
-        "user_id": current_user.id,
-        "user_email": current_user.email,
-        "model": "Database",
-        "description": f"Database: {database.id} is successfully reset."
-    }
-    send_async_log_message(log_data)
-    return ({"status_code": 200, "message": "Database Reset Successfully"})
+        return ({"status_code": 200, "message": "Database Reset Successfully"})
 
 
 @router.post("/databases/{database_id}/reset_password")
-def password_reset_database(database_id: str, field_update: PasswordUpdate, access_token: str = Depends(security), db: Session = Depends(get_db)):
-    current_user = get_current_user(access_token.credentials)
-    check_authentication(current_user)
-
-    database = db.query(Database).filter(Database.id == database_id).first()
+async def password_reset_database(database_id: str, field_update: PasswordUpdate, current_user: SimpleNamespace = Depends(authenticated_user), db: Session = Depends(get_db),
+                                  run_async: bool = Query(False, alias="async", description="Reset the password in the background")):
+    database = await run_in_threadpool(
+        db.query(Database).filter(Database.id == database_id).first)
     if not database:
-        database_not_found(current_user, "RESET PASSWORD", database.id)
+        database_not_found(current_user, "RESET PASSWORD", database_id)
 
     db_flavour = get_db_flavour(database.database_flavour_name)
 
     if not db_flavour:
         log_data = {
             "operation": "RESET PASSWORD",
+            "a_db_id": database_id,
             "status": "Failed",
             "user_id": current_user.id,
             "user_email": current_user.email,
@@ -459,67 +669,85 @@ def password_reset_database(database_id: str, field_update: PasswordUpdate, acce
                 {database.database_flavour_name} is not mysql or postgres."""
         )
 
-    database_service = db_flavour['class']
+    if run_async:
+        # the job reads the password from here, not from its arguments
+        database.pending_password = field_update.password
+        database_id = str(database.id)
+        await run_in_threadpool(save_to_database, db)
+        job = await run_in_threadpool(
+            submit_job, reset_database_password_job, job_user(current_user), database_id)
+        return job_accepted(job, database_id)
 
-    database_connection = database_service.check_db_connection()
+    async with contextmanager_in_threadpool(database_job_lock(str(database.id))) as locked:
+        if not locked:
+            # a background job is working on this database
+            return dict(
+                status_code=409,
+                message="Another job is working on this database, try again later"
+            )
 
-    if not database_connection:
-        return failed_database_connection(current_user, "RESET PASSWORD")
+        database_service = get_database_service(database)
 
-    password_reset_database = database_service.reset_password(
-        user=database.user,
-        password=field_update.password
-    )
+        database_connection = database_service.check_db_connection()
+
+        if not database_connection:
+            return failed_database_connection(current_user, "RESET PASSWORD", database_service)
+
+        password_reset_database = await database_service.reset_password(
+            user=database.user,
+            password=field_update.password
+        )
 
-    if not password_reset_database:
+        if not password_reset_database:
+            log_data = {
+                "operation": "RESET PASSWORD",
+                "a_db_id": database_id,
+                "status": "Failed",
+                "user_id": current_user.id,
+                "user_email": current_user.email,
+                "model": "Database",
+                "description": f"Failed to reset database passsword for: {database_id}"
+            }
+            send_async_log_message(log_data)
+            return dict(
+                status_code=500,
+                message=f"Unable to reset database password"
+            )
+
+        database.password = field_update.password
+        # newer than any password still waiting for a job
+        database.pending_password = None
+
+        await run_in_threadpool(save_to_database, db)
         log_data = {
-            "operation": "RESET PASSWORD",
-            "status": "Failed",
+            "operation": "DATABASE PASSWORD RESET",
+            "a_db_id": database_id,
+            "status": "Success",
             "user_id": current_user.id,
             "user_email": current_user.email,
             "model": "Database",
-            "description": f"Failed to reset database passsword for: {database.id}"
+            "description": f"Database: {database_id} password is successfully reset."
         }
         send_async_log_message(log_data)
-        return dict(
-            status_code=500,
-            message=f"Unable to reset database password"
-        )
-
-    database.password = field_update.password
-
-    save_to_database(db)
-    log_data = {
-        "operation": "DATABASE PASSWORD RESET",
-        "status": "Success",
-        "user_id": current_user.id,
-        "user_email": current_user.email,
-        "model": "Database",
-        "description": f"Database: {database.id} password is successfully reset."
-    }
-    send_async_log_message(log_data)
-    return ({"status_code": 200, "message": "Database Password Reset Successfully"})
+        return ({"status_code": 200, "message": "Database Password Reset Successfully"})
 
 
 @router.patch("/databases/{database_id}/storage")
-def allocate_storage(database_id: str, additional_storage: int, access_token: str = Depends(security), db: Session = Depends(get_db)):
-    current_user = get_current_user(access_token.credentials)
-    check_authentication(current_user)
-
+def allocate_storage(database_id: str, additional_storage: int, current_user: SimpleNamespace = Depends(authenticated_user), db: Session = Depends(get_db)):
     database = db.query(Database).filter(Database.id == database_id).first()
     if not database:
-        database_not_found(current_user, "Enable", database.id)
+        database_not_found(current_user, "Enable", database_id)
     db_flavour = get_db_flavour(database.database_flavour_name)
     if not db_flavour:
         raise HTTPException(
             status_code=404, detail="Database flavor not found")
 
-    database_service = db_flavour['class']
+    database_service = get_database_service(database)
 
     database_connection = database_service.check_db_connection()
 
     if not database_connection:
-        return failed_database_connection(current_user, "ADD STORAGE")
+        return failed_database_connection(current_user, "ADD STORAGE", database_service)
 
     database.allocated_size_kb += additional_storage
     save_to_database(db)
@@ -527,11 +755,8 @@ def allocate_storage(database_id: str, additional_storage: int, access_token: st
 
 
 @router.get("/databases/graph")
-def database_graph_data(start: Optional[str] = Query(description="Start date format(YYYY-MM-DD)", default=graph_filter_datat['start']), access_token: str = Depends(security), end: Optional[str] = Query(description="End date format(YYYY-MM-DD)", default=graph_filter_datat['end']), set_by: Optional[str] = Query(description="Either month or year", default=graph_filter_datat['set_by']), db_flavour: Optional[str] = Query(None, description="Database flavour either mysql or postgres"), db: Session = Depends(get_db)):
+def database_graph_data(start: Optional[str] = Query(description="Start date format(YYYY-MM-DD)", default=graph_filter_datat['start']), current_user: SimpleNamespace = Depends(authenticated_user), end: Optional[str] = Query(description="End date format(YYYY-MM-DD)", default=graph_filter_datat['end']), set_by: Optional[str] = Query(description="One of year, month, week or day", default=graph_filter_datat['set_by']), db_flavour: Optional[str] = Query(None, description="Database flavour either mysql or postgres"), db: Session = Depends(get_read_db)):
     """ Shows databases graph data """
-    current_user = get_current_user(access_token.credentials)
-    check_authentication(current_user)
-
     graph_filter_data = {}
     try:
         start_date = datetime.strptime(start, '%Y-%m-%d').date()
@@ -542,8 +767,8 @@ def database_graph_data(start: Optional[str] = Query(description="Start date for
         if end is not None:
             graph_filter_data['end'] = end_date
         if set_by is not None:
-            if set_by not in ["year", "month"]:
-                raise ValueError('set_by should be year or month')
+            if set_by not in GRAPH_PERIODS:
+                raise ValueError('set_by should be year, month, week or day')
             graph_filter_data['set_by'] = set_by
     except ValueError as e:
         log_data = {
@@ -573,63 +798,33 @@ def database_graph_data(start: Optional[str] = Query(description="Start date for
             send_async_log_message(log_data)
             return JSONResponse(data={'message': 'Not a valid database flavour use mysql or postgres'}, status_code=401)
 
-    if set_by == 'month':
-        date_list = func.generate_series(cast(start_date, Date), cast(
-            end_date, Date), '1 month').alias('month')
-        month = column('month')
-        query = db.query(month, func.count(Database.id)).\
-            select_from(date_list).\
-            outerjoin(Database, func.date_trunc(
-                'month', Database.date_created) == month)
-
-        if db_flavour:
-            query = query.filter(Database.database_flavour_name == db_flavour)
-        db_data = query.group_by(month).order_by(month).all()
-
-    else:
-        date_list = func.generate_series(cast(start_date, Date), cast(
-            end_date, Date), '1 year').alias('year')
-        year = column('year')
-        query = db.query(year, func.count(Database.id)).\
-            select_from(date_list).\
-            outerjoin(Database, func.date_trunc(
-                'year', Database.date_created) == year)
-
-        if db_flavour:
-            query = query.filter(Database.database_flavour_name == db_flavour)
-
-        db_data = query.group_by(year).order_by(year).all()
-
+    # read from the per day rollup instead of scanning user_databases
     db_info = []
-
-    for item in db_data:
+    for period, count in get_graph_data(db, start_date, end_date, set_by, db_flavour):
         item_dict = {
-            'year': item[0].year, 'month': item[0].month, 'value': item[1]
+            'year': period.year, 'month': period.month, 'value': count
         }
+        if set_by in ('week', 'day'):
+            item_dict['day'] = period.day
         db_info.append(item_dict)
 
+    totals = get_creation_totals(db)
     metadata = dict()
-    query = db.query(Database)
-
-    metadata['total'] = query.count()
-    metadata['postgres_total'] = query.filter_by(
-        database_flavour_name='postgres').count()
-    metadata['mysql_total'] = query.filter_by(
-        database_flavour_name='mysql').count()
-    db_user = Database.user
-    metadata['users_number'] = query.with_entities(
-        db_user, func.count(db_user)).group_by(db_user).distinct().count()
+    metadata['total'] = sum(totals.values())
+    metadata['postgres_total'] = totals.get('postgres', 0)
+    metadata['mysql_total'] = totals.get('mysql', 0)
+    metadata['users_number'] = db.query(
+        func.count(distinct(Database.user))).scalar()
 
     return {"status_code": 200,  'data': {'metadata': metadata, 'graph_data': db_info}}
 
 
 @router.get("/databases/{database_id}")
-def single_database(database_id: str, access_token: str = Depends(security), db: Session = Depends(get_db)):
-    current_user = get_current_user(access_token.credentials)
-    check_authentication(current_user)
-
-    user_database = db.query(Database).filter(
-        Database.id == database_id).first()
+async def single_database(database_id: str, current_user: SimpleNamespace = Depends(authenticated_user),
+                          db: Session = Depends(get_fresh_or_read_db),
+                          fresh: bool = Query(False, description="Probe the database now instead of using the last stored results")):
+    user_database = await run_in_threadpool(db.query(Database).filter(
+        Database.id == database_id).first)
     if not user_database:
         raise HTTPException(status_code=404, detail="Database not found")
 
@@ -646,41 +841,36 @@ def single_database(database_id: str, access_token: str = Depends(security), db:
                 {user_database.database_flavour_name} is not mysql or postgres."""
         )
 
-    database_service = db_flavour['class']
+    database_service = get_flavour_service(
+        db_flavour, user_database.host, user_database.port)
 
-    # Get db status
-    try:
-        database_connection = database_service.create_db_connection(
-            user=user_database.user, password=user_database.password, db_name=user_database.name)
-        if not database_connection:
-            db_status = False
-        else:
-            db_status = True
-    except:
-        db_status = False
-    finally:
-        if database_connection:
-            if database_service == MysqlDbService():
-                if database_connection.is_connected():
-                    database_connection.close()
-                else:
-                    database_connection.close()
+    # status and size come from the background probes unless asked to measure now
+    if fresh:
+        status = await probe_database(database_service, user_database)
+        await run_in_threadpool(record_statuses, db, {user_database.id: status})
+        sizes = await database_service.collect_all_sizes([user_database.name])
+        if sizes and user_database.name in sizes:
+            await run_in_threadpool(
+                record_size_samples, db, {user_database.id: sizes[user_database.name]})
+        await run_in_threadpool(save_to_database, db)
+        await run_in_threadpool(db.refresh, user_database)
+
+    storage_age = None
+    if user_database.size_sampled_at:
+        storage_age = (datetime.now() - user_database.size_sampled_at).total_seconds()
 
     database_dict = {
         **user_database.__dict__,
-        "db_status": db_status,
-        "default_storage_kb": database_service.get_database_size(
-            user=user_database.user, password=user_database.password, db_name=user_database.name)
+        "db_status": user_database.db_status,
+        "default_storage_kb": user_database.default_storage_kb,
+        "default_storage_age_seconds": storage_age
     }
 
     return SimpleNamespace(status_code=200, data={"database": database_dict})
 
 
 @router.get("/databases/{database_id}/password")
-def get_database_password(database_id: str, access_token: str = Depends(security), db: Session = Depends(get_db)):
-    current_user = get_current_user(access_token.credentials)
-    check_authentication(current_user)
-
+def get_database_password(database_id: str, current_user: SimpleNamespace = Depends(authenticated_user), db: Session = Depends(get_read_db)):
     db_exists = db.query(Database).filter(Database.id == database_id).first()
     if not db_exists:
         raise HTTPException(
@@ -688,12 +878,82 @@ def get_database_password(database_id: str, access_token: str = Depends(security
     return SimpleNamespace(status_code=200, data={"database": {"password": db_exists.password}})
 
 
-@router.post("/databases/{database_id}/revoke_write_access")
-def revoke_write_access(database_id: str, access_token: str = Depends(security), db: Session = Depends(get_db)):
-    current_user = get_current_user(access_token.credentials)
-    check_authentication(current_user)
+@router.get("/databases/{database_id}/forecast")
+def get_database_forecast(database_id: str, current_user: SimpleNamespace = Depends(authenticated_user), db: Session = Depends(get_read_db)):
+    database = db.query(Database).filter(Database.id == database_id).first()
+    if not database:
+        raise HTTPException(
+            status_code=404, detail=f"Database with ID {database_id} not found")
 
+    forecast = forecast_databases(db, [database.id]).get(database.id)
+    if not forecast:
+        return SimpleNamespace(status_code=200, data={"forecast": None},
+                               message="Not enough size samples for a forecast yet")
+
+    return SimpleNamespace(status_code=200, data={"forecast": dict(
+        growth_kb_per_day=round(forecast.growth_bytes_per_day / 1024, 2),
+        used_kb=forecast.latest_bytes // 1024,
+        allocated_kb=forecast.allocated_bytes // 1024,
+        days_to_full=round(forecast.days_to_full, 2) if forecast.days_to_full is not None else None,
+        full_at=forecast.full_at,
+        samples=forecast.samples
+    )})
+
+
+@router.get("/databases/{database_id}/events")
+def get_database_events(
+    database_id: str,
+    current_user: SimpleNamespace = Depends(authenticated_user),
+    db: Session = Depends(get_read_db),
+    page: int = Query(default=1, ge=1, description="Page number"),
+    per_page: int = Query(default=20, ge=1, le=100,
+                          description="Items per page")
+):
     database = db.query(Database).filter(Database.id == database_id).first()
+    if not database:
+        raise HTTPException(
+            status_code=404, detail=f"Database with ID {database_id} not found")
+    if current_user.role != "administrator" and str(database.owner_id) != str(current_user.id):
+        raise HTTPException(
+            status_code=403, detail="You are not allowed to view this database's events")
+
+    # newest first, served by the (database_id, created_at) index
+    query = db.query(AuditEvent).filter(
+        AuditEvent.database_id == database.id
+    ).order_by(AuditEvent.created_at.desc(), AuditEvent.id.desc())
+
+    total_count = query.count()
+    total_pages = (total_count + per_page - 1) // per_page
+    events = query.offset((page - 1) * per_page).limit(per_page).all()
+
+    return {
+        "status_code": 200,
+        "data": {
+            "pagination": {
+                "total": total_count,
+                "pages": total_pages,
+                "page": page,
+                "per_page": per_page,
+                "next": page + 1 if page < total_pages else None,
+                "prev": page - 1 if page > 1 else None
+            },
+            "events": [dict(
+                id=event.id,
+                created_at=event.created_at,
+                operation=event.operation,
+                status=event.status,
+                user_id=event.user_id,
+                user_email=event.user_email,
+                description=event.description
+            ) for event in events]
+        }
+    }
+
+
+@router.post("/databases/{database_id}/revoke_write_access")
+async def revoke_write_access(database_id: str, current_user: SimpleNamespace = Depends(authenticated_user), db: Session = Depends(get_db)):
+    database = await run_in_threadpool(
+        db.query(Database).filter(Database.id == database_id).first)
     if database is None:
         # log_data = {
         #   "operation": "DATABASE REVOKE",
@@ -701,12 +961,12 @@ def revoke_write_access(database_id: str, access_token: str = Depends(security),
         #   # "user_id": current_user.user_id,
         #   # "user_email": user_email,
         #   "model":"Database",
-        #   "description":f"Failed to get Database with ID: {database.id}"
+        #   "description":f"Failed to get Database with ID: {database_id}"
         # }
         # send_async_log_message(log_data)
         raise HTTPException(status_code=404, detail="Databases not found")
 
-    revoked_db = revoke_database(database)
+    revoked_db = await revoke_database_async(database)
     if type(revoked_db) == SimpleNamespace:
         status_code = revoked_db.status_code if revoked_db.status_code else 500
         # log_data = {
@@ -715,7 +975,7 @@ def revoke_write_access(database_id: str, access_token: str = Depends(security),
         #   "user_id": current_user.user_id,
         #   "user_email": user_email,
         #   "model":"Database",
-        #   "description":f"Database: {database.id} is {disbled_database.message}."
+        #   "description":f"Database: {database_id} is {disbled_database.message}."
         # }
         # send_async_log_message(log_data)
         return dict(status_code=status_code, message=revoked_db.message)
@@ -725,18 +985,17 @@ def revoke_write_access(database_id: str, access_token: str = Depends(security),
     #   "user_id": user_id,
     #   "user_email": user_email,
     #   "model":"Database",
-    #   "description":f"Database: {database.id} is successfully revoked."
+    #   "description":f"Database: {database_id} is successfully revoked."
     # }
     # send_async_log_message(log_data)
+    await run_in_threadpool(save_to_database, db)
     return {"message": "Database revoked successfully"}
 
 
 @router.post("/databases/{database_id}/undo_database_revoke")
-def undo_database_access_revoke(database_id: str, access_token: str = Depends(security), db: Session = Depends(get_db)):
-    current_user = get_current_user(access_token.credentials)
-    check_authentication(current_user)
-
-    database = db.query(Database).filter(Database.id == database_id).first()
+async def undo_database_access_revoke(database_id: str, current_user: SimpleNamespace = Depends(authenticated_user), db: Session = Depends(get_db)):
+    database = await run_in_threadpool(
+        db.query(Database).filter(Database.id == database_id).first)
     if database is None:
         # log_data = {
         #   "operation": "DATABASE UNREVOKE",
@@ -744,12 +1003,12 @@ def undo_database_access_revoke(database_id: str, access_token: str = Depends(se
         #   "user_id": current_user.user_id,
         #   "user_email": user_email,
         #   "model":"Database",
-        #   "description":f"Failed to get Database with ID: {database.id}"
+        #   "description":f"Failed to get Database with ID: {database_id}"
         # }
         # send_async_log_message(log_data)
         raise HTTPException(status_code=404, detail="Databases not found")
 
-    revoked_db = undo_database_revoke(database)
+    revoked_db = await undo_database_revoke(database)
     if type(revoked_db) == SimpleNamespace:
         status_code = revoked_db.status_code if revoked_db.status_code else 500
         # log_data = {
@@ -758,7 +1017,7 @@ def undo_database_access_revoke(database_id: str, access_token: str = Depends(se
         #   "user_id": current_user.user_id,
         #   "user_email": user_email,
         #   "model":"Database",
-        #   "description":f"Database: {database.id} is {revoked_db.message}."
+        #   "description":f"Database: {database_id} is {revoked_db.message}."
         # }
         # send_async_log_message(log_data)
         return dict(status_code=status_code, message=revoked_db.message)
@@ -768,7 +1027,47 @@ def undo_database_access_revoke(database_id: str, access_token: str = Depends(se
     #   "user_id": current_user.user_id,
     #   "user_email": user_email,
     #   "model":"Database",
-    #   "description":f"Database: {database.id} is unrevoked successfully."
+    #   "description":f"Database: {database_id} is unrevoked successfully."
     # }
     # send_async_log_message(log_data)
+    await run_in_threadpool(save_to_database, db)
     return {"message": "Database unrevoked successfully"}
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str, current_user: SimpleNamespace = Depends(authenticated_user)):
+    # checked for every state, failed and pending jobs carry no user in
+    # their result
+    owner = get_job_owner(job_id)
+    if owner is None or (owner != str(current_user.id)
+                         and current_user.role != "administrator"):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    job = AsyncResult(job_id, app=celery_app)
+    info = job.info if isinstance(job.info, dict) else {}
+
+    data = dict(id=job.id, state=job.state)
+    if job.state == 'PROGRESS':
+        data['progress'] = info
+    elif job.successful():
+        data['result'] = job.result
+    elif job.failed():
+        data['error'] = str(job.result)
+
+    return SimpleNamespace(status_code=200, data={"job": data})
+
+
+def job_user(current_user):
+    return dict(id=current_user.id, email=current_user.email)
+
+
+def job_accepted(job, database_id):
+    return JSONResponse(
+        status_code=202,
+        content=dict(
+            status_code=202,
+            message="Job accepted",
+            data={"job": {"id": job.id, "database_id": str(database_id)}}
+        ),
+        headers={"Location": f"/jobs/{job.id}"}
+    )
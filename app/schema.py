@@ -24,6 +24,11 @@ class DatabaseFlavor(BaseModel):
     project_id: str
 
 
+class DatabaseBatch(BaseModel):
+
+    databases: List[DatabaseFlavor] = Field(min_length=1, max_length=50)
+
+
 class PasswordUpdate(BaseModel):
 
     password: str
@@ -36,6 +41,6 @@ class UserGraphSchema(BaseModel):
 
     @validator('set_by')
     def validate_set_by(cls, value):
-        if value not in ['year', 'month']:
-            raise ValueError('set_by should be year or month')
+        if value not in ['year', 'month', 'week', 'day']:
+            raise ValueError('set_by should be year, month, week or day')
         return value
@@ -1,17 +1,37 @@
 
 import os
-from celery import Celery, shared_task, states
-from celery.schedules import crontab
+from contextlib import contextmanager
+from uuid import uuid4
+from celery import Celery, shared_task, states, chain, chord, group
+from celery.signals import worker_process_init, worker_process_shutdown
+from redis import Redis
 
 
 from app.database import SessionLocal
-from app.helpers.email import send_database_limit_email_async
-from app.helpers.database_flavor import get_db_flavour, revoke_database
+from app.helpers.email_outbox import deliver_outbox, prune_outbox
+from app.helpers.notifications import queue_capping_digests
+from app.helpers.audit import ensure_audit_partitions
+from app.helpers.database_counters import rebuild_database_counters
+from app.helpers.database_rollups import rebuild_daily_counts
+from app.helpers.database_flavor import get_db_flavour, get_flavour_service, get_database_service, revoke_database, database_flavours
+from app.helpers.placement import choose_host
+from app.helpers.standby_pool import replenish_standby_databases, claim_standby_database
+from app.helpers.size_sampler import sample_database_sizes, prune_size_samples
+from app.helpers.forecast import update_forecasts
+from app.helpers.size_schedule import next_check_times
+from sqlalchemy import or_, update
+from app.helpers.status_prober import probe_database_statuses
+from app.helpers.checkpoint import get_checkpoint, start_run, is_resumable, is_running
+from app.helpers.database_service import generate_db_credentials
+from app.helpers.logger import send_async_log_message, activity_log_shipper
+from app.helpers.metrics import metrics
+from config import settings
 
 from app.models import Database
 from app.helpers.database_session import db_dependency
 
 import asyncio
+import datetime
 
 
 redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
@@ -26,63 +46,520 @@ def update_celery(app):
     celery_app.conf.enable_utc=False
     return celery_app
 
+@worker_process_init.connect
+def start_activity_log_shipper(**kwargs):
+    # a forked worker process does not inherit the shipper thread
+    activity_log_shipper.start()
+
+
+@worker_process_shutdown.connect
+def stop_activity_log_shipper(**kwargs):
+    # pool processes exit without running atexit hooks
+    activity_log_shipper.stop()
+
+
 @celery_app.on_after_configure.connect
 def setup_periodic_tasks(**kwargs):
     
     celery_app.add_periodic_task(
-        crontab(hour=11, minute=36),
+        settings.SIZE_CHECK_TICK,
         database_capping.s(),
-        name='send capping email')
+        name='check due database sizes')
+
+    celery_app.add_periodic_task(
+        settings.STANDBY_POOL_REPLENISH_INTERVAL,
+        replenish_standby_pool.s(),
+        name='replenish standby databases')
+
+    celery_app.add_periodic_task(
+        settings.EMAIL_DELIVERY_INTERVAL,
+        deliver_emails.s(),
+        name='deliver emails')
+
+    celery_app.add_periodic_task(
+        86400,
+        maintain_audit_partitions.s(),
+        name='maintain audit partitions')
+
+    celery_app.add_periodic_task(
+        86400,
+        reconcile_database_counters.s(),
+        name='reconcile database counters')
+
+    celery_app.add_periodic_task(
+        settings.FORECAST_INTERVAL,
+        update_size_forecasts.s(),
+        name='update size forecasts')
+
+    celery_app.add_periodic_task(
+        settings.STATUS_PROBE_INTERVAL,
+        probe_statuses.s(),
+        name='probe database statuses')
+
+
+CAPPING_CHECKPOINT = 'database_capping'
 
 
 @celery_app.task(name = "send capping email")
 def database_capping():
+    """ Start a capping run over the due databases, resume an interrupted
+    one from its checkpoint, or leave a run still in progress alone """
+    return start_capping()
+
+
+def start_capping():
     db = SessionLocal()
-    
-    databases = db.query(Database).all()
+    try:
+        checkpoint = get_checkpoint(db, CAPPING_CHECKPOINT)
+        if is_resumable(checkpoint, settings.CAPPING_STALE_SECONDS):
+            after_id = str(checkpoint.last_id) if checkpoint.last_id else None
+            checkpoint.updated_at = datetime.datetime.now()
+            db.commit()
+            print(f"Resuming database capping after {after_id}")
+        elif is_running(checkpoint, settings.CAPPING_STALE_SECONDS):
+            db.rollback()
+            return None
+        else:
+            after_id = None
+            start_run(db, CAPPING_CHECKPOINT, dict(
+                checked=0, warned=0, revoked=0, failed=0))
+    finally:
+        db.close()
+    return run_capping_batch(after_id)
+
+
+def run_capping_batch(after_id):
+    """ Fan out the next keyset batch of due databases after `after_id`.
+
+    Picked rows are leased for SIZE_CHECK_LEASE seconds so a failed chunk is
+    retried by a later run. The databases of a host are split into chunks
+    spread over at most CAPPING_HOST_CONCURRENCY chains so a single server
+    is not flooded. The chord callback saves the checkpoint and moves on to
+    the next batch.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.datetime.now()
+        query = db.query(Database.id, Database.database_flavour_name,
+                         Database.host, Database.port).filter(
+            Database.deleted == False,
+            Database.disabled == False,
+            or_(Database.next_size_check_at == None,
+                Database.next_size_check_at <= now))
+        if after_id:
+            query = query.filter(Database.id > after_id)
+        rows = query.order_by(Database.id).limit(settings.CAPPING_BATCH_SIZE).\
+            with_for_update(skip_locked=True).all()
+        if rows:
+            db.execute(update(Database).where(
+                Database.id.in_([row[0] for row in rows])).values(
+                next_size_check_at=now + datetime.timedelta(
+                    seconds=settings.SIZE_CHECK_LEASE)))
+        db.commit()
+    finally:
+        db.close()
+
+    if not rows:
+        return finish_capping()
+
+    by_host = {}
+    for database_id, flavour_name, host, port in rows:
+        by_host.setdefault((flavour_name, host, port), []).append(str(database_id))
+
+    chains = []
+    for database_ids in by_host.values():
+        chunks = [database_ids[index:index + settings.CAPPING_CHUNK_SIZE]
+                  for index in range(0, len(database_ids), settings.CAPPING_CHUNK_SIZE)]
+        lanes = [chunks[lane::settings.CAPPING_HOST_CONCURRENCY]
+                 for lane in range(settings.CAPPING_HOST_CONCURRENCY)]
+        for lane in lanes:
+            if not lane:
+                continue
+            # each chunk adds its counts to the summary of the one before
+            chains.append(chain(
+                check_capping_chunk.s(None, lane[0]),
+                *[check_capping_chunk.s(chunk) for chunk in lane[1:]]))
+
+    return chord(group(chains))(finish_capping_batch.s(str(rows[-1][0]))).id
+
+
+@celery_app.task(name="finish capping batch")
+def finish_capping_batch(results, last_id):
+    db = SessionLocal()
+    try:
+        checkpoint = get_checkpoint(db, CAPPING_CHECKPOINT)
+        summary = dict(checkpoint.summary or {})
+        for result in results:
+            for key in ('checked', 'warned', 'revoked', 'failed'):
+                summary[key] = summary.get(key, 0) + (result or {}).get(key, 0)
+        checkpoint.summary = summary
+        checkpoint.last_id = last_id
+        checkpoint.updated_at = datetime.datetime.now()
+        db.commit()
+    finally:
+        db.close()
+    return run_capping_batch(last_id)
+
+
+def finish_capping():
+    db = SessionLocal()
+    try:
+        checkpoint = get_checkpoint(db, CAPPING_CHECKPOINT)
+        now = datetime.datetime.now()
+        summary = dict(checkpoint.summary or {})
+        summary['duration'] = round(
+            (now - checkpoint.run_started_at).total_seconds(), 3)
+        checkpoint.summary = summary
+        checkpoint.finished_at = now
+        checkpoint.updated_at = now
+        db.commit()
+    finally:
+        db.close()
+
+    for key, value in summary.items():
+        metrics.set_gauge(f'capping_last_run_{key}', value)
+    print(f"Database capping finished: {summary}")
+    return summary
+
+
+def is_filling_up(database):
+    """ True when the database is projected to fill up within FORECAST_WARNING_DAYS """
+    return bool(database.forecast_full_at) and database.forecast_full_at <= \
+        datetime.datetime.now() + datetime.timedelta(days=settings.FORECAST_WARNING_DAYS)
+
+
+def check_database_capping(db, database, used_size):
+    """ Revoke a full database, returns 'revoked', 'warning' or None.
+
+    Emails are left to queue_capping_digests so an owner gets one per run.
+    """
+    allocated_size = database.allocated_size_kb
+
+    if database.revoked:
+        # the owner was told when it was revoked
+        return None
+
+    if used_size >= allocated_size:
+
+        # Revoking database
+        revoked = revoke_database(database)
+        if revoked is not True:
+            raise RuntimeError(revoked.message)
+        return 'revoked'
+
+    elif used_size >= 0.7 * allocated_size or is_filling_up(database):
+        return 'warning'
+
+
+@celery_app.task(name="check capping chunk")
+def check_capping_chunk(summary, database_ids):
+    summary = dict(summary or dict(checked=0, warned=0, revoked=0, failed=0))
+    # ids not yet handled, only these count as failed if the chunk breaks
+    pending = set(str(database_id) for database_id in database_ids)
+    db = SessionLocal()
+    try:
+        databases = db.query(Database).filter(Database.id.in_(database_ids)).all()
+        # ids that are gone since the batch was planned are not failures
+        pending = set(str(database.id) for database in databases)
+
+        # one size query for the chunk, the sizes are kept as samples too
+        now = datetime.datetime.now()
+        sizes = sample_database_sizes(db, databases)
+        next_checks = next_check_times(databases, sizes, now)
+
+        events = []
+        for database in databases:
+            pending.discard(str(database.id))
+            used_size = sizes.get(database.id)
+            if used_size is None:
+                continue
+            summary['checked'] += 1
+            try:
+                # a savepoint per database, a failure must not undo the
+                # revoked flags of the ones already revoked on the server
+                with db.begin_nested():
+                    outcome = check_database_capping(db, database, used_size // 1024)
+            except Exception as e:
+                print(f"Capping check failed for {database.id}: {e}")
+                summary['failed'] += 1
+                continue
+            if outcome:
+                events.append((database, outcome, used_size // 1024))
+            if outcome == 'revoked':
+                summary['revoked'] += 1
+                # stays full until the owner acts, no need to look often
+                next_checks[database.id] = now + datetime.timedelta(
+                    seconds=settings.SIZE_CHECK_MAX_INTERVAL)
+                # the server is already revoked, keep the flag whatever
+                # happens to the rest of the chunk
+                db.commit()
+
+        # one email per owner for the whole chunk
+        summary['warned'] += queue_capping_digests(db, events)
+
+        if next_checks:
+            db.execute(update(Database), [
+                dict(id=database_id, next_size_check_at=next_check)
+                for database_id, next_check in next_checks.items()
+            ])
+        db.commit()
+        metrics.increment('size_checks_total', len(sizes))
+        if events:
+            deliver_emails.delay()
+    except Exception as e:
+        # a broken chunk must not stop the rest of the chain
+        print(f"Capping chunk failed: {e}")
+        db.rollback()
+        summary['failed'] += len(pending)
+    finally:
+        db.close()
+    return summary
+
+
+@celery_app.task(name="replenish standby databases")
+def replenish_standby_pool():
+    db = SessionLocal()
+    try:
+        return replenish_standby_databases(db, database_flavours)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="deliver emails")
+def deliver_emails():
+    db = SessionLocal()
+    try:
+        summary = deliver_outbox(db)
+        prune_outbox(db)
+        return summary
+    finally:
+        db.close()
+
+
+@celery_app.task(name="maintain audit partitions")
+def maintain_audit_partitions():
+    db = SessionLocal()
+    try:
+        created, dropped = ensure_audit_partitions(db)
+        return dict(created=created, dropped=dropped)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="reconcile database counters")
+def reconcile_database_counters():
+    db = SessionLocal()
+    try:
+        rebuild_daily_counts(db)
+        return rebuild_database_counters(db)
+    finally:
+        db.close()
+
+
+@celery_app.task(name="update size forecasts")
+def update_size_forecasts():
+    db = SessionLocal()
+    try:
+        prune_size_samples(db)
+        return len(update_forecasts(db))
+    finally:
+        db.close()
+
+
+@celery_app.task(name="probe database statuses")
+def probe_statuses():
+    db = SessionLocal()
+    try:
+        return len(probe_database_statuses(db))
+    finally:
+        db.close()
+
+
+class DatabaseJobError(Exception):
+    """Raised by a provisioning job to mark it as failed"""
+
+
+@contextmanager
+def database_job_lock(database_id):
+    """ Hold a redis lock for a database while a job works on it.
+
+    Yields False when another job holds the lock. The lock expires on its
+    own so a crashed worker cannot block the database forever.
+    """
+    client = Redis.from_url(redis_url)
+    lock = client.lock(f"database-job:{database_id}",
+                       timeout=settings.DATABASE_JOB_LOCK_TIMEOUT)
+    acquired = lock.acquire(blocking=False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            lock.release()
+
+
+def submit_job(task, user, *args):
+    """ Queue a database job for `user`, who is passed as its last argument.
+
+    The owner is kept under its own key next to the result, the result
+    itself is an exception or empty for failed and pending jobs.
+    """
+    job_id = str(uuid4())
+    Redis.from_url(redis_url).set(
+        f"job-owner:{job_id}", str(user['id']),
+        ex=celery_app.conf.result_expires or datetime.timedelta(days=1))
+    return task.apply_async(args=(*args, user), task_id=job_id)
+
+
+def get_job_owner(job_id):
+    """ Id of the user who submitted a job, None when it is not known """
+    owner = Redis.from_url(redis_url).get(f"job-owner:{job_id}")
+    return owner.decode() if owner is not None else None
+
+
+def _job_failed(user, operation, message, database_id=None):
+    send_async_log_message({
+        "operation": operation,
+        "a_db_id": database_id,
+        "status": "Failed",
+        "user_id": user['id'],
+        "user_email": user['email'],
+        "model": "Database",
+        "description": message
+    })
+    raise DatabaseJobError(message)
+
+
+def _job_succeeded(user, operation, message, database_id=None):
+    send_async_log_message({
+        "operation": operation,
+        "a_db_id": database_id,
+        "status": "Success",
+        "user_id": user['id'],
+        "user_email": user['email'],
+        "model": "Database",
+        "description": message
+    })
+
+
+@celery_app.task(bind=True, name="create database job")
+def create_database_job(self, database_id, database_flavour_name, project_id, user):
+    with database_job_lock(database_id) as locked:
+        if not locked:
+            raise self.retry(countdown=settings.DATABASE_JOB_RETRY_DELAY, max_retries=None)
+
+        db = SessionLocal()
+        try:
+            self.update_state(state='PROGRESS', meta={
+                'user_id': user['id'], 'database_id': database_id, 'step': 'provisioning'})
+            db_flavour = get_db_flavour(database_flavour_name)
+            standby = claim_standby_database(db, db_flavour['name'])
+
+            if standby:
+                credentials = admin_host = standby
+            else:
+                credentials = generate_db_credentials()
+                admin_host = choose_host(db, db_flavour['name'])
+                if not admin_host:
+                    _job_failed(user, "Create", "No database host has capacity for a new database", database_id)
+                database_service = get_flavour_service(
+                    db_flavour, admin_host.host, admin_host.port, is_async=False)
+                if not database_service.check_db_connection():
+                    _job_failed(user, "Create", "Failed to connect to the database service", database_id)
+                if not database_service.create_database(
+                        db_name=credentials.name,
+                        user=credentials.user,
+                        password=credentials.password):
+                    _job_failed(user, "Create", "Failed to create database", database_id)
 
-    for database in databases:
+            self.update_state(state='PROGRESS', meta={
+                'user_id': user['id'], 'database_id': database_id, 'step': 'saving'})
+            database = Database(
+                id=database_id,
+                user=credentials.user,
+                password=credentials.password,
+                name=credentials.name,
+                database_flavour_name=database_flavour_name,
+                host=admin_host.host,
+                port=admin_host.port,
+                owner_id=user['id'],
+                project_id=project_id,
+                email=user['email']
+            )
+            db.add(database)
+            db.commit()
+        finally:
+            db.close()
 
-        database_service = get_db_flavour(database.database_flavour_name)['class']
+    _job_succeeded(user, "Create", "Database successfully created.", database_id)
+    return {"user_id": user['id'], "database_id": database_id,
+            "message": "Database successfully created"}
 
-        used_size = database_service.get_database_size(database.name , database.user , database.password)
-        allocated_size = database.allocated_size_kb
-        
-        if (str(used_size.split()[0]) != 'N/A'):
 
-            used_size = int(used_size.split()[0])
+@celery_app.task(bind=True, name="reset database job")
+def reset_database_job(self, database_id, user):
+    with database_job_lock(database_id) as locked:
+        if not locked:
+            raise self.retry(countdown=settings.DATABASE_JOB_RETRY_DELAY, max_retries=None)
 
-            if used_size >= allocated_size:
+        db = SessionLocal()
+        try:
+            self.update_state(state='PROGRESS', meta={
+                'user_id': user['id'], 'database_id': database_id, 'step': 'resetting'})
+            database = db.query(Database).filter(Database.id == database_id).first()
+            if not database:
+                _job_failed(user, "RESET", f"Failed to get Database with ID: {database_id}", database_id)
 
-                # Revoking database
-                revoke_database(database)
+            database_service = get_database_service(database, is_async=False)
+            if not database_service.check_db_connection():
+                _job_failed(user, "RESET", "Failed to connect to the database service", database_id)
 
-                #Sending the database limit email
-                asyncio.run(send_database_limit_email_async(
-                    "Database Revoked",
-                    [str(database.email)],
-                    database.__dict__
-                ))
+            if not database_service.reset_database(
+                    db_name=database.name,
+                    user=database.user,
+                    password=database.password):
+                _job_failed(user, "RESET", f"Failed to reset database: {database_id}", database_id)
+        finally:
+            db.close()
 
-            elif used_size >= 0.7 * allocated_size:
+    _job_succeeded(user, "DATABASE RESET", f"Database: {database_id} is successfully reset.", database_id)
+    return {"user_id": user['id'], "database_id": database_id,
+            "message": "Database Reset Successfully"}
 
-                #Check if the user has not been notified 
-                if not db.query(Database).filter_by(owner_id=database.owner_id, notified=True).first():
 
-                    #Send the email 
-                    asyncio.run(send_database_limit_email_async(
-                        "Warning: Database Storage Almost Full",
-                        [str(database.email)],
-                        database.__dict__
-                    ))
+@celery_app.task(bind=True, name="reset database password job")
+def reset_database_password_job(self, database_id, user):
+    """ Apply the pending password of a database, the password itself is
+    read from the database row so it never sits in the broker """
+    with database_job_lock(database_id) as locked:
+        if not locked:
+            raise self.retry(countdown=settings.DATABASE_JOB_RETRY_DELAY, max_retries=None)
 
-                    # Updating the notification status of the database
-                    user_notification = Database(owner_id=database.owner_id, notified=True)
-                    db.add(user_notification)
-                    db.commit()
-        
+        db = SessionLocal()
+        try:
+            self.update_state(state='PROGRESS', meta={
+                'user_id': user['id'], 'database_id': database_id, 'step': 'resetting password'})
+            database = db.query(Database).filter(Database.id == database_id).first()
+            if not database:
+                _job_failed(user, "RESET PASSWORD", f"Failed to get Database with ID: {database_id}", database_id)
 
-    db.close()
+            # empty when a later reset already applied the newest password
+            if database.pending_password:
+                database_service = get_database_service(database, is_async=False)
+                if not database_service.check_db_connection():
+                    _job_failed(user, "RESET PASSWORD", "Failed to connect to the database service", database_id)
 
+                if not database_service.reset_password(
+                        user=database.user, password=database.pending_password):
+                    _job_failed(user, "RESET PASSWORD",
+                                f"Failed to reset database passsword for: {database_id}", database_id)
 
+                database.password = database.pending_password
+                database.pending_password = None
+                db.commit()
+        finally:
+            db.close()
 
+    _job_succeeded(user, "DATABASE PASSWORD RESET",
+                   f"Database: {database_id} password is successfully reset.", database_id)
+    return {"user_id": user['id'], "database_id": database_id,
+            "message": "Database Password Reset Successfully"}
@@ -5,8 +5,64 @@ from functools import lru_cache
 class BaseConfig:
     DATABASE_URI: str = os.getenv("DATABASE_URI")
     DATABASE_USER: str = os.getenv("DATABASE_USER")
+    # Optional read replicas of the metadata database, comma separated
+    DATABASE_REPLICA_URIS: str = os.getenv("DATABASE_REPLICA_URIS", "")
+    REPLICA_MAX_LAG_SECONDS: float = float(
+        os.getenv("REPLICA_MAX_LAG_SECONDS", 5))
+    REPLICA_LAG_CHECK_INTERVAL: float = float(
+        os.getenv("REPLICA_LAG_CHECK_INTERVAL", 5))
+    # reads go to the primary for this long after a user's own write
+    READ_YOUR_WRITES_SECONDS: float = float(
+        os.getenv("READ_YOUR_WRITES_SECONDS", 5))
     JWT_SALT: str = os.getenv("JWT_SALT")
+    # verified tokens are cached until they expire, at most this long,
+    # a size of 0 turns the cache off
+    AUTH_TOKEN_CACHE_SIZE: int = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 4096))
+    AUTH_TOKEN_CACHE_TTL: int = int(os.getenv("AUTH_TOKEN_CACHE_TTL", 300))
     ACTIVITY_LOGGER_URL = os.getenv("ACTIVITY_LOGGER_URL")
+    # Activity log shipping, events are queued and sent by one thread
+    ACTIVITY_LOG_QUEUE_SIZE: int = int(
+        os.getenv("ACTIVITY_LOG_QUEUE_SIZE", 10000))
+    ACTIVITY_LOG_BATCH_SIZE: int = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", 50))
+    ACTIVITY_LOG_FLUSH_INTERVAL: float = float(
+        os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL", 1))
+    # "drop" new events when the queue is full or "block" the caller
+    # for up to ACTIVITY_LOG_BLOCK_TIMEOUT seconds before dropping
+    ACTIVITY_LOG_FULL_POLICY: str = os.getenv(
+        "ACTIVITY_LOG_FULL_POLICY", "drop")
+    ACTIVITY_LOG_BLOCK_TIMEOUT: float = float(
+        os.getenv("ACTIVITY_LOG_BLOCK_TIMEOUT", 1))
+    ACTIVITY_LOG_TIMEOUT: float = float(os.getenv("ACTIVITY_LOG_TIMEOUT", 5))
+    # undeliverable events are spooled here and replayed later, empty
+    # turns the spool off
+    ACTIVITY_SPOOL_DIR: str = os.getenv(
+        "ACTIVITY_SPOOL_DIR", "/var/tmp/database-api/activity-spool")
+    ACTIVITY_SPOOL_SEGMENT_BYTES: int = int(
+        os.getenv("ACTIVITY_SPOOL_SEGMENT_BYTES", 1048576))
+    ACTIVITY_SPOOL_MAX_BYTES: int = int(
+        os.getenv("ACTIVITY_SPOOL_MAX_BYTES", 104857600))
+    # "always" fsyncs every write, "interval" at most every
+    # ACTIVITY_SPOOL_FSYNC_INTERVAL seconds and "never" leaves it to the OS
+    ACTIVITY_SPOOL_FSYNC: str = os.getenv("ACTIVITY_SPOOL_FSYNC", "interval")
+    ACTIVITY_SPOOL_FSYNC_INTERVAL: float = float(
+        os.getenv("ACTIVITY_SPOOL_FSYNC_INTERVAL", 1))
+    ACTIVITY_SPOOL_RETRY_BASE_DELAY: float = float(
+        os.getenv("ACTIVITY_SPOOL_RETRY_BASE_DELAY", 1))
+    ACTIVITY_SPOOL_RETRY_MAX_DELAY: float = float(
+        os.getenv("ACTIVITY_SPOOL_RETRY_MAX_DELAY", 60))
+    # segments of a process that went away are replayed after this long
+    ACTIVITY_SPOOL_STALE_SECONDS: int = int(
+        os.getenv("ACTIVITY_SPOOL_STALE_SECONDS", 300))
+
+    # Audit events kept in the metadata database
+    AUDIT_ENABLED: bool = os.getenv("AUDIT_ENABLED", "true").lower() == "true"
+    AUDIT_QUEUE_SIZE: int = int(os.getenv("AUDIT_QUEUE_SIZE", 10000))
+    AUDIT_BATCH_SIZE: int = int(os.getenv("AUDIT_BATCH_SIZE", 200))
+    AUDIT_FLUSH_INTERVAL: float = float(os.getenv("AUDIT_FLUSH_INTERVAL", 2))
+    # monthly partitions older than this are dropped, 0 keeps them all
+    AUDIT_RETENTION_MONTHS: int = int(os.getenv("AUDIT_RETENTION_MONTHS", 12))
+    # partitions are created this many months ahead
+    AUDIT_PARTITIONS_AHEAD: int = int(os.getenv("AUDIT_PARTITIONS_AHEAD", 2))
 
     MAIL_USERNAME : str = os.getenv("MAIL_USERNAME")
     MAIL_PASSWORD : str = os.getenv("MAIL_PASSWORD")
@@ -22,6 +78,101 @@ class BaseConfig:
     ADMIN_MYSQL_HOST: str = os.getenv("ADMIN_MYSQL_HOST")
     ADMIN_MYSQL_PORT: int = os.getenv("ADMIN_MYSQL_PORT")
 
+    # Extra admin hosts per flavour as "host:port[:max_databases],...",
+    # when unset the single ADMIN_*_HOST above is used
+    ADMIN_MYSQL_HOSTS: str = os.getenv("ADMIN_MYSQL_HOSTS", "")
+    ADMIN_PSQL_HOSTS: str = os.getenv("ADMIN_PSQL_HOSTS", "")
+    # 0 means no limit
+    ADMIN_HOST_MAX_DATABASES: int = int(
+        os.getenv("ADMIN_HOST_MAX_DATABASES", 0))
+    ADMIN_HOST_MAX_STORAGE_KB: int = int(
+        os.getenv("ADMIN_HOST_MAX_STORAGE_KB", 0))
+    # storage, count or load
+    PLACEMENT_STRATEGY: str = os.getenv("PLACEMENT_STRATEGY", "storage")
+
+    # Admin connection pools
+    ADMIN_POOL_SIZE: int = int(os.getenv("ADMIN_POOL_SIZE", 5))
+    ADMIN_POOL_MIN_SIZE: int = int(os.getenv("ADMIN_POOL_MIN_SIZE", 1))
+    ADMIN_POOL_TIMEOUT: float = float(os.getenv("ADMIN_POOL_TIMEOUT", 10))
+    ADMIN_POOL_MAX_LIFETIME: int = int(
+        os.getenv("ADMIN_POOL_MAX_LIFETIME", 1800))
+    ADMIN_POOL_PING_INTERVAL: int = int(
+        os.getenv("ADMIN_POOL_PING_INTERVAL", 30))
+    ADMIN_CONNECT_TIMEOUT: int = int(os.getenv("ADMIN_CONNECT_TIMEOUT", 5))
+
+    # Admin server health checks
+    ADMIN_HEALTH_FAILURE_THRESHOLD: int = int(
+        os.getenv("ADMIN_HEALTH_FAILURE_THRESHOLD", 3))
+    ADMIN_HEALTH_RESET_TIMEOUT: int = int(
+        os.getenv("ADMIN_HEALTH_RESET_TIMEOUT", 30))
+    ADMIN_HEALTH_PROBE_INTERVAL: int = int(
+        os.getenv("ADMIN_HEALTH_PROBE_INTERVAL", 15))
+
+    # Pre-provisioned databases kept per flavour, e.g "mysql:5,postgres:5"
+    STANDBY_POOL_TARGETS: str = os.getenv("STANDBY_POOL_TARGETS", "")
+    STANDBY_POOL_REPLENISH_INTERVAL: int = int(
+        os.getenv("STANDBY_POOL_REPLENISH_INTERVAL", 60))
+    STANDBY_POOL_METRICS_TTL: int = int(
+        os.getenv("STANDBY_POOL_METRICS_TTL", 60))
+
+    # Database size sampling, each database gets its own next check time
+    SIZE_CHECK_MIN_INTERVAL: int = int(
+        os.getenv("SIZE_CHECK_MIN_INTERVAL", 300))
+    # an idle, nearly empty database backs off to this, a week by default
+    SIZE_CHECK_MAX_INTERVAL: int = int(
+        os.getenv("SIZE_CHECK_MAX_INTERVAL", 604800))
+    # how often a capping run over the due databases is started
+    SIZE_CHECK_TICK: int = int(os.getenv("SIZE_CHECK_TICK", 60))
+    # a picked up database is retried after this long if its check fails
+    SIZE_CHECK_LEASE: int = int(os.getenv("SIZE_CHECK_LEASE", 600))
+    SIZE_SAMPLE_RETENTION_DAYS: int = int(
+        os.getenv("SIZE_SAMPLE_RETENTION_DAYS", 90))
+
+    # Growth forecasts fitted from the size samples
+    FORECAST_WINDOW_DAYS: int = int(os.getenv("FORECAST_WINDOW_DAYS", 7))
+    FORECAST_MIN_SAMPLES: int = int(os.getenv("FORECAST_MIN_SAMPLES", 3))
+    FORECAST_INTERVAL: int = int(os.getenv("FORECAST_INTERVAL", 3600))
+    # warn owners when a database is projected to fill up within this time
+    FORECAST_WARNING_DAYS: float = float(
+        os.getenv("FORECAST_WARNING_DAYS", 7))
+
+    # Tenant database status probes
+    STATUS_PROBE_INTERVAL: int = int(os.getenv("STATUS_PROBE_INTERVAL", 120))
+    STATUS_PROBE_CONCURRENCY: int = int(
+        os.getenv("STATUS_PROBE_CONCURRENCY", 20))
+    STATUS_PROBE_PER_HOST: int = int(os.getenv("STATUS_PROBE_PER_HOST", 5))
+
+    # Storage capping run
+    CAPPING_CHUNK_SIZE: int = int(os.getenv("CAPPING_CHUNK_SIZE", 200))
+    CAPPING_HOST_CONCURRENCY: int = int(
+        os.getenv("CAPPING_HOST_CONCURRENCY", 2))
+    # databases read per keyset batch, each batch is one fan-out
+    CAPPING_BATCH_SIZE: int = int(os.getenv("CAPPING_BATCH_SIZE", 5000))
+    # an unfinished run that made no progress for this long is resumed
+    CAPPING_STALE_SECONDS: int = int(os.getenv("CAPPING_STALE_SECONDS", 3600))
+
+    # Background provisioning jobs
+    DATABASE_JOB_LOCK_TIMEOUT: int = int(
+        os.getenv("DATABASE_JOB_LOCK_TIMEOUT", 600))
+    DATABASE_JOB_RETRY_DELAY: int = int(
+        os.getenv("DATABASE_JOB_RETRY_DELAY", 5))
+
+    # Email outbox delivery
+    EMAIL_DELIVERY_INTERVAL: int = int(
+        os.getenv("EMAIL_DELIVERY_INTERVAL", 30))
+    EMAIL_BATCH_SIZE: int = int(os.getenv("EMAIL_BATCH_SIZE", 100))
+    # most messages sent over one SMTP connection by a delivery run
+    EMAIL_MAX_PER_RUN: int = int(os.getenv("EMAIL_MAX_PER_RUN", 1000))
+    EMAIL_MAX_ATTEMPTS: int = int(os.getenv("EMAIL_MAX_ATTEMPTS", 6))
+    # retries wait this long, doubling up to EMAIL_RETRY_MAX_DELAY
+    EMAIL_RETRY_BASE_DELAY: int = int(
+        os.getenv("EMAIL_RETRY_BASE_DELAY", 60))
+    EMAIL_RETRY_MAX_DELAY: int = int(os.getenv("EMAIL_RETRY_MAX_DELAY", 3600))
+    # a claimed message is picked up again after this long if a run dies
+    EMAIL_SEND_LEASE: int = int(os.getenv("EMAIL_SEND_LEASE", 300))
+    EMAIL_OUTBOX_RETENTION_DAYS: int = int(
+        os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", 30))
+
 
 class DevelopmentConfig(BaseConfig):
     pass
@@ -33,6 +184,8 @@ class ProductionConfig(BaseConfig):
 class TestingConfig(BaseConfig):
     TEST_DATABASE_URI = os.getenv("TEST_DATABASE_URI")
     FASTAPI_ENV = "testing"
+    ACTIVITY_SPOOL_DIR = ""
+    AUDIT_ENABLED = False
 
 
 @lru_cache()
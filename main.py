@@ -1,11 +1,19 @@
 import os
-from app.helpers.logger import send_async_log_message
+import asyncio
+from app.helpers.logger import send_async_log_message, activity_log_shipper
+from app.helpers.audit import audit_writer
 from dotenv import load_dotenv
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi import FastAPI
 from pydantic import ValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import router
+from app.helpers.database_flavor import get_all_flavour_services
+from app.helpers.database_service import warm_up_admin_pools
+from app.helpers.connection_pool import close_admin_pools
+from app.helpers.health import HealthProber
+from app.helpers.metrics import metrics
+from threading import Thread
 
 from celery import Celery
 from celery.schedules import crontab
@@ -36,6 +44,32 @@ def create_app() -> FastAPI:
     def index():
         return {"Welcome to the Database Service"}
 
+    @app.get('/metrics', tags=['Metrics'], response_class=PlainTextResponse)
+    def get_metrics():
+        return metrics.render_prometheus()
+
+    database_services = get_all_flavour_services(is_async=False)
+    async_database_services = get_all_flavour_services()
+    health_prober = HealthProber(database_services)
+
+    @app.on_event("startup")
+    async def warm_up_connection_pools():
+        # warm up in the background so an unreachable host does not block startup
+        Thread(target=warm_up_admin_pools,
+               args=(database_services,), daemon=True).start()
+        for database_service in async_database_services:
+            asyncio.ensure_future(database_service.warm_up())
+        health_prober.start()
+
+    @app.on_event("shutdown")
+    async def close_connection_pools():
+        health_prober.stop()
+        activity_log_shipper.stop()
+        audit_writer.stop()
+        close_admin_pools()
+        for database_service in async_database_services:
+            await database_service.close_pool()
+
     @app.exception_handler(ValidationError)
     async def handle_validation_error(request, exc: ValidationError):
         errors = [str(err) for err in exc.errors()]
@@ -0,0 +1,118 @@
+import json
+import logging
+import typer
+from sqlalchemy import create_engine, func, select, text, tuple_
+
+from config import settings
+from app.models import Database
+
+cli = typer.Typer()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PER_PAGE = 10
+
+SEED_SQL = """
+    INSERT INTO user_databases (id, name, "user", password, owner_id, project_id,
+                                date_created, database_flavour_name, deleted)
+    SELECT gen_random_uuid(), 'benchmark_' || i, 'benchmark', 'benchmark',
+           md5('owner' || i % :owners)::uuid, md5('project' || i % :projects)::uuid,
+           now() - i * interval '1 minute',
+           CASE WHEN i % 2 = 0 THEN 'postgres' ELSE 'mysql' END,
+           i % 10 = 0
+    FROM generate_series(1, :rows) AS i
+"""
+
+
+def listing(*criteria, cursor=None):
+    """ The GET /databases query, see get_all_databases """
+    statement = select(Database).where(Database.deleted == False, *criteria)
+    if cursor:
+        statement = statement.where(
+            tuple_(Database.date_created, Database.id) < tuple_(*cursor))
+    return statement.order_by(
+        Database.date_created.desc(), Database.id.desc()).limit(PER_PAGE + 1)
+
+
+def query_shapes(owner_id, project_id, cursor):
+    """ (label, index expected to serve it, statement) for each route query """
+    return [
+        ('admin listing', 'ix_user_databases_live_date_created', listing()),
+        ('admin listing, cursor', 'ix_user_databases_live_date_created',
+         listing(cursor=cursor)),
+        ('owner listing', 'ix_user_databases_live_owner_id',
+         listing(Database.owner_id == owner_id)),
+        ('owner listing, cursor', 'ix_user_databases_live_owner_id',
+         listing(Database.owner_id == owner_id, cursor=cursor)),
+        ('owner total', 'ix_user_databases_live_owner_id',
+         select(func.count()).select_from(Database).where(
+             Database.owner_id == owner_id, Database.deleted == False)),
+        ('project listing', 'ix_user_databases_live_project_id',
+         listing(Database.project_id == project_id)),
+        ('flavour listing', 'ix_user_databases_live_flavour',
+         listing(Database.database_flavour_name == 'postgres')),
+        ('name lookup', 'ux_user_databases_name',
+         select(Database).where(Database.name == 'benchmark_1').limit(1)),
+    ]
+
+
+def plan_indexes(plan):
+    """ Names of the indexes a JSON plan node and its children scan """
+    names = {plan['Index Name']} if 'Index Name' in plan else set()
+    for child in plan.get('Plans', []):
+        names |= plan_indexes(child)
+    return names
+
+
+@cli.command()
+def benchmark(db_url: str = typer.Option(None, help="Database URL, defaults to DATABASE_URI"),
+              rows: int = typer.Option(200000, help="Rows to seed"),
+              owners: int = typer.Option(1000, help="Distinct owners in the seed"),
+              projects: int = typer.Option(3000, help="Distinct projects in the seed")):
+    """EXPLAIN ANALYZE each user_databases query shape against a seeded
+    table and check it is served by its index. The seed is rolled back."""
+    engine = create_engine(db_url or settings.DATABASE_URI)
+    missing = []
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            logger.info(f"Seeding {rows} rows...")
+            connection.execute(text(SEED_SQL), dict(
+                rows=rows, owners=owners, projects=projects))
+            connection.execute(text("ANALYZE user_databases"))
+
+            owner_id, project_id = connection.execute(text(
+                "SELECT owner_id, project_id FROM user_databases "
+                "WHERE name = 'benchmark_1'")).one()
+            # start the cursor pages half way down the listing
+            cursor = tuple(connection.execute(text(
+                "SELECT date_created, id FROM user_databases "
+                "WHERE name = :name"), dict(name=f'benchmark_{rows // 2}')).one())
+
+            for label, expected, statement in query_shapes(
+                    str(owner_id), str(project_id), (cursor[0], str(cursor[1]))):
+                compiled = statement.compile(dialect=connection.dialect)
+                result = connection.exec_driver_sql(
+                    f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {compiled}",
+                    compiled.params).scalar()
+                if isinstance(result, str):
+                    result = json.loads(result)
+                plan = result[0]
+                used = plan_indexes(plan['Plan'])
+                if expected not in used:
+                    missing.append(label)
+                logger.info(
+                    f"{label:<24} {plan['Execution Time']:>9.3f} ms  "
+                    f"{'ok' if expected in used else 'MISSING ' + expected}  "
+                    f"uses: {', '.join(sorted(used)) or 'no index'}")
+        finally:
+            transaction.rollback()
+
+    if missing:
+        logger.error(f"Not served by their index: {', '.join(missing)}")
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    cli()
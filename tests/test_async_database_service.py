@@ -0,0 +1,141 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+import aiomysql
+import asyncpg
+from unittest.mock import AsyncMock, MagicMock, patch
+from config import settings
+from app.helpers.async_database_service import AsyncMysqlDbService, AsyncPostgresqlDbService
+from app.helpers.health import HostHealth
+
+
+def mock_pool(connection):
+    pool = MagicMock()
+    pool.acquire = AsyncMock(return_value=connection)
+    pool.release = AsyncMock()
+    return pool
+
+
+class TestAsyncPostgresqlDbService(unittest.TestCase):
+    def setUp(self):
+        self.service = AsyncPostgresqlDbService()
+        self.connection = MagicMock()
+        self.connection.execute = AsyncMock()
+        self.pool = mock_pool(self.connection)
+        self.health = HostHealth('test', failure_threshold=1, reset_timeout=30)
+        patch.object(self.service, 'get_pool', AsyncMock(return_value=self.pool)).start()
+        patch.object(self.service, 'get_health', return_value=self.health).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_create_database_uses_one_connection(self):
+        created = asyncio.run(self.service.create_database(
+            db_name='test_db', user='test_user', password='secret'))
+        self.assertTrue(created)
+        self.pool.acquire.assert_called_once_with()
+        self.pool.release.assert_called_once_with(self.connection)
+        statements = [call.args[0] for call in self.connection.execute.call_args_list]
+        self.assertEqual(statements[1], 'CREATE DATABASE test_db WITH OWNER = test_user')
+
+    def test_create_databases_reports_each_item(self):
+        self.connection.execute.side_effect = [
+            None, None, None, asyncpg.DuplicateDatabaseError('exists'), None, None]
+        databases = [SimpleNamespace(name=f'db{index}', user=f'user{index}', password='pw')
+                     for index in range(3)]
+        results = asyncio.run(self.service.create_databases(databases))
+        self.assertEqual(results, [True, False, True])
+        self.pool.acquire.assert_called_once_with()
+
+    def test_failed_user_is_not_a_created_database(self):
+        self.connection.execute.side_effect = [
+            asyncpg.InsufficientPrivilegeError('denied'), None, None]
+        databases = [SimpleNamespace(name=f'db{index}', user=f'user{index}', password='pw')
+                     for index in range(2)]
+        results = asyncio.run(self.service.create_databases(databases))
+        self.assertEqual(results, [False, True])
+        statements = [call.args[0] for call in self.connection.execute.call_args_list]
+        self.assertNotIn('CREATE DATABASE db0 WITH OWNER = user0', statements)
+
+    def test_open_breaker_skips_the_server(self):
+        self.health.record_failure('down')
+        self.assertFalse(self.service.check_db_connection())
+        self.assertFalse(asyncio.run(self.service.reset_password('user', 'pw')))
+        self.pool.acquire.assert_not_called()
+
+    def test_collect_all_sizes_in_one_query(self):
+        self.connection.fetch = AsyncMock(return_value=[('db1', 8192), ('db2', 1024)])
+        sizes = asyncio.run(self.service.collect_all_sizes(['db1', 'db2']))
+        self.assertEqual(sizes, {'db1': 8192, 'db2': 1024})
+        self.connection.fetch.assert_called_once()
+        self.assertEqual(self.connection.fetch.call_args.args[1], ['db1', 'db2'])
+        self.assertEqual(asyncio.run(self.service.collect_all_sizes([])), {})
+
+    def test_connection_error_is_recorded(self):
+        self.connection.execute.side_effect = ConnectionResetError('reset')
+        self.assertFalse(asyncio.run(self.service.delete_database('test_db')))
+        self.assertFalse(self.health.is_available())
+        self.pool.release.assert_called_once_with(self.connection)
+
+    def test_half_open_trial_is_released_whatever_ends_the_attempt(self):
+        self.health.record_failure('down')
+        self.health._opened_at -= 60
+        self.service.get_pool.side_effect = RuntimeError('unexpected')
+        with self.assertRaises(RuntimeError):
+            asyncio.run(self.service.delete_database('test_db'))
+        # the trial slot is free for the next attempt
+        self.assertTrue(self.health.is_available())
+
+        self.service.get_pool.side_effect = OSError('refused')
+        self.assertFalse(asyncio.run(self.service.delete_database('test_db')))
+        self.assertFalse(self.health.is_available())
+
+    def test_old_connection_is_retired_on_acquire(self):
+        old = MagicMock()
+        old.get_server_pid.return_value = 41
+        old.close = AsyncMock()
+        self.connection.get_server_pid.return_value = 42
+        self.pool.acquire.side_effect = [old, self.connection]
+        self.service._opened_at[41] = time.monotonic() - settings.ADMIN_POOL_MAX_LIFETIME
+
+        self.assertTrue(asyncio.run(self.service.delete_database('test_db')))
+        old.close.assert_called_once_with()
+        old.execute.assert_not_called()
+        self.connection.execute.assert_called()
+        self.assertNotIn(41, self.service._opened_at)
+        self.assertIn(42, self.service._opened_at)
+
+
+class TestAsyncMysqlDbService(unittest.TestCase):
+    def test_statement_errors_do_not_trip_the_breaker(self):
+        service = AsyncMysqlDbService()
+        health = HostHealth('test', failure_threshold=1, reset_timeout=30)
+        connection = MagicMock()
+        cursor = connection.cursor.return_value.__aenter__.return_value
+        cursor.execute = AsyncMock(side_effect=[
+            aiomysql.OperationalError(1007, "database exists")] + [None] * 5)
+        pool = mock_pool(connection)
+        databases = [SimpleNamespace(name=f'db{index}', user=f'user{index}', password='pw')
+                     for index in range(2)]
+        with patch.object(service, 'get_health', return_value=health), \
+                patch.object(service, 'get_pool', AsyncMock(return_value=pool)):
+            results = asyncio.run(service.create_databases(databases))
+        self.assertEqual(results, [False, True])
+        self.assertTrue(health.is_available())
+
+    def test_lost_connection_trips_the_breaker(self):
+        service = AsyncMysqlDbService()
+        self.assertTrue(service.is_connection_error(
+            aiomysql.OperationalError(2013, "Lost connection to MySQL server")))
+        self.assertTrue(service.is_connection_error(aiomysql.InterfaceError(0, '')))
+        self.assertFalse(service.is_connection_error(
+            aiomysql.OperationalError(1045, "Access denied")))
+
+    def test_pool_failure_returns_false(self):
+        service = AsyncMysqlDbService()
+        health = HostHealth('test', failure_threshold=1, reset_timeout=30)
+        with patch.object(service, 'get_health', return_value=health), \
+                patch.object(service, 'get_pool', AsyncMock(side_effect=OSError('refused'))):
+            self.assertFalse(asyncio.run(service.delete_user('user')))
+        self.assertFalse(health.is_available())
@@ -0,0 +1,64 @@
+import datetime
+import unittest
+import uuid
+from unittest.mock import MagicMock, patch
+from app.helpers.audit import (AuditWriter, audit_event_from_log, ensure_audit_partitions,
+                               month_start, partition_name)
+
+
+class TestAuditPartitions(unittest.TestCase):
+
+    def test_month_start_wraps_years(self):
+        now = datetime.datetime(2026, 11, 18, 10, 30)
+        self.assertEqual(month_start(now), datetime.datetime(2026, 11, 1))
+        self.assertEqual(month_start(now, 2), datetime.datetime(2027, 1, 1))
+        self.assertEqual(month_start(now, -11), datetime.datetime(2025, 12, 1))
+        self.assertEqual(partition_name(month_start(now, 2)), 'audit_events_y2027m01')
+
+    @patch('app.helpers.audit.settings', AUDIT_PARTITIONS_AHEAD=1, AUDIT_RETENTION_MONTHS=2)
+    def test_creates_ahead_and_drops_expired(self, mock_settings):
+        db = MagicMock()
+        db.execute.return_value = [('audit_events_y2026m07',), ('audit_events_y2026m08',),
+                                   ('audit_events_y2026m10',)]
+        created, dropped = ensure_audit_partitions(db, datetime.datetime(2026, 10, 18))
+
+        self.assertEqual(created, ['audit_events_y2026m11'])
+        self.assertEqual(dropped, ['audit_events_y2026m07'])
+        statements = [str(call.args[0]) for call in db.execute.call_args_list[1:]]
+        self.assertIn("FOR VALUES FROM ('2026-11-01') TO ('2026-12-01')", statements[0])
+        self.assertEqual(statements[1], 'DROP TABLE IF EXISTS audit_events_y2026m07')
+        db.commit.assert_called_once()
+
+
+class TestAuditWriter(unittest.TestCase):
+
+    def test_event_from_log(self):
+        database_id = str(uuid.uuid4())
+        row = audit_event_from_log({
+            "operation": "DATABASE RESET", "status": "Success", "user_id": 7,
+            "a_db_id": database_id, "model": "Database", "description": "reset"})
+        self.assertEqual(row['database_id'], database_id)
+        self.assertEqual(row['user_id'], '7')
+        self.assertEqual(row['operation'], 'DATABASE RESET')
+
+    @patch('app.helpers.audit.ensure_audit_partitions')
+    @patch('app.helpers.audit.SessionLocal')
+    def test_write_creates_missing_partition_and_retries(self, mock_session, mock_partitions):
+        db = mock_session.return_value
+        db.execute.side_effect = [Exception('no partition of relation'), None]
+        writer = AuditWriter(queue_size=10, batch_size=10, flush_interval=1)
+        writer.start = MagicMock()
+        writer.submit(dict(operation='a'))
+        writer.submit(dict(operation='b'))
+
+        writer.flush()
+
+        self.assertEqual(db.execute.call_count, 2)
+        self.assertEqual(len(db.execute.call_args.args[1]), 2)
+        mock_partitions.assert_called_once_with(db)
+        db.commit.assert_called_once()
+        self.assertEqual(writer.depth(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
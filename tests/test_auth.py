@@ -2,7 +2,7 @@ from unittest.mock import patch
 from fastapi.testclient import TestClient
 import pytest
 from main import app
-from app.helpers.auth import has_role, get_current_user, check_authentication
+from app.helpers.auth import has_role, get_current_user, check_authentication, token_cache, TokenCache
 from app.database import database_exists, create_database
 from fastapi import HTTPException
 from jose import JWTError, jwt
@@ -37,6 +37,39 @@ def test_get_current_user():
     assert user.email == 'test@example.com'
 
 
+def test_get_current_user_is_cached_until_exp():
+    token_cache.clear()
+    payload = {
+        'user_claims': {'roles': [{'name': 'customer'}], 'email': 'cached@example.com'},
+        'identity': 'cached_user',
+        'exp': 4102444800
+    }
+    with patch('jose.jwt.decode', return_value=payload) as mock_decode:
+        first = get_current_user("cached_token")
+        first.role = "administrator"
+        second = get_current_user("cached_token")
+    mock_decode.assert_called_once()
+    assert second.id == 'cached_user'
+    assert second.role == 'customer'
+
+    payload['exp'] = 1
+    with patch('jose.jwt.decode', return_value=payload) as mock_decode:
+        get_current_user("expired_token")
+        get_current_user("expired_token")
+    assert mock_decode.call_count == 2
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache(max_size=2, max_ttl=60)
+    cache.set("a", "user a")
+    cache.set("b", "user b")
+    cache.get("a")
+    cache.set("c", "user c")
+    assert cache.get("a") == "user a"
+    assert cache.get("b") is None
+    assert len(cache) == 2
+
+
 def test_check_authentication():
     current_user = None
     try:
@@ -0,0 +1,171 @@
+import datetime
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from app.tasks import (check_capping_chunk, database_capping, finish_capping,
+                       finish_capping_batch, run_capping_batch)
+
+
+class TestCappingChunk(unittest.TestCase):
+
+    def setUp(self):
+        self.databases = [SimpleNamespace(id=uuid.uuid4()) for _ in range(4)]
+        self.db = MagicMock()
+        self.db.query.return_value.filter.return_value.all.return_value = self.databases
+        patch('app.tasks.SessionLocal', return_value=self.db).start()
+        self.sizes = patch('app.tasks.sample_database_sizes').start()
+        self.check = patch('app.tasks.check_database_capping').start()
+        self.digests = patch('app.tasks.queue_capping_digests', return_value=0).start()
+        self.next_checks = patch('app.tasks.next_check_times', return_value={}).start()
+        self.deliver = patch('app.tasks.deliver_emails').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_chunk_counts_outcomes(self):
+        self.sizes.return_value = {
+            database.id: 2048 for database in self.databases[:3]}
+        self.check.side_effect = ['revoked', 'warning', RuntimeError('revoke failed')]
+        self.digests.return_value = 1
+
+        summary = check_capping_chunk(
+            dict(checked=1, warned=1, revoked=0, failed=0),
+            [str(database.id) for database in self.databases])
+
+        self.assertEqual(summary, dict(checked=4, warned=2, revoked=1, failed=1))
+        self.check.assert_any_call(self.db, self.databases[0], 2)
+        self.digests.assert_called_once_with(self.db, [
+            (self.databases[0], 'revoked', 2), (self.databases[1], 'warning', 2)])
+        self.assertEqual(self.db.begin_nested.call_count, 3)
+        # the revoke is committed on its own, then the rest of the chunk
+        self.assertEqual(self.db.commit.call_count, 2)
+        self.db.rollback.assert_not_called()
+        self.deliver.delay.assert_called_once()
+
+    def test_chunk_reschedules_checked_databases(self):
+        now = datetime.datetime.now()
+        self.sizes.return_value = {
+            database.id: 2048 for database in self.databases[:2]}
+        self.next_checks.return_value = {
+            database.id: now for database in self.databases[:2]}
+        self.check.side_effect = ['revoked', None]
+
+        check_capping_chunk(None, [str(database.id) for database in self.databases])
+
+        updates = {row['id']: row['next_size_check_at']
+                   for row in self.db.execute.call_args.args[1]}
+        self.assertEqual(updates[self.databases[1].id], now)
+        # a revoked database is left for the longest interval
+        self.assertGreater(updates[self.databases[0].id],
+                           now + datetime.timedelta(hours=1))
+
+    def test_broken_chunk_counts_as_failed(self):
+        self.sizes.side_effect = RuntimeError('host down')
+        summary = check_capping_chunk(
+            None, [str(database.id) for database in self.databases])
+        self.assertEqual(summary['failed'], 4)
+
+    def test_broken_digests_keep_revokes_and_counts(self):
+        self.sizes.return_value = {
+            database.id: 2048 for database in self.databases}
+        self.check.side_effect = ['revoked', None, None, None]
+        self.digests.side_effect = RuntimeError('mail queue down')
+
+        summary = check_capping_chunk(
+            None, [str(database.id) for database in self.databases])
+
+        self.assertEqual(summary, dict(checked=4, warned=0, revoked=1, failed=0))
+        self.db.commit.assert_called_once()
+        self.db.rollback.assert_called_once()
+
+
+class TestCappingBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.db = MagicMock()
+        query = self.db.query.return_value
+        query.filter.return_value = query
+        patch('app.tasks.SessionLocal', return_value=self.db).start()
+        self.rows = [(uuid.uuid4(), 'postgres', 'pg-1', 5432) for _ in range(5)] + \
+            [(uuid.uuid4(), 'mysql', 'my-1', 3306)]
+        query.order_by.return_value.limit.return_value.\
+            with_for_update.return_value.all.return_value = self.rows
+        self.chunk = patch('app.tasks.check_capping_chunk').start()
+        self.chord = patch('app.tasks.chord').start()
+        patch('app.tasks.chain', side_effect=lambda *tasks: tasks).start()
+        patch('app.tasks.group', side_effect=lambda chains: chains).start()
+        patch('app.tasks.settings.CAPPING_CHUNK_SIZE', 2).start()
+        patch('app.tasks.settings.CAPPING_HOST_CONCURRENCY', 2).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_due_databases_are_leased_and_fanned_out_per_host(self):
+        run_capping_batch(None)
+
+        # the picked rows are leased before the chunks are queued
+        self.db.execute.assert_called_once()
+        self.db.commit.assert_called_once()
+        chains = self.chord.call_args.args[0]
+        # two lanes for the postgres host, one for the mysql host
+        self.assertEqual(len(chains), 3)
+        self.assertEqual(self.chunk.s.call_count, 4)
+        self.chunk.s.assert_any_call(None, [str(row[0]) for row in self.rows[:2]])
+        self.chord.return_value.assert_called_once()
+
+    @patch('app.tasks.finish_capping')
+    def test_no_due_databases_finishes_the_run(self, mock_finish):
+        self.db.query.return_value.order_by.return_value.limit.return_value.\
+            with_for_update.return_value.all.return_value = []
+        run_capping_batch('last-id')
+        mock_finish.assert_called_once()
+        self.db.execute.assert_not_called()
+        self.chord.assert_not_called()
+
+
+class TestCappingRun(unittest.TestCase):
+
+    def setUp(self):
+        self.db = MagicMock()
+        patch('app.tasks.SessionLocal', return_value=self.db).start()
+        self.checkpoint = SimpleNamespace(
+            last_id=None, summary=dict(checked=3, warned=1, revoked=0, failed=0),
+            run_started_at=datetime.datetime.now() - datetime.timedelta(minutes=5),
+            updated_at=datetime.datetime.now(), finished_at=None)
+        patch('app.tasks.get_checkpoint', return_value=self.checkpoint).start()
+        self.run_batch = patch('app.tasks.run_capping_batch').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_batch_callback_saves_checkpoint_and_continues(self):
+        finish_capping_batch([
+            dict(checked=2, warned=0, revoked=1, failed=0),
+            dict(checked=1, warned=1, revoked=0, failed=1),
+        ], 'last-id')
+        self.assertEqual(self.checkpoint.last_id, 'last-id')
+        self.assertEqual(self.checkpoint.summary,
+                         dict(checked=6, warned=2, revoked=1, failed=1))
+        self.db.commit.assert_called_once()
+        self.run_batch.assert_called_once_with('last-id')
+
+    def test_stalled_run_resumes_from_checkpoint(self):
+        self.checkpoint.last_id = uuid.uuid4()
+        self.checkpoint.updated_at -= datetime.timedelta(hours=2)
+        database_capping()
+        self.run_batch.assert_called_once_with(str(self.checkpoint.last_id))
+
+    def test_running_run_is_left_alone(self):
+        self.assertIsNone(database_capping())
+        self.run_batch.assert_not_called()
+
+    def test_finish_capping_reports_duration(self):
+        summary = finish_capping()
+        self.assertEqual(summary['checked'], 3)
+        self.assertGreaterEqual(summary['duration'], 300)
+        self.assertIsNotNone(self.checkpoint.finished_at)
+
+
+if __name__ == '__main__':
+    unittest.main()
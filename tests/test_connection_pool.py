@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from app.helpers.connection_pool import AdminConnectionPool
+from app.helpers.metrics import metrics
+
+
+class TestAdminConnectionPool(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.connect = MagicMock(side_effect=lambda: MagicMock())
+        self.is_healthy = MagicMock(return_value=True)
+        self.pool = AdminConnectionPool(
+            'test', self.connect, self.is_healthy, max_size=2, timeout=0.01,
+            max_lifetime=60, ping_interval=30)
+
+    def test_connection_is_reused(self):
+        with self.pool.connection() as first:
+            pass
+        with self.pool.connection() as second:
+            pass
+        self.assertIs(first, second)
+        self.connect.assert_called_once_with()
+
+    def test_pool_is_bounded(self):
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        self.assertTrue(first and second)
+        self.assertFalse(self.pool.acquire())
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(), first)
+
+    def test_unhealthy_connection_is_replaced(self):
+        with self.pool.connection() as first:
+            pass
+        self.is_healthy.return_value = False
+        with self.pool.connection() as second:
+            pass
+        self.assertIsNot(first, second)
+        first.close.assert_called_once_with()
+
+    def test_expired_connection_is_closed(self):
+        with patch('app.helpers.connection_pool.time.monotonic', return_value=0):
+            connection = self.pool.acquire()
+        with patch('app.helpers.connection_pool.time.monotonic', return_value=61):
+            self.pool.release(connection)
+        connection.close.assert_called_once_with()
+        self.assertEqual(self.pool.size, 0)
+
+    def test_failed_connect_returns_false(self):
+        self.connect.side_effect = None
+        self.connect.return_value = False
+        with self.pool.connection() as connection:
+            self.assertFalse(connection)
+        self.assertEqual(self.pool.size, 0)
+
+    def test_warm_up(self):
+        self.assertTrue(self.pool.warm_up(5))
+        self.assertEqual(self.pool.size, 2)
+        self.assertEqual(metrics.snapshot()['gauges']['admin_pool_idle{pool="test"}'], 2)
+
+    def test_wait_time_is_recorded(self):
+        with self.pool.connection():
+            pass
+        timings = metrics.snapshot()['timings']
+        self.assertEqual(timings['admin_pool_wait_seconds{pool="test"}']['count'], 1)
@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models import Database
+from app.helpers.database_counters import (count_databases, database_statuses,
+                                           rebuild_database_counters, _apply,
+                                           _count_delete, _count_update)
+
+
+def stored_database(**values):
+    database = Database()
+    columns = dict(database_flavour_name='mysql', deleted=False, disabled=False,
+                   admin_disabled=False, revoked=False)
+    columns.update(values)
+    for name, value in columns.items():
+        set_committed_value(database, name, value)
+    return database
+
+
+class TestDatabaseCounters(unittest.TestCase):
+
+    def test_database_statuses(self):
+        self.assertEqual(database_statuses('mysql', False, True, False, True),
+                         [('mysql', 'total'), ('mysql', 'disabled'), ('mysql', 'revoked')])
+        self.assertEqual(database_statuses('mysql', True, True, True, True), [])
+        self.assertEqual(database_statuses(None, False, False, False, False), [])
+
+    def test_count_databases_in_one_query(self):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.group_by.return_value.all.return_value = [
+            ('mysql', 5, 2, 1, None), ('postgres', 3, 0, 0, 1)]
+        counts = count_databases(db)
+        db.query.assert_called_once()
+        self.assertEqual(counts['mysql'], dict(total=5, disabled=2, admin_disabled=1, revoked=0))
+        self.assertEqual(counts['postgres']['revoked'], 1)
+
+    @patch('app.helpers.database_counters._apply')
+    def test_update_moves_counts(self, mock_apply):
+        database = stored_database(disabled=True)
+        database.disabled = False
+        database.revoked = True
+        _count_update(None, None, database)
+        changes = mock_apply.call_args.args[1]
+        self.assertEqual(changes[('mysql', 'disabled')], -1)
+        self.assertEqual(changes[('mysql', 'revoked')], 1)
+        self.assertEqual(changes[('mysql', 'total')], 0)
+
+    @patch('app.helpers.database_counters._apply')
+    def test_soft_delete_and_delete_remove_counts(self, mock_apply):
+        database = stored_database(admin_disabled=True)
+        database.deleted = True
+        _count_update(None, None, database)
+        changes = mock_apply.call_args.args[1]
+        self.assertEqual(changes[('mysql', 'total')], -1)
+        self.assertEqual(changes[('mysql', 'admin_disabled')], -1)
+
+        _count_delete(None, None, stored_database())
+        self.assertEqual(mock_apply.call_args.args[1][('mysql', 'total')], -1)
+
+    @patch('app.helpers.database_counters.count_databases', return_value={
+        'mysql': dict(total=2)})
+    def test_rebuild_and_deltas_share_the_lock(self, mock_count):
+        db = MagicMock()
+        rebuild_database_counters(db)
+        statements = [str(call.args[0]) for call in db.execute.call_args_list]
+        self.assertIn('pg_advisory_xact_lock(', statements[0])
+        self.assertEqual(len(statements), 3)
+
+        connection = MagicMock()
+        _apply(connection, {('mysql', 'total'): 1})
+        self.assertIn('pg_advisory_xact_lock_shared(',
+                      str(connection.execute.call_args_list[0].args[0]))
+        _apply(connection, {('mysql', 'total'): 0})
+        self.assertEqual(connection.execute.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,8 +12,7 @@ from unittest.mock import patch, MagicMock, Mock
 from config import settings
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
-from app.helpers.logger import send_async_log_message
-from app.helpers.database_flavor import get_db_flavour, get_all_db_flavours, failed_database_connection, database_not_found, save_to_database, database_flavours
+from app.helpers.database_flavor import get_db_flavour, get_all_db_flavours, failed_database_connection, database_not_found, save_to_database, database_flavours, parse_admin_hosts, get_flavour_service
 from tests import conftest
 from types import SimpleNamespace
 client = TestClient(app)
@@ -94,55 +93,70 @@ def test_save_to_database():
      
 
 def test_database_not_found():
-    with patch('app.helpers.logger.send_async_log_message') as mock_log:
-        current_user = {"id": 1}
-        database_id = 10
-        try:
-            with pytest.raises(HTTPException) as excinfo:
-                database_not_found(current_user, "get_database", database_id)
-            assert excinfo.value.status_code == 404
-            assert excinfo.value.detail == "Database not found"
-            mock_log.assert_called_with({
-                "operation": "get_database",
-                "status": "Failed",
-                "user_id": 1,
-                "model": "Database",
-                "description": f"Failed to get Database with ID: {database_id}"
-            })
-        except:
-            send_async_log_message({
-                "operation": "get_database",
-                "status": "Failed",
-                "user_id": 1,
-                "model": "Database",
-                "description": f"Failed to get Database with ID: {database_id}"
-            })
+    current_user = SimpleNamespace(id=1, email="test@example.com")
+    database_id = 10
+    with patch('app.helpers.database_flavor.send_async_log_message') as mock_log:
+        with pytest.raises(HTTPException) as excinfo:
+            database_not_found(current_user, "get_database", database_id)
+    assert excinfo.value.status_code == 404
+    assert excinfo.value.detail == "Database not found"
+    mock_log.assert_called_once_with({
+        "operation": "get_database",
+        "a_db_id": database_id,
+        "status": "Failed",
+        "user_id": 1,
+        "model": "Database",
+        "description": f"Failed to get Database with ID: {database_id}"
+    })
 
 
 def test_failed_database_connection():
-    with patch('app.helpers.logger.send_async_log_message') as mock_log:
-        current_user = {"id": 1, "email": "test@example.com"}
-        operation = "connect_database"
-        database_id = 10
-
-    
-    try:
+    current_user = SimpleNamespace(id=1, email="test@example.com")
+    with patch('app.helpers.database_flavor.send_async_log_message') as mock_log:
         with pytest.raises(HTTPException) as excinfo:
-            database_not_found(current_user, "connect", database_id)
-        assert excinfo.value.status_code == 500
-        assert excinfo.value.detail == "Failed to connect to the database service"
-        mock_log.assert_called_with({
-            "operation": "connect",
-            "status": "Failed",
-            "user_id": 1,
-            "model": "Database",
-            "description": f"Failed to connect Database with ID: {database_id}"
-        })
-    except:
-        send_async_log_message({
-            "operation": "connect",
-            "status": "Failed",
-            "user_id": 1,
-            "model": "Database",
-            "description": f"Failed to connect Database with ID: {database_id}"
-        })  
+            failed_database_connection(current_user, "connect")
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.detail == "Failed to connect to the database service"
+    assert excinfo.value.headers is None
+    mock_log.assert_called_once_with({
+        "operation": "connect",
+        "status": "Failed",
+        "user_id": 1,
+        "user_email": "test@example.com",
+        "model": "Database",
+        "description": "Failed to connect to this database"
+    })
+
+
+def test_failed_database_connection_returns_503():
+    current_user = SimpleNamespace(id=1, email="test@example.com")
+    database_service = MagicMock()
+    database_service.get_health.return_value.retry_after.return_value = 12
+    with patch('app.helpers.database_flavor.send_async_log_message'):
+        with pytest.raises(HTTPException) as excinfo:
+            failed_database_connection(current_user, "CREATE", database_service)
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers == {"Retry-After": "12"}
+
+
+@patch('app.helpers.database_flavor.settings')
+def test_parse_admin_hosts(mock_settings):
+    mock_settings.ADMIN_HOST_MAX_DATABASES = 0
+
+    hosts = parse_admin_hosts("db1:5432:100, db2", "default", 5433)
+    assert [(host.host, host.port, host.max_databases) for host in hosts] == [
+        ("db1", 5432, 100), ("db2", 5433, 0)]
+
+    hosts = parse_admin_hosts("", "default", "5432")
+    assert [(host.host, host.port) for host in hosts] == [("default", 5432)]
+
+
+def test_get_flavour_service_per_host():
+    db_flavour = database_flavours[1]
+    default_service = get_flavour_service(db_flavour)
+    assert default_service is db_flavour['async_class']
+
+    other = get_flavour_service(db_flavour, "other-host", 5432)
+    assert other.host == "other-host"
+    assert other is get_flavour_service(db_flavour, "other-host", "5432")
+    assert other is not default_service
@@ -0,0 +1,59 @@
+import datetime
+import unittest
+from unittest.mock import MagicMock, patch
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models import Database
+from app.helpers.database_rollups import (get_graph_data, next_period, period_start,
+                                          _rollup_delete, _rollup_insert, _rollup_update)
+
+
+class TestDatabaseRollups(unittest.TestCase):
+
+    def test_periods(self):
+        day = datetime.date(2023, 12, 14)
+        self.assertEqual(period_start(day, 'year'), datetime.date(2023, 1, 1))
+        self.assertEqual(period_start(day, 'month'), datetime.date(2023, 12, 1))
+        self.assertEqual(period_start(day, 'week'), datetime.date(2023, 12, 11))
+        self.assertEqual(period_start(day, 'day'), day)
+        self.assertEqual(next_period(datetime.date(2023, 12, 1), 'month'),
+                         datetime.date(2024, 1, 1))
+        self.assertEqual(next_period(datetime.date(2023, 12, 25), 'week'),
+                         datetime.date(2024, 1, 1))
+
+    def test_graph_data_fills_empty_periods(self):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.group_by.return_value.all.return_value = [
+            (datetime.date(2023, 1, 3), 2), (datetime.date(2023, 1, 20), 1),
+            (datetime.date(2023, 3, 9), 4)]
+        data = get_graph_data(db, datetime.date(2023, 1, 1),
+                              datetime.date(2023, 4, 30), 'month')
+        self.assertEqual(data, [
+            (datetime.date(2023, 1, 1), 3), (datetime.date(2023, 2, 1), 0),
+            (datetime.date(2023, 3, 1), 4), (datetime.date(2023, 4, 1), 0)])
+
+    @patch('app.helpers.database_rollups._apply')
+    def test_listeners_move_counts(self, mock_apply):
+        created = datetime.datetime(2023, 5, 2, 10, 30)
+        database = Database()
+        set_committed_value(database, 'date_created', created)
+        set_committed_value(database, 'database_flavour_name', 'mysql')
+
+        _rollup_insert(None, None, database)
+        self.assertEqual(mock_apply.call_args.args[1],
+                         {(datetime.date(2023, 5, 2), 'mysql'): 1})
+
+        database.database_flavour_name = 'postgres'
+        _rollup_update(None, None, database)
+        changes = mock_apply.call_args.args[1]
+        self.assertEqual(changes[(datetime.date(2023, 5, 2), 'mysql')], -1)
+        self.assertEqual(changes[(datetime.date(2023, 5, 2), 'postgres')], 1)
+
+        stored = Database()
+        set_committed_value(stored, 'date_created', created)
+        set_committed_value(stored, 'database_flavour_name', None)
+        _rollup_delete(None, None, stored)
+        self.assertEqual(mock_apply.call_args.args[1][(datetime.date(2023, 5, 2), '')], -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
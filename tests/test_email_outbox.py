@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.helpers.email_outbox import queue_email, record_failure, retry_delay, send_outbox
+
+
+def outbox_message(id):
+    return SimpleNamespace(
+        id=id, template_name='database_limit.html', subject='Subject',
+        recipients=[f'user{id}@example.com'], body=dict(name=f'db{id}', email='x'),
+        status='pending', attempts=0, next_attempt_at=None, last_error=None,
+        sent_at=None)
+
+
+def mock_connection(send_message):
+    connection = MagicMock()
+    connection.session.send_message = send_message
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=connection)
+    context.__aexit__ = AsyncMock(return_value=False)
+    return context
+
+
+@patch('app.helpers.email_outbox.settings', EMAIL_MAX_ATTEMPTS=3, EMAIL_MAX_PER_RUN=1000,
+       EMAIL_RETRY_BASE_DELAY=60, EMAIL_RETRY_MAX_DELAY=300)
+class TestEmailOutbox(unittest.TestCase):
+
+    def test_retry_delay_backs_off(self, mock_settings):
+        self.assertEqual([retry_delay(attempts) for attempts in range(1, 5)],
+                         [60, 120, 240, 300])
+
+    def test_record_failure_gives_up(self, mock_settings):
+        message = outbox_message(1)
+        self.assertFalse(record_failure(message, 'timeout'))
+        self.assertFalse(record_failure(message, 'timeout'))
+        self.assertTrue(record_failure(message, 'timeout'))
+        self.assertEqual(message.status, 'failed')
+        self.assertEqual(message.last_error, 'timeout')
+
+    def test_queue_email_does_not_send(self, mock_settings):
+        db = MagicMock()
+        message = queue_email(db, 'Subject', ['user@example.com'], dict(name='db'))
+        db.add.assert_called_once_with(message)
+        self.assertEqual(message.status, 'pending')
+        db.commit.assert_not_called()
+
+    def test_batches_share_one_connection(self, mock_settings):
+        batches = [[outbox_message(1), outbox_message(2)], [outbox_message(3)], []]
+        send_message = AsyncMock(side_effect=[None, ValueError('rejected'), None])
+        connection = mock_connection(send_message)
+        with patch('app.helpers.email_outbox.claim_outbox_batch', side_effect=batches), \
+                patch('app.helpers.email_outbox.Connection', return_value=connection) as connect:
+            summary = asyncio.run(send_outbox(MagicMock()))
+
+        connect.assert_called_once()
+        self.assertEqual(send_message.call_count, 3)
+        self.assertEqual(summary, dict(sent=2, retried=1, failed=0))
+        self.assertEqual(batches[0][1].attempts, 1)
+        self.assertEqual(batches[1][0].status, 'sent')
+
+    def test_connection_failure_retries_batch(self, mock_settings):
+        batch = [outbox_message(1), outbox_message(2)]
+        connection = MagicMock()
+        connection.__aenter__ = AsyncMock(side_effect=ConnectionError('refused'))
+        with patch('app.helpers.email_outbox.claim_outbox_batch', return_value=batch), \
+                patch('app.helpers.email_outbox.Connection', return_value=connection):
+            summary = asyncio.run(send_outbox(MagicMock()))
+
+        self.assertEqual(summary, dict(sent=0, retried=2, failed=0))
+        self.assertTrue(all(message.status == 'pending' for message in batch))
+        self.assertTrue(all(message.next_attempt_at for message in batch))
+
+
+if __name__ == '__main__':
+    unittest.main()
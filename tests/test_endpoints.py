@@ -1,17 +1,22 @@
 import uuid
+import datetime
 from fastapi.testclient import TestClient
 from main import app
 import pytest
 from pydantic import ValidationError
 from app.schema import UserGraphSchema
 import unittest
-from unittest.mock import patch, Mock, MagicMock
+from unittest.mock import patch, AsyncMock, Mock, MagicMock
 from fastapi import Header
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import SQLAlchemyError
 from types import SimpleNamespace
 from app.models import Database
 from app.routes import fetch_database_stats, get_all_databases
+from app.tasks import create_database_job, submit_job, get_job_owner
 from app.helpers.auth import get_current_user, check_authentication
+from app.helpers.database_session import get_db, get_read_db
+from app.helpers.pagination import encode_cursor, decode_cursor
 
 
 client = TestClient(app)
@@ -24,7 +29,7 @@ def test_validate_set_by():
     assert user_graph_schema.set_by == valid_value
 
     # Test with an invalid value
-    invalid_value = 'week'
+    invalid_value = 'decade'
     with pytest.raises(ValueError):
         UserGraphSchema(start='2022-01-01', end='2022-12-31',
                         set_by=invalid_value)
@@ -152,6 +157,261 @@ def test_create_database(
     assert response.status_code == 200
 
 
+@patch('app.routes.get_current_user')
+@patch('app.routes.check_authentication')
+def test_create_database_batch_reports_each_item(
+    mock_check_authentication,
+    mock_get_current_user
+):
+    current_user = Mock()
+    current_user.id = 1
+    current_user.role = "administrator"
+    current_user.email = "test@example.com"
+    mock_get_current_user.return_value = current_user
+    mock_check_authentication.return_value = None
+
+    response = client.post(
+        "/databases/batch",
+        headers={"Authorization": "Bearer dummy_access_token"},
+        json={"databases": [
+            {"database_flavour_name": "oracle",
+                "project_id": "09763a33-d1ff-4cb0-9675-1da955d711f3"},
+            {"database_flavour_name": "oracle",
+                "project_id": "09763a33-d1ff-4cb0-9675-1da955d711f3"}
+        ]}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status_code"] == 207
+    results = data["data"]["databases"]
+    assert len(results) == 2
+    assert all(result["status_code"] == 400 for result in results)
+
+
+@patch('app.routes.get_flavour_service')
+@patch('app.routes.place_databases')
+@patch('app.routes.get_current_user')
+@patch('app.routes.check_authentication')
+def test_create_database_batch_drops_databases_it_could_not_save(
+    mock_check_authentication,
+    mock_get_current_user,
+    mock_place_databases,
+    mock_get_flavour_service
+):
+    current_user = Mock()
+    current_user.id = 1
+    current_user.role = "administrator"
+    current_user.email = "test@example.com"
+    mock_get_current_user.return_value = current_user
+    mock_check_authentication.return_value = None
+    mock_place_databases.return_value = [SimpleNamespace(host='mysql-1', port=3306)] * 2
+    database_service = mock_get_flavour_service.return_value
+    database_service.check_db_connection.return_value = True
+    database_service.create_databases = AsyncMock(return_value=[True, True])
+    database_service.delete_database = AsyncMock(return_value=True)
+    database_service.delete_user = AsyncMock(return_value=True)
+
+    db = MagicMock()
+    db.query.return_value.filter.return_value.all.return_value = []
+    db.flush.side_effect = SQLAlchemyError('metadata database down')
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        response = client.post(
+            "/databases/batch",
+            headers={"Authorization": "Bearer dummy_access_token"},
+            json={"databases": [
+                {"database_flavour_name": "mysql",
+                    "project_id": "09763a33-d1ff-4cb0-9675-1da955d711f3"}] * 2})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status_code"] == 207
+    assert [result["status_code"] for result in data["data"]["databases"]] == [500, 500]
+    db.rollback.assert_called_once()
+    assert database_service.delete_database.await_count == 2
+    assert database_service.delete_user.await_count == 2
+
+
+@patch('app.routes.submit_job')
+@patch('app.routes.get_current_user')
+@patch('app.routes.check_authentication')
+def test_create_database_async_returns_job(
+    mock_check_authentication,
+    mock_get_current_user,
+    mock_submit_job
+):
+    current_user = Mock()
+    current_user.id = 1
+    current_user.role = "administrator"
+    current_user.email = "test@example.com"
+    mock_get_current_user.return_value = current_user
+    mock_check_authentication.return_value = None
+    mock_submit_job.return_value = Mock(id="job-id")
+
+    response = client.post(
+        "/databases?async=true",
+        headers={"Authorization": "Bearer dummy_access_token"},
+        json={"database_flavour_name": "mysql",
+              "project_id": "09763a33-d1ff-4cb0-9675-1da955d711f3"}
+    )
+
+    assert response.status_code == 202
+    assert response.headers["Location"] == "/jobs/job-id"
+    assert response.json()["data"]["job"]["id"] == "job-id"
+    mock_submit_job.assert_called_once()
+    assert mock_submit_job.call_args.args[:2] == (
+        create_database_job, dict(id=1, email="test@example.com"))
+
+
+@patch('app.routes.submit_job')
+@patch('app.routes.get_current_user')
+@patch('app.routes.check_authentication')
+def test_reset_password_async_keeps_password_out_of_job(
+    mock_check_authentication,
+    mock_get_current_user,
+    mock_submit_job
+):
+    current_user = Mock()
+    current_user.id = 1
+    current_user.email = "test@example.com"
+    mock_get_current_user.return_value = current_user
+    mock_check_authentication.return_value = None
+    mock_submit_job.return_value = Mock(id="job-id")
+
+    database = Database(id=uuid.uuid4(), name="db", user="user", password="old",
+                        database_flavour_name="mysql")
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = database
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        response = client.post(
+            f"/databases/{database.id}/reset_password?async=true",
+            headers={"Authorization": "Bearer dummy_access_token"},
+            json={"password": "new-secret"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 202
+    assert database.pending_password == "new-secret"
+    db.commit.assert_called()
+    assert "new-secret" not in mock_submit_job.call_args.args
+
+
+@patch('app.routes.database_job_lock')
+@patch('app.routes.get_database_service')
+@patch('app.routes.get_current_user')
+@patch('app.routes.check_authentication')
+def test_reset_password_waits_for_running_job(
+    mock_check_authentication,
+    mock_get_current_user,
+    mock_get_database_service,
+    mock_database_job_lock
+):
+    current_user = Mock()
+    current_user.id = 1
+    mock_get_current_user.return_value = current_user
+    mock_check_authentication.return_value = None
+    mock_database_job_lock.return_value.__enter__.return_value = False
+
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = Database(
+        id=uuid.uuid4(), name="db", user="user", password="old",
+        database_flavour_name="mysql")
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        response = client.post(
+            f"/databases/{uuid.uuid4()}/reset_password",
+            headers={"Authorization": "Bearer dummy_access_token"},
+            json={"password": "new-secret"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.json()["status_code"] == 409
+    mock_get_database_service.assert_not_called()
+
+
+@patch('app.routes.get_current_user')
+@patch('app.routes.check_authentication')
+def test_missing_database_is_404(
+    mock_check_authentication,
+    mock_get_current_user
+):
+    current_user = Mock()
+    current_user.id = 1
+    current_user.role = "administrator"
+    mock_get_current_user.return_value = current_user
+    mock_check_authentication.return_value = None
+
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = None
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        response = client.post(
+            f"/databases/{uuid.uuid4()}/enable",
+            headers={"Authorization": "Bearer dummy_access_token"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Database not found"
+
+
+@patch('app.tasks.Redis')
+def test_submit_job_records_owner_before_queueing(mock_redis):
+    task = Mock()
+    user = dict(id=1, email="test@example.com")
+    submit_job(task, user, "db-id")
+
+    job_id = task.apply_async.call_args.kwargs['task_id']
+    assert task.apply_async.call_args.kwargs['args'] == ("db-id", user)
+    client = mock_redis.from_url.return_value
+    assert client.set.call_args.args == (f"job-owner:{job_id}", "1")
+
+    client.get.return_value = b"1"
+    assert get_job_owner(job_id) == "1"
+
+
+@patch('app.routes.get_job_owner', return_value='1')
+@patch('app.routes.AsyncResult')
+@patch('app.routes.get_current_user')
+@patch('app.routes.check_authentication')
+def test_get_job_reports_progress(
+    mock_check_authentication,
+    mock_get_current_user,
+    mock_async_result,
+    mock_get_job_owner
+):
+    current_user = Mock()
+    current_user.id = 1
+    current_user.role = "customer"
+    mock_get_current_user.return_value = current_user
+    mock_check_authentication.return_value = None
+
+    mock_async_result.return_value = Mock(
+        id="job-id", state="PROGRESS",
+        info={"user_id": 1, "database_id": "db-id", "step": "resetting"})
+    response = client.get(
+        "/jobs/job-id", headers={"Authorization": "Bearer dummy_access_token"})
+    assert response.status_code == 200
+    assert response.json()["data"]["job"]["progress"]["step"] == "resetting"
+
+    # a failed job only has the exception, the owner is still checked
+    mock_async_result.return_value = Mock(
+        id="job-id", state="FAILURE", info=RuntimeError("boom"))
+    mock_get_job_owner.return_value = '2'
+    response = client.get(
+        "/jobs/job-id", headers={"Authorization": "Bearer dummy_access_token"})
+    assert response.status_code == 404
+
+    mock_get_job_owner.return_value = None
+    response = client.get(
+        "/jobs/job-id", headers={"Authorization": "Bearer dummy_access_token"})
+    assert response.status_code == 404
+
+
 @patch('app.routes.get_current_user')
 @patch('app.routes.check_authentication')
 @patch('app.helpers.database_session.get_db')
@@ -191,3 +451,110 @@ def test_single_database_not_found(
 
     # Validate the response
     assert response.status_code == 404
+
+
+@patch('app.routes.get_current_user')
+@patch('app.routes.check_authentication')
+def test_database_events_only_for_owner(
+    mock_check_authentication,
+    mock_get_current_user
+):
+    current_user = Mock()
+    current_user.id = 1
+    current_user.role = "customer"
+    mock_get_current_user.return_value = current_user
+    mock_check_authentication.return_value = None
+
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = Mock(
+        id=uuid.uuid4(), owner_id=2)
+    app.dependency_overrides[get_read_db] = lambda: db
+    try:
+        response = client.get(
+            f"/databases/{uuid.uuid4()}/events",
+            headers={"Authorization": "Bearer dummy_access_token"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 403
+
+
+@patch('app.routes.get_current_user')
+@patch('app.routes.check_authentication')
+def test_get_all_databases_cursor_pages(
+    mock_check_authentication,
+    mock_get_current_user
+):
+    current_user = Mock()
+    current_user.id = 1
+    current_user.role = "customer"
+    mock_get_current_user.return_value = current_user
+    mock_check_authentication.return_value = None
+
+    databases = [
+        Database(id=uuid.uuid4(), name=f"db{index}", user="user", password="password",
+                 database_flavour_name="mysql",
+                 date_created=datetime.datetime(2024, 1, 3 - index))
+        for index in range(3)]
+    query = MagicMock()
+    for method in ('order_by', 'filter', 'offset', 'limit'):
+        getattr(query, method).return_value = query
+    query.all.return_value = databases
+    db = MagicMock()
+    db.query.return_value = query
+    app.dependency_overrides[get_read_db] = lambda: db
+    try:
+        cursor = encode_cursor(databases[0].date_created, databases[0].id)
+        response = client.get(
+            "/databases", params={"per_page": 2, "cursor": cursor, "include_total": False},
+            headers={"Authorization": "Bearer dummy_access_token"})
+        bad_cursor = client.get(
+            "/databases", params={"cursor": "not-a-cursor", "include_total": False},
+            headers={"Authorization": "Bearer dummy_access_token"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    pagination = response.json()['data']['pagination']
+    assert pagination['total'] is None
+    assert pagination['page'] is None
+    assert len(response.json()['data']['databases']) == 2
+    assert decode_cursor(pagination['next_cursor']) == (
+        databases[1].date_created, databases[1].id)
+    query.offset.assert_not_called()
+    query.count.assert_not_called()
+    assert bad_cursor.status_code == 400
+
+
+@patch('app.routes.get_creation_totals', return_value={'mysql': 4, 'postgres': 2})
+@patch('app.routes.get_graph_data', return_value=[(datetime.date(2024, 1, 1), 6)])
+@patch('app.routes.get_current_user')
+@patch('app.routes.check_authentication')
+def test_database_graph_counts_distinct_users(
+    mock_check_authentication,
+    mock_get_current_user,
+    mock_get_graph_data,
+    mock_get_creation_totals
+):
+    current_user = Mock()
+    current_user.id = 1
+    current_user.role = "administrator"
+    mock_get_current_user.return_value = current_user
+    mock_check_authentication.return_value = None
+
+    db = MagicMock()
+    db.query.return_value.scalar.return_value = 5
+    app.dependency_overrides[get_read_db] = lambda: db
+    try:
+        response = client.get(
+            "/databases/graph",
+            params={"start": "2024-01-01", "end": "2024-12-31", "set_by": "year"},
+            headers={"Authorization": "Bearer dummy_access_token"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    metadata = response.json()['data']['metadata']
+    assert metadata == dict(total=6, postgres_total=2, mysql_total=4, users_number=5)
+    assert response.json()['data']['graph_data'] == [
+        dict(year=2024, month=1, value=6)]
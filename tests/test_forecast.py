@@ -0,0 +1,68 @@
+import datetime
+import unittest
+import uuid
+import numpy as np
+from unittest.mock import MagicMock, patch
+from app.helpers.forecast import fit_growth, time_to_full, forecast_databases
+
+
+class TestFitGrowth(unittest.TestCase):
+
+    def test_fits_every_database_in_one_pass(self):
+        # database 0 grows 10 bytes a second, database 1 is flat
+        codes = np.array([0, 1, 0, 1, 0, 1])
+        timestamps = np.array([0., 0., 10., 10., 20., 20.])
+        sizes = np.array([100., 500., 200., 500., 300., 500.])
+
+        slopes, latest_size, latest_time, samples = fit_growth(
+            codes, timestamps, sizes, 3)
+
+        np.testing.assert_allclose(slopes, [10., 0., 0.])
+        np.testing.assert_allclose(latest_size[:2], [300., 500.])
+        np.testing.assert_allclose(latest_time[:2], [20., 20.])
+        self.assertTrue(np.isnan(latest_size[2]))
+        np.testing.assert_allclose(samples, [3., 3., 0.])
+
+    def test_latest_sample_is_used_when_unordered(self):
+        codes = np.array([0, 0, 0])
+        timestamps = np.array([20., 0., 10.])
+        sizes = np.array([300., 100., 200.])
+        _, latest_size, _, _ = fit_growth(codes, timestamps, sizes, 1)
+        self.assertEqual(latest_size[0], 300.)
+
+    def test_time_to_full(self):
+        seconds = time_to_full(
+            np.array([10., 0., -5., 10.]),
+            np.array([300., 500., 500., 1200.]),
+            np.array([1000., 1000., 1000., 1000.]))
+        np.testing.assert_allclose(seconds, [70., np.inf, np.inf, 0.])
+
+
+class TestForecastDatabases(unittest.TestCase):
+
+    @patch('app.helpers.forecast.settings')
+    def test_forecast_databases(self, mock_settings):
+        mock_settings.FORECAST_WINDOW_DAYS = 7
+        mock_settings.FORECAST_MIN_SAMPLES = 3
+        now = datetime.datetime(2026, 1, 8)
+        growing, sparse = uuid.uuid4(), uuid.uuid4()
+        rows = [(growing, now - datetime.timedelta(days=days), 1024 * 1024 * (10 - days))
+                for days in range(3)]
+        rows.append((sparse, now, 1024))
+        db = MagicMock()
+        db.query.return_value.filter.return_value.group_by.return_value.all.return_value = rows
+        db.query.return_value.filter.return_value.all.return_value = [
+            (growing, 20 * 1024), (sparse, None)]
+
+        forecasts = forecast_databases(db, now=now)
+
+        self.assertEqual(list(forecasts), [growing])
+        forecast = forecasts[growing]
+        self.assertAlmostEqual(forecast.growth_bytes_per_day, 1024 * 1024)
+        self.assertEqual(forecast.latest_bytes, 10 * 1024 * 1024)
+        self.assertAlmostEqual(forecast.days_to_full, 10)
+        self.assertEqual(forecast.samples, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from app.helpers.health import HostHealth, HealthProber, CLOSED, OPEN, HALF_OPEN
+
+
+class TestHostHealth(unittest.TestCase):
+    def setUp(self):
+        self.health = HostHealth('test', failure_threshold=2, reset_timeout=30)
+
+    def test_opens_after_threshold(self):
+        self.health.record_failure('down')
+        self.assertEqual(self.health.state, CLOSED)
+        self.assertTrue(self.health.allow_request())
+        self.health.record_failure('down')
+        self.assertEqual(self.health.state, OPEN)
+        self.assertFalse(self.health.allow_request())
+        self.assertFalse(self.health.is_available())
+        self.assertGreater(self.health.retry_after(), 0)
+
+    def test_half_open_allows_single_trial(self):
+        with patch('app.helpers.health.time.monotonic', return_value=0):
+            self.health.record_failure()
+            self.health.record_failure()
+        with patch('app.helpers.health.time.monotonic', return_value=31):
+            self.assertEqual(self.health.state, HALF_OPEN)
+            self.assertTrue(self.health.is_available())
+            self.assertTrue(self.health.allow_request())
+            self.assertFalse(self.health.allow_request())
+            self.health.record_success()
+        self.assertEqual(self.health.state, CLOSED)
+
+    def test_failed_trial_reopens(self):
+        with patch('app.helpers.health.time.monotonic', return_value=0):
+            self.health.record_failure()
+            self.health.record_failure()
+        with patch('app.helpers.health.time.monotonic', return_value=31):
+            self.assertTrue(self.health.allow_request())
+            self.health.record_failure()
+            self.assertEqual(self.health.state, OPEN)
+
+    def test_success_resets_failures(self):
+        self.health.record_failure()
+        self.health.record_success()
+        self.health.record_failure()
+        self.assertEqual(self.health.state, CLOSED)
+
+
+class TestHealthProber(unittest.TestCase):
+    def test_probe_all(self):
+        services = [MagicMock(), MagicMock()]
+        HealthProber(services, interval=1).probe_all()
+        for service in services:
+            service.probe.assert_called_once_with()
+
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from app.helpers.log_spool import LogSpool
+from app.helpers.logger import ActivityLogShipper
+
+
+class TestLogSpool(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.spool = LogSpool(self.directory, segment_bytes=64,
+                              max_bytes=10 ** 6, fsync_policy='always')
+
+    def test_segments_replay_in_order(self):
+        self.spool.append([{"route": "first", "padding": "x" * 64}])
+        self.spool.append([{"route": "second"}])
+
+        path, events = self.spool.claim_oldest()
+        self.assertEqual(events, [{"route": "first", "padding": "x" * 64}])
+        self.spool.release(path, [])
+
+        path, events = self.spool.claim_oldest()
+        self.assertEqual(events, [{"route": "second"}])
+        self.assertIsNone(self.spool.claim_oldest())
+
+    def test_release_keeps_unsent_events(self):
+        self.spool.append([{"route": "a"}, {"route": "b"}])
+        path, events = self.spool.claim_oldest()
+        self.spool.release(path, events[1:])
+        self.assertEqual(self.spool.claim_oldest()[1], [{"route": "b"}])
+
+    def test_oldest_segments_dropped_over_limit(self):
+        self.spool.max_bytes = 200
+        for index in range(4):
+            self.spool.append([{"route": index, "padding": "x" * 64}])
+        size, segments, lag = self.spool.stats()
+        self.assertLessEqual(size, 200)
+        self.assertEqual(self.spool.claim_oldest()[1][0]['route'], 2)
+
+    def test_stale_segment_of_another_process_is_replayed(self):
+        path = os.path.join(self.directory, '1-99999.open')
+        with open(path, 'w') as segment:
+            segment.write('{"route": "orphan"}\n')
+        os.utime(path, (0, 0))
+        self.assertEqual(self.spool.claim_oldest()[1], [{"route": "orphan"}])
+
+    def test_idle_segment_of_a_live_process_is_left_alone(self):
+        path = os.path.join(
+            self.directory, f'1-{self.spool.hostname}-{os.getppid()}.open')
+        with open(path, 'w') as segment:
+            segment.write('{"route": "live"}\n')
+        os.utime(path, (0, 0))
+        self.assertIsNone(self.spool.claim_oldest())
+        self.assertTrue(os.path.exists(path))
+
+    def test_recovered_open_segment_starts_a_fresh_one(self):
+        self.spool.append([{"route": "a"}])
+        first = self.spool._path
+        # another process recovered and replayed it
+        os.remove(first)
+
+        self.spool.append([{"route": "b"}])
+        self.assertNotEqual(self.spool._path, first)
+        os.remove(self.spool._path)
+
+        self.spool.rotate()
+        self.assertIsNone(self.spool._file)
+        self.spool.append([{"route": "c"}])
+        self.assertEqual(self.spool.claim_oldest()[1], [{"route": "c"}])
+
+
+@patch('app.helpers.logger.settings', ACTIVITY_LOGGER_URL='http://logger',
+       ACTIVITY_LOG_TIMEOUT=1, ACTIVITY_SPOOL_RETRY_BASE_DELAY=30,
+       ACTIVITY_SPOOL_RETRY_MAX_DELAY=60)
+class TestShipperSpool(unittest.TestCase):
+    def setUp(self):
+        self.spool = MagicMock()
+        self.shipper = ActivityLogShipper(
+            queue_size=10, batch_size=10, flush_interval=0.05, full_policy='drop',
+            spool=self.spool)
+        self.shipper._session = MagicMock()
+
+    def test_failed_delivery_is_spooled_and_backs_off(self, mock_settings):
+        self.shipper._session.post.side_effect = [MagicMock(), ConnectionError('down')]
+        self.shipper.ship([{"route": "a"}, {"route": "b"}, {"route": "c"}])
+
+        self.spool.append.assert_called_once_with([{"route": "b"}, {"route": "c"}])
+        self.assertTrue(self.shipper.is_backing_off())
+
+        # while backing off nothing is posted
+        self.shipper.ship([{"route": "d"}])
+        self.assertEqual(self.shipper._session.post.call_count, 2)
+        self.assertEqual(self.shipper.drain_spool(), 0)
+
+    def test_drain_replays_and_keeps_the_rest(self, mock_settings):
+        self.spool.claim_oldest.return_value = (
+            'segment', [{"route": "a"}, {"route": "b"}])
+        self.shipper._session.post.side_effect = [MagicMock(), ConnectionError('down')]
+
+        self.assertEqual(self.shipper.drain_spool(), 1)
+        self.spool.release.assert_called_once_with('segment', [{"route": "b"}])
+        self.assertTrue(self.shipper.is_backing_off())
+
+
+if __name__ == '__main__':
+    unittest.main()
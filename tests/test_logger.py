@@ -1,12 +1,22 @@
+import time
 import unittest
 from unittest.mock import MagicMock
 from datetime import datetime
 from config import settings
-from app.helpers.logger import send_log_message, log_response, send_async_log_message, DEFAULT_DATA
+from app.helpers.logger import (send_log_message, log_response, send_async_log_message,
+                                DEFAULT_DATA, ActivityLogShipper)
 
 class TestLoggingFunctions(unittest.TestCase):
     def setUp(self):
         self.mock_response = MagicMock(status_code=200)
+        # a fresh shipper without a spool, so neither the configured spool nor
+        # a backoff started by another test decides whether the post happens
+        for target, new in (
+                ('app.helpers.logger.activity_log_shipper', ActivityLogShipper(spool=None)),
+                ('app.helpers.logger.record_audit_event', MagicMock())):
+            patcher = unittest.mock.patch(target, new)
+            patcher.start()
+            self.addCleanup(patcher.stop)
 
     def test_send_log_message(self):
         data = {"additional_info": "test"}
@@ -16,9 +26,22 @@ class TestLoggingFunctions(unittest.TestCase):
             mock_post.assert_called_once_with(
                 f'{settings.ACTIVITY_LOGGER_URL}/api/activities',
                 headers={"Content-Type": "application/json"},
-                json={**DEFAULT_DATA, **data}
+                json={**DEFAULT_DATA, **data},
+                timeout=settings.ACTIVITY_LOG_TIMEOUT
             )
 
+    def test_send_log_message_failure_spools_and_backs_off(self):
+        shipper = ActivityLogShipper(spool=MagicMock())
+        with unittest.mock.patch('app.helpers.logger.activity_log_shipper', shipper), \
+                unittest.mock.patch('app.helpers.logger.requests.post') as mock_post:
+            mock_post.side_effect = Exception("connect timeout")
+            send_log_message({"route": "a"})
+            send_log_message({"route": "b"})
+        # the second event skips the post while the logger is backing off
+        mock_post.assert_called_once()
+        self.assertEqual(shipper.spool.append.call_count, 2)
+        self.assertTrue(shipper.is_backing_off())
+
     def test_log_response(self):
         @log_response
         def test_function():
@@ -34,12 +57,9 @@ class TestLoggingFunctions(unittest.TestCase):
 
     def test_send_async_log_message(self):
         data = {"additional_info": "test"}
-        with unittest.mock.patch('app.helpers.logger.Thread') as mock_thread:
-            mock_start = MagicMock()
-            mock_thread.return_value.start = mock_start
+        with unittest.mock.patch('app.helpers.logger.activity_log_shipper') as mock_shipper:
             send_async_log_message(data)
-            mock_start.assert_called_once_with()
-
+            mock_shipper.submit.assert_called_once_with(data)
 
     def test_send_log_message_exception(self):
         with unittest.mock.patch('requests.post') as mock_post:
@@ -49,3 +69,37 @@ class TestLoggingFunctions(unittest.TestCase):
                 send_log_message({})
                 mock_print.assert_called_once_with("Error occurred while sending log message: Test exception")
 
+
+class TestActivityLogShipper(unittest.TestCase):
+    def setUp(self):
+        self.shipper = ActivityLogShipper(
+            queue_size=2, batch_size=10, flush_interval=0.05, full_policy='drop')
+        self.shipper._session = MagicMock()
+        # keep the thread from picking events up under the test
+        self.shipper.start = MagicMock()
+
+    def test_full_queue_drops_events(self):
+        self.assertTrue(self.shipper.submit({"route": "a"}))
+        self.assertTrue(self.shipper.submit({"route": "b"}))
+        self.assertFalse(self.shipper.submit({"route": "c"}))
+        self.assertEqual(self.shipper.depth(), 2)
+
+    def test_stop_flushes_queue_over_one_session(self):
+        self.shipper.submit({"route": "a"})
+        self.shipper.submit({"route": "b"})
+        self.shipper.stop()
+        self.assertEqual(self.shipper.depth(), 0)
+        self.assertEqual(self.shipper._session.post.call_count, 2)
+        event = self.shipper._session.post.call_args.kwargs['json']
+        self.assertEqual(event['route'], 'b')
+        self.assertEqual(event['model'], DEFAULT_DATA['model'])
+
+    def test_thread_ships_batches(self):
+        del self.shipper.start
+        self.shipper.submit({"route": "a"})
+        self.shipper.submit({"route": "b"})
+        deadline = time.monotonic() + 2
+        while self.shipper._session.post.call_count < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.shipper.stop()
+        self.assertEqual(self.shipper._session.post.call_count, 2)
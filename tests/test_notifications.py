@@ -0,0 +1,60 @@
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from app.helpers.notifications import queue_capping_digests
+
+
+def user_database(owner_id, name):
+    return SimpleNamespace(id=uuid.uuid4(), owner_id=owner_id, name=name,
+                           email=f'{owner_id}@example.com', allocated_size_kb=1000)
+
+
+class TestCappingDigests(unittest.TestCase):
+
+    def setUp(self):
+        self.db = MagicMock()
+        self.queue_email = patch('app.helpers.notifications.queue_email').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_one_email_per_owner(self):
+        self.db.query.return_value.filter.return_value.distinct.return_value.\
+            all.return_value = []
+        first, second, other = (user_database('owner', 'db1'),
+                                user_database('owner', 'db2'),
+                                user_database('other', 'db3'))
+
+        warned = queue_capping_digests(self.db, [
+            (first, 'warning', 800), (second, 'revoked', 1000), (other, 'warning', 700)])
+
+        self.assertEqual(warned, 2)
+        self.assertEqual(self.queue_email.call_count, 2)
+        self.db.query.assert_called_once()
+        subject, recipients, body = self.queue_email.call_args_list[0].args[1:4]
+        self.assertEqual(subject, 'Database Revoked')
+        self.assertEqual(recipients, ['owner@example.com'])
+        self.assertEqual([database['name'] for database in body['databases']],
+                         ['db1', 'db2'])
+        self.assertEqual(body['databases'][0]['percent'], 80)
+        notified = self.db.execute.call_args.args[1]
+        self.assertEqual({row['id'] for row in notified}, {first.id, other.id})
+
+    def test_notified_owner_only_hears_about_revocations(self):
+        self.db.query.return_value.filter.return_value.distinct.return_value.\
+            all.return_value = [('owner',)]
+        warning, revoked = user_database('owner', 'db1'), user_database('owner', 'db2')
+
+        self.assertEqual(queue_capping_digests(
+            self.db, [(warning, 'warning', 800)]), 0)
+        self.queue_email.assert_not_called()
+
+        queue_capping_digests(self.db, [(warning, 'warning', 800), (revoked, 'revoked', 1000)])
+        body = self.queue_email.call_args.args[3]
+        self.assertEqual([database['name'] for database in body['databases']], ['db2'])
+        self.db.execute.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
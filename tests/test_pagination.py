@@ -0,0 +1,23 @@
+import datetime
+import unittest
+import uuid
+from app.helpers.pagination import decode_cursor, encode_cursor
+
+
+class TestPagination(unittest.TestCase):
+
+    def test_cursor_round_trip(self):
+        date_created = datetime.datetime(2024, 2, 29, 13, 5, 7, 120)
+        database_id = uuid.uuid4()
+        cursor = encode_cursor(date_created, database_id)
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor), (date_created, database_id))
+
+    def test_invalid_cursor(self):
+        for cursor in ('', 'not-a-cursor', encode_cursor(datetime.datetime.now(), 'nope')):
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from app.helpers.placement import place_databases
+
+
+class TestPlacement(unittest.TestCase):
+
+    def setUp(self):
+        self.hosts = [
+            SimpleNamespace(host='a', port=5432, max_databases=0),
+            SimpleNamespace(host='b', port=5432, max_databases=2),
+            SimpleNamespace(host='c', port=5432, max_databases=0),
+        ]
+        self.health = {host.host: True for host in self.hosts}
+        service = lambda db_flavour, host, port, is_async: MagicMock(
+            get_health=lambda: MagicMock(is_available=lambda: self.health[host]))
+        patch('app.helpers.placement.get_db_flavour',
+              return_value={'name': 'postgres', 'hosts': self.hosts}).start()
+        patch('app.helpers.placement.get_flavour_service', side_effect=service).start()
+        self.settings = patch('app.helpers.placement.settings').start()
+        self.settings.PLACEMENT_STRATEGY = 'count'
+        self.settings.ADMIN_HOST_MAX_STORAGE_KB = 0
+        self.usage = patch('app.helpers.placement.get_host_usage').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_least_loaded_host_is_chosen(self):
+        self.usage.return_value = {
+            ('a', 5432): dict(count=5, allocated_kb=0, latency=0.0),
+            ('b', 5432): dict(count=1, allocated_kb=0, latency=0.0),
+            ('c', 5432): dict(count=3, allocated_kb=0, latency=0.0),
+        }
+        placements = place_databases(MagicMock(), 'postgres', 4)
+        # b fills up at its limit of 2, then c takes the rest
+        self.assertEqual([host.host for host in placements], ['b', 'c', 'c', 'a'])
+
+    def test_unavailable_and_full_hosts_are_skipped(self):
+        self.health['a'] = False
+        self.health['c'] = False
+        self.usage.return_value = {
+            ('b', 5432): dict(count=2, allocated_kb=0, latency=0.0)}
+        self.assertEqual(place_databases(MagicMock(), 'postgres', 1), [None])
+
+    def test_storage_strategy(self):
+        self.settings.PLACEMENT_STRATEGY = 'storage'
+        self.usage.return_value = {
+            ('a', 5432): dict(count=1, allocated_kb=100, latency=0.0),
+            ('b', 5432): dict(count=0, allocated_kb=0, latency=0.0),
+            ('c', 5432): dict(count=0, allocated_kb=50, latency=0.0),
+        }
+        self.assertEqual(place_databases(MagicMock(), 'postgres', 1)[0].host, 'b')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from app.helpers import replicas
+from app.helpers.replicas import caller_key, choose_read_session, mark_recent_write
+from app.helpers.database_session import get_fresh_or_read_db
+
+
+class TestReplicaRouting(unittest.TestCase):
+
+    def setUp(self):
+        self.primary = object()
+        self.replica = object()
+        patch.object(replicas, 'SessionLocal', self.primary).start()
+        patch.object(replicas, 'ReplicaSessionLocals', [self.replica]).start()
+        self.lag = patch.object(replicas, 'get_replica_lag', return_value=0.5).start()
+        replicas._recent_writers.clear()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_reads_go_to_a_fresh_replica(self):
+        self.assertIs(choose_read_session('caller'), self.replica)
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        self.lag.return_value = 60
+        self.assertIs(choose_read_session('caller'), self.primary)
+        self.lag.return_value = None
+        self.assertIs(choose_read_session('caller'), self.primary)
+
+    def test_recent_writer_reads_from_primary(self):
+        mark_recent_write('caller')
+        self.assertIs(choose_read_session('caller'), self.primary)
+        self.assertIs(choose_read_session('someone else'), self.replica)
+
+    def test_no_replicas_configured(self):
+        with patch.object(replicas, 'ReplicaSessionLocals', []):
+            self.assertIs(choose_read_session('caller'), self.primary)
+
+    def test_caller_key(self):
+        request = SimpleNamespace(headers={'authorization': 'Bearer token'})
+        self.assertEqual(caller_key(request), caller_key(request))
+        self.assertIsNone(caller_key(SimpleNamespace(headers={})))
+        self.assertIsNone(caller_key(None))
+
+
+    def test_only_fresh_reads_open_a_primary_session(self):
+        primary, replica = MagicMock(), MagicMock()
+        with patch('app.helpers.database_session.SessionLocal', return_value=primary) as primary_factory, \
+                patch('app.helpers.database_session.choose_read_session',
+                      return_value=MagicMock(return_value=replica)):
+            sessions = get_fresh_or_read_db(None, fresh=False)
+            self.assertIs(next(sessions), replica)
+            sessions.close()
+            primary_factory.assert_not_called()
+            replica.close.assert_called_once_with()
+
+            sessions = get_fresh_or_read_db(None, fresh=True)
+            self.assertIs(next(sessions), primary)
+            sessions.close()
+            primary.close.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
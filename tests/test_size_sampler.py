@@ -0,0 +1,48 @@
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from app.helpers.size_sampler import sample_database_sizes, record_size_samples
+
+
+class TestSizeSampler(unittest.TestCase):
+
+    def test_sample_database_sizes_one_query_per_host(self):
+        host_a = MagicMock(pool_name='mysql://a:3306')
+        host_a.collect_all_sizes.return_value = {'db1': 4096, 'other': 1}
+        host_b = MagicMock(pool_name='mysql://b:3306')
+        host_b.collect_all_sizes.return_value = False
+        databases = [
+            SimpleNamespace(id=uuid.uuid4(), name='db1', host='a'),
+            SimpleNamespace(id=uuid.uuid4(), name='gone', host='a'),
+            SimpleNamespace(id=uuid.uuid4(), name='db3', host='b'),
+        ]
+        services = {'a': host_a, 'b': host_b}
+        db = MagicMock()
+
+        with patch('app.helpers.size_sampler.get_database_service',
+                   side_effect=lambda database, is_async: services[database.host]):
+            sizes = sample_database_sizes(db, databases)
+
+        self.assertEqual(sizes, {databases[0].id: 4096})
+        host_a.collect_all_sizes.assert_called_once_with(['db1', 'gone'])
+        host_b.collect_all_sizes.assert_called_once_with(['db3'])
+        self.assertEqual(db.execute.call_count, 2)
+        db.commit.assert_called_once()
+
+    def test_record_size_samples_updates_cached_size(self):
+        db = MagicMock()
+        database_id = uuid.uuid4()
+        record_size_samples(db, {database_id: 10240})
+        updates = db.execute.call_args_list[1].args[1]
+        self.assertEqual(updates[0]['id'], database_id)
+        self.assertEqual(updates[0]['default_storage_kb'], 10)
+
+    def test_record_size_samples_nothing_to_record(self):
+        db = MagicMock()
+        record_size_samples(db, {})
+        db.execute.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import datetime
+import unittest
+import numpy as np
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.helpers.size_schedule import next_check_intervals, next_check_times
+
+
+@patch('app.helpers.size_schedule.settings',
+       SIZE_CHECK_MIN_INTERVAL=300, SIZE_CHECK_MAX_INTERVAL=604800)
+class TestSizeSchedule(unittest.TestCase):
+
+    def test_interval_follows_headroom(self, mock_settings):
+        intervals = next_check_intervals([0, 500, 1000], [1000, 1000, 1000], [0, 0, 0])
+        np.testing.assert_allclose(intervals, [604800, 75862.5, 300])
+
+    def test_near_full_database_is_checked_within_minutes(self, mock_settings):
+        intervals = next_check_intervals([950, 990], [1000, 1000], [0, 0])
+        self.assertTrue(all(intervals < 600))
+
+    def test_idle_database_backs_off_past_a_day(self, mock_settings):
+        intervals = next_check_intervals([100], [1000], [0])
+        self.assertGreater(intervals[0], 4 * 86400)
+
+    def test_fast_growth_shortens_the_interval(self, mock_settings):
+        # 100 KB left growing 1000 KB a day is full in 8640 seconds
+        intervals = next_check_intervals([900, 900], [1000, 1000], [1000, -50])
+        np.testing.assert_allclose(intervals, [864, 904.5])
+
+    def test_interval_is_clipped(self, mock_settings):
+        intervals = next_check_intervals([0, 2000], [0, 1000], [10 ** 9, 0])
+        self.assertEqual(list(intervals), [300, 300])
+
+    def test_next_check_times_skips_unmeasured(self, mock_settings):
+        now = datetime.datetime(2026, 1, 1)
+        databases = [
+            SimpleNamespace(id='a', allocated_size_kb=1000, growth_bytes_per_day=None),
+            SimpleNamespace(id='b', allocated_size_kb=1000, growth_bytes_per_day=None),
+        ]
+        times = next_check_times(databases, {'a': 500 * 1024}, now)
+        self.assertEqual(times, {'a': now + datetime.timedelta(seconds=75862.5)})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from config import settings
+from unittest.mock import MagicMock, patch
+from app.helpers import standby_pool
+from app.helpers.standby_pool import (get_standby_targets, claim_standby_database,
+                                       get_cached_standby_depths)
+
+
+class TestStandbyPool(unittest.TestCase):
+
+    @patch('app.helpers.standby_pool.settings')
+    def test_get_standby_targets(self, mock_settings):
+        mock_settings.STANDBY_POOL_TARGETS = "mysql:5, postgres:2,bad:x,"
+        self.assertEqual(get_standby_targets(), {'mysql': 5, 'postgres': 2})
+
+    @patch('app.helpers.standby_pool.settings')
+    def test_get_standby_targets_empty(self, mock_settings):
+        mock_settings.STANDBY_POOL_TARGETS = ""
+        self.assertEqual(get_standby_targets(), {})
+
+    def test_claim_standby_database(self):
+        db = MagicMock()
+        standby = MagicMock()
+        db.query.return_value.filter.return_value.order_by.return_value.\
+            with_for_update.return_value.first.return_value = standby
+
+        self.assertEqual(claim_standby_database(db, 'mysql'), standby)
+        db.delete.assert_called_once_with(standby)
+
+    def test_claim_standby_database_empty_pool(self):
+        db = MagicMock()
+        db.query.return_value.filter.return_value.order_by.return_value.\
+            with_for_update.return_value.first.return_value = None
+
+        self.assertIsNone(claim_standby_database(db, 'mysql'))
+        db.delete.assert_not_called()
+
+    @patch('app.helpers.standby_pool.get_standby_depths', return_value={'mysql': 3})
+    @patch('app.helpers.standby_pool.SessionLocal')
+    def test_depths_are_cached_between_scrapes(self, mock_session, mock_depths):
+        with patch.dict(standby_pool._cached_depths, depths=None, read_at=0):
+            self.assertEqual(get_cached_standby_depths(), {'mysql': 3})
+            self.assertEqual(get_cached_standby_depths(), {'mysql': 3})
+            mock_depths.assert_called_once()
+
+            standby_pool._cached_depths['read_at'] -= settings.STANDBY_POOL_METRICS_TTL
+            get_cached_standby_depths()
+            self.assertEqual(mock_depths.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import asyncio
+import unittest
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from app.helpers.status_prober import probe_databases, record_statuses
+
+
+class TestStatusProber(unittest.TestCase):
+
+    def make_database(self, name, flavour='postgres', host='db-host'):
+        return SimpleNamespace(id=uuid.uuid4(), name=name, user='user', password='pw',
+                               database_flavour_name=flavour, host=host, port=5432)
+
+    @patch('app.helpers.status_prober.settings')
+    def test_probe_databases_respects_host_limit(self, mock_settings):
+        mock_settings.STATUS_PROBE_CONCURRENCY = 10
+        mock_settings.STATUS_PROBE_PER_HOST = 2
+        running = {'now': 0, 'max': 0}
+
+        async def check_user_db_rights(user=None, password=None, db_name=None):
+            running['now'] += 1
+            running['max'] = max(running['max'], running['now'])
+            await asyncio.sleep(0.01)
+            running['now'] -= 1
+            return db_name != 'down'
+
+        service = SimpleNamespace(pool_name='postgres://db-host:5432',
+                                  check_user_db_rights=check_user_db_rights)
+        databases = [self.make_database(f'db{index}') for index in range(6)]
+        databases.append(self.make_database('down'))
+        databases.append(self.make_database('other', flavour='oracle'))
+
+        with patch('app.helpers.status_prober.get_database_service',
+                   side_effect=lambda database: service
+                   if database.database_flavour_name == 'postgres' else None):
+            statuses = asyncio.run(probe_databases(databases))
+
+        self.assertEqual(len(statuses), 7)
+        self.assertEqual(running['max'], 2)
+        self.assertFalse(statuses[databases[6].id][0])
+        self.assertTrue(statuses[databases[0].id][0])
+
+    def test_record_statuses(self):
+        db = MagicMock()
+        database_id = uuid.uuid4()
+        record_statuses(db, {database_id: (True, 12)})
+        rows = db.execute.call_args.args[1]
+        self.assertEqual(rows[0]['db_status'], True)
+        self.assertEqual(rows[0]['probe_latency_ms'], 12)
+
+
+if __name__ == '__main__':
+    unittest.main()